@@ -0,0 +1,127 @@
+"""
+Peak memory of decoding an intraday response, before and after the
+zero-copy decode path.
+
+Each decode runs in a fresh interpreter that starts with the raw HTTP body
+already in memory, so the reported number is the extra peak RSS the decode
+needs on top of the downloaded body, per MB of body.
+
+Usage::
+
+    python benchmarks/decode_memory.py [days]
+
+"""
+
+from base64 import b64encode
+import os
+import subprocess
+import sys
+import tempfile
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+# pylint: disable=wrong-import-position
+from moabdb import proto_wrapper
+from moabdb.local_server import _encode_rows
+
+
+CHILD = r"""
+import resource, sys
+sys.path.insert(0, {root!r})
+from base64 import b64decode
+import io
+import pandas as pd
+from moabdb import lib, proto_wrapper
+
+def legacy(body):
+    res = proto_wrapper.RESPONSE().FromString(b64decode(body.decode("ascii")))
+    return pd.read_parquet(io.BytesIO(res.data))
+
+def current(body):
+    res = proto_wrapper.RESPONSE().FromString(b64decode(body))
+    table = lib._decode_table(res.data, res.format)
+    del res
+    return lib._to_pandas(table)
+
+def peak_mb():
+    # VmHWM can be reset, ru_maxrss is inherited from the parent across exec
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    scale = 1024 if sys.platform != "darwin" else 1024 * 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+
+with open({path!r}, "rb") as file:
+    body = file.read()
+try:
+    with open("/proc/self/clear_refs", "w") as refs:
+        refs.write("5")
+except OSError:
+    pass
+before = peak_mb()
+frame = {func}(body)
+print(peak_mb() - before)
+"""
+
+
+def _payload(days: int, payload_format: str) -> bytes:
+    """Builds the base64 HTTP body of an intraday response"""
+    times = pd.date_range("2022-01-03", periods=days * 36000, freq="s")
+    rng = np.random.default_rng(0)
+    close = 100 + rng.standard_normal(len(times)).cumsum() * 0.01
+    rows = pd.DataFrame({
+        "Symbol": "SPY", "Time": times,
+        "Trades": rng.integers(0, 50, len(times)),
+        "Volume": rng.integers(0, 5000, len(times)),
+        "Imbalance": rng.integers(-500, 500, len(times)),
+        "Close": close, "VWAP": close, "BidPrc": close - 0.01,
+        "AskPrc": close + 0.01,
+        "BidSz": rng.integers(1, 20, len(times)),
+        "AskSz": rng.integers(1, 20, len(times))})
+
+    res = proto_wrapper.RESPONSE()
+    res.code = 200
+    res.data = _encode_rows(rows, payload_format)
+    if payload_format == "arrow":
+        res.format = payload_format
+    return b64encode(res.SerializeToString())
+
+
+def _peak(path: str, func: str) -> float:
+    """Runs one decode in a fresh interpreter and returns its extra peak RSS in MB"""
+    root = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+    code = CHILD.format(root=root, path=path, func=func)
+    out = subprocess.run([sys.executable, "-c", code], check=True,
+                         capture_output=True, text=True)
+    return float(out.stdout.strip())
+
+
+def main():
+    """Prints peak RSS per MB of payload for each decode path"""
+    days = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+
+    print(f"{'path':<10}{'format':<10}{'body MB':>10}{'peak MB':>10}{'MB/MB':>8}")
+    for payload_format in ("parquet", "arrow"):
+        body = _payload(days, payload_format)
+        size = len(body) / 1024 / 1024
+        with tempfile.NamedTemporaryFile(delete=False) as file:
+            file.write(body)
+        try:
+            for func in ("legacy", "current"):
+                if func == "legacy" and payload_format == "arrow":
+                    continue
+                peak = _peak(file.name, func)
+                print(f"{func:<10}{payload_format:<10}{size:>10.1f}"
+                      f"{peak:>10.1f}{peak / size:>8.2f}")
+        finally:
+            os.unlink(file.name)
+
+
+if __name__ == "__main__":
+    main()
@@ -10,3 +10,21 @@ from .protocol_pb2 import *
 from .timewindows import *
 from .core import get_equity
 from .core import get_rates
+from .core import iter_equity
+from .aio import get_equity_async, get_rates_async
+from .windows import get_equity_windows, plan_windows
+from .sync import sync, read_store
+from .bulk import BulkDownload
+from .poller import IntradayPoller
+from .transport import *
+from .executor import configure_executor
+from .chunking import configure_chunking, disable_chunking
+from .cancellation import CancellationToken
+from .limiter import AdaptiveLimiter, configure_limiter, disable_limiter, limiter_stats
+from .retry import RetryPolicy, RetryBudget, configure_retries, disable_retries, retry_stats
+from .local_server import LocalServer, LocalKVServer
+from .cache import enable_cache, disable_cache
+from .cache import enable_memory_cache, disable_memory_cache, cache_stats
+from .cache import enable_shared_cache, disable_shared_cache
+from .cache import enable_payload_cache, disable_payload_cache
+from .cache_backends import CacheBackend, MemoryBackend, DiskBackend, RedisBackend
@@ -0,0 +1,231 @@
+"""
+
+Asyncio versions of the ``moabdb`` API, for use inside event loops.
+
+Requests are sent through the async transport, see
+``moabdb.get_async_transport``, and responses are decoded in the loop's
+executor so large payloads don't stall other tasks. Cancelling the calling
+task cancels its outstanding requests.
+
+>>> import asyncio
+>>> import moabdb as mdb
+>>> df = asyncio.run(mdb.get_equity_async(["AAPL", "MSFT"], "6m"))
+
+"""
+
+import asyncio
+from . import cancellation
+from . import errors
+from . import timewindows
+from .lib import _equity_datatype, _equity_symbols, _rates_datatype
+from .lib import _server_req_async, _projection
+from .lib import _equity_frame, _rates_frame
+from .constants import pd, Union, RATES_COLUMNS
+
+# Requests a single call keeps in flight when no semaphore is passed
+DEFAULT_CONCURRENCY = 32
+
+
+# pylint: disable=too-many-arguments,too-many-locals
+async def get_equity_async(tickers: Union[str, list],
+                           sample: str = "1m",
+                           start: str = None,
+                           end: str = None,
+                           intraday: bool = False,
+                           *,
+                           columns: Union[str, list] = None,
+                           semaphore: asyncio.Semaphore = None,
+                           deadline: float = None) -> pd.DataFrame:
+    """
+
+    Coroutine version of ``get_equity``, returning the same
+    ``pandas.DataFrame`` of historical price and volume information.
+
+
+    Parameters
+    ----------
+    tickers : str or list of str
+        The ticker(s) to look up, see ``get_equity``.
+
+    sample : str, optional
+        Sample period length. It can be used alone or with ``start`` | ``end``.
+
+    start : str, optional
+        Sample start date. Requires one of ``end`` or ``sample``.
+
+    end : str, optional
+        Sample end date. Requires one of ``start`` or ``sample``.
+
+    intraday : bool, optional, default False
+        Set to True to return intraday data.
+        Default is False to return end-of-day data.
+        See moabdb.com for subscriptions for intraday access.
+
+    columns : str or list of str, optional
+        The columns to return, see ``get_equity``.
+
+    semaphore : asyncio.Semaphore, optional
+        Bounds the requests in flight. Share one semaphore between calls to
+        bound the requests of a whole service. Defaults to a new semaphore
+        allowing ``DEFAULT_CONCURRENCY`` requests.
+
+    deadline : float, optional
+        Seconds the whole call may take. Each request's timeout shrinks to
+        fit what's left, and ``MoabDeadlineError`` is raised once it runs out.
+
+
+    Returns
+    -------
+    out : pandas.DataFrame
+        DataFrame containing equity price and volume information, see ``get_equity``.
+
+
+    Raises
+    ------
+    errors.MoabResponseError:
+        If there's a problem interpreting the response
+    errors.MoabRequestError:
+        If the server has a problem interpreting the request,
+        or if an invalid parameter is passed
+    errors.MoabInternalError:
+        If the server runs into an unrecoverable error internally
+    errors.MoabHttpError:
+        If there's a problem transporting the payload or receiving a response
+    errors.MoabUnauthorizedError:
+        If the user is not authorized to request the datatype
+    errors.MoabNotFoundError:
+        If the data requested wasn't found
+    errors.MoabUnknownError:
+        If the error code couldn't be parsed
+    errors.MoabDeadlineError:
+        If the call runs past its deadline
+
+    """
+
+    # Check intraday authorization
+    equity_freq, available = _equity_datatype(intraday)
+    projection = _projection(columns, available, 2)
+
+    # String time to integer time
+    start_tm, end_tm = timewindows.get_unix_dates(sample, start, end)
+
+    symbols = _equity_symbols(tickers)
+
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(DEFAULT_CONCURRENCY)
+
+    async def fetch(ticker):
+        async with semaphore:
+            return await _server_req_async(ticker, start_tm, end_tm,
+                                           equity_freq, projection)
+
+    processed = await _within(deadline,
+                              _gather(fetch(ticker) for ticker in symbols))
+
+    # Shape and round the returned data
+    return _equity_frame(processed, projection or available,
+                         isinstance(tickers, str))
+
+
+async def get_rates_async(sample: str = "1y",
+                          start: str = None,
+                          end: str = None,
+                          *,
+                          columns: Union[str, list] = None,
+                          semaphore: asyncio.Semaphore = None,
+                          deadline: float = None) -> pd.DataFrame:
+    """
+
+    Coroutine version of ``get_rates``, returning the same
+    ``pandas.DataFrame`` of historical interest rates.
+
+
+    Parameters
+    ----------
+    sample : str, optional
+        Sample period length. It can be used alone or with ``start`` | ``end``.
+
+    start : str, optional
+        Sample start date. Requires one of ``end`` or ``sample``.
+
+    end : str, optional
+        Sample end date. Requires one of ``start`` or ``sample``.
+
+    columns : str or list of str, optional
+        The columns to return, see ``get_rates``.
+
+    semaphore : asyncio.Semaphore, optional
+        Bounds the requests in flight when shared with other calls.
+
+    deadline : float, optional
+        Seconds the whole call may take. Each request's timeout shrinks to
+        fit what's left, and ``MoabDeadlineError`` is raised once it runs out.
+
+
+    Returns
+    -------
+    out : pandas.DataFrame
+        DataFrame containing treasury data, see ``get_rates``.
+
+
+    Raises
+    ------
+    errors.MoabRequestError:
+        If the server has a problem interpreting the request,
+        or if an invalid parameter is passed
+    errors.MoabHttpError:
+        If there's a problem transporting the payload or receiving a response
+    errors.MoabUnauthorizedError:
+        If the user is not authorized to request the datatype
+    errors.MoabDeadlineError:
+        If the call runs past its deadline
+
+    """
+
+    # Check authorization
+    symbol, datatype = _rates_datatype()
+    projection = _projection(columns, RATES_COLUMNS, 1)
+
+    # String time to integer time
+    start_tm, end_tm = timewindows.get_unix_dates(sample, start, end)
+
+    # Request treasury data
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(DEFAULT_CONCURRENCY)
+
+    async def fetch():
+        async with semaphore:
+            return await _server_req_async(symbol, start_tm, end_tm, datatype,
+                                           projection)
+
+    return_db = await _within(deadline, fetch())
+
+    # Format treasury data
+    return _rates_frame(return_db, projection)
+
+
+async def _within(deadline: float, coroutine):
+    """Awaits a coroutine, cancelling it once the deadline passes"""
+    if deadline is None:
+        return await coroutine
+    with cancellation.scope(deadline):
+        try:
+            return await asyncio.wait_for(coroutine, deadline)
+        except asyncio.TimeoutError as exc:
+            raise errors.MoabDeadlineError(
+                "Request deadline exceeded") from exc
+
+
+async def _gather(coroutines) -> list:
+    """
+    Runs coroutines concurrently and returns their results in order.
+    If one fails, or the caller is cancelled, the rest are cancelled.
+    """
+    tasks = [asyncio.ensure_future(coroutine) for coroutine in coroutines]
+    try:
+        return await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
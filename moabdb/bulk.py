@@ -0,0 +1,272 @@
+"""MoabDB Checkpointed Bulk Downloads"""
+
+import json
+import os
+import threading
+from . import cancellation
+from . import errors
+from . import timewindows
+from .lib import _equity_datatype, _server_req
+from .executor import fan_out
+from .cancellation import CancellationToken
+from .constants import pd, Union
+
+# Days of data requested per unit, by datatype, unless configured otherwise
+DEFAULT_CHUNK_DAYS = {"daily_stocks": 365, "intraday_stocks": 5}
+
+_JOB_FILE = "job.json"
+_MANIFEST_FILE = "manifest.jsonl"
+
+
+class BulkDownload:  # pylint: disable=too-many-instance-attributes
+    """
+    A resumable download of equity data for many symbols over a long window.
+
+    The window is split into units of ``chunk_days`` per symbol. Each unit
+    is written to its own Parquet file under ``directory/<SYMBOL>`` as
+    soon as it arrives, and then recorded in a manifest. A job that
+    crashes, is cancelled or loses its credentials can be picked up with
+    ``BulkDownload.resume``, and only the units missing from the manifest
+    are requested again.
+
+    The job's settings are saved to ``directory`` when it's created, with
+    ``sample`` turned into fixed dates, so a resumed job covers the same
+    window as the original.
+
+    Args:
+        tickers (str or list of str): The ticker(s) to download
+        directory (str): The directory to keep the job in, which must not
+            already hold a job
+        sample (str, optional): Sample period length, see ``get_equity``
+        start (str, optional): Sample start date, see ``get_equity``
+        end (str, optional): Sample end date, see ``get_equity``
+        intraday (bool, optional): Download intraday data instead of daily data
+        chunk_days (int, optional): Days of data per unit, see ``DEFAULT_CHUNK_DAYS``
+
+    Attributes:
+        tickers (list): The symbols downloaded
+        directory (str): The directory the job is kept in
+        datatype (str): The datatype downloaded
+        window (tuple): The first and last epoch downloaded
+        chunk_days (int): Days of data per unit
+        failures (pandas.DataFrame): The ``Symbol``, ``Start``, ``End``,
+            ``Error`` class name and ``Message`` of each unit that failed
+            in the last run
+
+    Example::
+
+        import moabdb as mdb
+        mdb.login("your-signup-email@mail.com", "secret_key")
+        job = mdb.BulkDownload(sp500_tickers, "backfill", "5y", intraday=True)
+        job.run()
+
+        # After a crash or restart
+        job = mdb.BulkDownload.resume("backfill")
+        job.run()
+        df = job.read("AAPL")
+
+    """
+
+    # pylint: disable=too-many-arguments
+    def __init__(self, tickers: Union[str, list], directory: str,
+                 sample: str = "1y", start: str = None, end: str = None, *,
+                 intraday: bool = False, chunk_days: int = None):
+        if isinstance(tickers, str):
+            tickers = [tickers]
+        elif not isinstance(tickers, list):
+            raise errors.MoabRequestError("Invalid ticker type")
+
+        datatype, _ = _equity_datatype(intraday)
+        if chunk_days is None:
+            chunk_days = DEFAULT_CHUNK_DAYS[datatype]
+        if chunk_days < 1:
+            raise errors.MoabRequestError("chunk_days must be positive")
+
+        directory = os.path.expanduser(directory)
+        if os.path.exists(os.path.join(directory, _JOB_FILE)):
+            raise errors.MoabRequestError(
+                f"{directory} already holds a job, see BulkDownload.resume")
+
+        job = {"tickers": list(dict.fromkeys(map(str.upper, tickers))),
+               "datatype": datatype,
+               "window": list(timewindows.get_unix_dates(sample, start, end)),
+               "chunk_days": chunk_days}
+        os.makedirs(directory, exist_ok=True)
+        _write_atomic(os.path.join(directory, _JOB_FILE),
+                      lambda path: _write_json(path, job))
+        self._load(directory, job)
+
+    @classmethod
+    def resume(cls, directory: str) -> "BulkDownload":
+        """
+        Opens a job created earlier, to carry on where it stopped
+
+        Args:
+            directory (str): The directory the job was created in
+
+        Raises:
+            errors.MoabRequestError: If the directory doesn't hold a job
+
+        Returns:
+            BulkDownload: The job, with the units already downloaded marked complete
+        """
+        directory = os.path.expanduser(directory)
+        try:
+            with open(os.path.join(directory, _JOB_FILE),
+                      encoding="utf-8") as file:
+                job = json.load(file)
+        except FileNotFoundError as exc:
+            raise errors.MoabRequestError(
+                f"{directory} doesn't hold a job") from exc
+
+        download = cls.__new__(cls)
+        download._load(directory, job)
+        return download
+
+    def _load(self, directory: str, job: dict):
+        """Sets up the job from its saved settings and manifest"""
+        self.directory = directory
+        self.tickers = job["tickers"]
+        self.datatype = job["datatype"]
+        self.window = tuple(job["window"])
+        self.chunk_days = job["chunk_days"]
+        self.failures = _failure_frame([])
+        self._columns = _equity_datatype(
+            self.datatype == "intraday_stocks")[1]
+        self._lock = threading.Lock()
+        self._done = set()
+
+        try:
+            with open(os.path.join(directory, _MANIFEST_FILE),
+                      encoding="utf-8") as file:
+                lines = file.readlines()
+        except FileNotFoundError:
+            lines = []
+        for line in lines:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                # A line cut short by a crash, its unit is fetched again
+                continue
+            self._done.add((entry["symbol"], entry["start"], entry["end"]))
+
+    def units(self) -> list:
+        """
+        Lists every unit of the job
+
+        Returns:
+            list: A ``(symbol, start, end)`` tuple of epochs for each unit
+        """
+        first, last = self.window
+        step = self.chunk_days * 86400
+        return [(ticker, start, min(start + step - 1, last))
+                for ticker in self.tickers
+                for start in range(first, last + 1, step)]
+
+    def pending(self) -> list:
+        """
+        Lists the units that haven't been downloaded yet
+
+        Returns:
+            list: A ``(symbol, start, end)`` tuple of epochs for each unit
+        """
+        with self._lock:
+            return [unit for unit in self.units() if unit not in self._done]
+
+    def run(self, *, deadline: float = None,
+            cancel: CancellationToken = None) -> dict:
+        """
+        Downloads the pending units. Units that fail are left pending and
+        listed in ``failures``, so running the job again retries only them.
+        A deadline or cancellation stops the run, keeping every unit that
+        finished before it.
+
+        Args:
+            deadline (float, optional): Seconds the run may take
+            cancel (CancellationToken, optional): A token that stops the run
+
+        Raises:
+            errors.MoabDeadlineError: If the run goes past its deadline
+            errors.MoabCancelledError: If the run is cancelled through its token
+
+        Returns:
+            dict: The number of units downloaded, already complete,
+            and failed, and the rows downloaded
+        """
+        pending = self.pending()
+        with cancellation.scope(deadline, cancel):
+            results = fan_out(self._download, pending, return_exceptions=True)
+
+        failed = [(unit, result) for unit, result in zip(pending, results)
+                  if isinstance(result, errors.MoabError)]
+        self.failures = _failure_frame(failed)
+        return {"downloaded": len(pending) - len(failed),
+                "complete": len(self.units()) - len(pending),
+                "failed": len(failed),
+                "rows": sum(result for result in results
+                            if not isinstance(result, errors.MoabError))}
+
+    def _download(self, unit: tuple) -> int:
+        """Downloads a unit, writes it, and records it in the manifest"""
+        ticker, start, end = unit
+        try:
+            frame = _server_req(ticker, start, end, self.datatype)[self._columns]
+        except errors.MoabNotFoundError:
+            frame = None
+
+        rows = 0
+        if frame is not None and not frame.empty:
+            directory = os.path.join(self.directory, ticker)
+            os.makedirs(directory, exist_ok=True)
+            _write_atomic(os.path.join(directory, f"part-{start}-{end}.parquet"),
+                          lambda path: frame.to_parquet(path, index=False))
+            rows = len(frame)
+
+        entry = json.dumps({"symbol": ticker, "start": start,
+                            "end": end, "rows": rows})
+        with self._lock:
+            with open(os.path.join(self.directory, _MANIFEST_FILE), "a",
+                      encoding="utf-8") as file:
+                file.write(entry + "\n")
+                file.flush()
+                os.fsync(file.fileno())
+            self._done.add(unit)
+        return rows
+
+    def read(self, ticker: str) -> pd.DataFrame:
+        """
+        Reads back the rows downloaded for a symbol
+
+        Args:
+            ticker (str): The symbol to read
+
+        Returns:
+            pandas.DataFrame: The symbol's rows in time order, empty if none
+            were downloaded
+        """
+        directory = os.path.join(self.directory, str.upper(ticker))
+        if not os.path.isdir(directory):
+            return pd.DataFrame(columns=self._columns)
+        frame = pd.read_parquet(directory)
+        return frame.sort_values(self._columns[1], ignore_index=True)
+
+
+def _write_atomic(path: str, write):
+    """Writes a file through a temporary file, so it's never seen half written"""
+    temp = os.path.join(os.path.dirname(path),
+                        f".{os.path.basename(path)}.{os.getpid()}."
+                        f"{threading.get_ident()}.tmp")
+    write(temp)
+    os.replace(temp, path)
+
+
+def _write_json(path: str, value):
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(value, file)
+
+
+def _failure_frame(failed: list) -> pd.DataFrame:
+    """Lists failed units with their errors"""
+    return pd.DataFrame(
+        [(*unit, type(exc).__name__, str(exc)) for unit, exc in failed],
+        columns=["Symbol", "Start", "End", "Error", "Message"])
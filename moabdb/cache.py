@@ -0,0 +1,987 @@
+"""MoabDB Response Caches"""
+
+from collections import OrderedDict
+from urllib.parse import quote
+import concurrent.futures as cf
+import hashlib
+import json
+import os
+import struct
+import threading
+import time
+from .constants import pa, pc, pq
+from .cache_backends import CacheBackend
+from . import errors
+from . import timewindows
+
+# Rows newer than this many seconds may still change on the server
+SETTLE_SECONDS = 86400
+
+# Seconds a cached window stays fresh while it may still change, per datatype
+OPEN_TTL = {"intraday_stocks": 60, "daily_stocks": 3600, "treasuries": 3600}
+DEFAULT_OPEN_TTL = 300
+
+# Seconds a cached window stays fresh once all of its rows have settled
+CLOSED_TTL = 86400
+
+# Seconds a stale payload is kept so it can be revalidated instead of refetched
+REVALIDATE_SECONDS = 7 * 86400
+
+_RANGES_KEY = b"moabdb.ranges"
+_ETAG_KEY = b"moabdb.etag"
+
+# Magic, payload format, compression codec, uncompressed size, the epoch the
+# payload is fresh until and the length of its etag, of a cached payload
+_PAYLOAD_HEADER = struct.Struct(">4s16s8sQdH")
+_PAYLOAD_MAGIC = b"MDB2"
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+class NotModified(Exception):
+    """
+    Raised by a fetch made with ``if_none_match`` when the server's copy of
+    the window still has that etag, so the caller's copy can be reused
+
+    Args:
+        etag (str): The etag that still matches
+    """
+
+    def __init__(self, etag: str):
+        super().__init__(etag)
+        self.etag = etag
+
+
+class RangeCache:
+    """
+    Keeps the rows fetched for each symbol and datatype on disk, along with
+    the epoch ranges they cover. A request only fetches the parts of its
+    window that aren't stored yet and is answered from the merged rows.
+
+    Ranges ending within ``SETTLE_SECONDS`` of now aren't recorded as
+    covered, so recent rows are fetched again until they settle.
+
+    Args:
+        path (str): The directory to keep cached rows in
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._locks = {}
+        self._locks_lock = threading.Lock()
+
+    def _lock_for(self, key) -> threading.Lock:
+        with self._locks_lock:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def _file(self, ticker: str, datatype: str) -> str:
+        return os.path.join(self.path, quote(datatype, safe=""),
+                            quote(ticker, safe="") + ".parquet")
+
+    def _load(self, file: str):
+        """Reads the cached rows and covered ranges, if any"""
+        if not os.path.exists(file):
+            return None, []
+        try:
+            table = pq.read_table(file)
+        except Exception:  # pylint: disable=broad-exception-caught
+            # Unreadable entries are refetched rather than failing the request
+            return None, []
+        metadata = table.schema.metadata or {}
+        ranges = json.loads(metadata.get(_RANGES_KEY, b"[]"))
+        return table, [tuple(span) for span in ranges]
+
+    def _save(self, file: str, table: pa.Table, ranges: list):
+        """Atomically replaces the cached rows and covered ranges"""
+        metadata = dict(table.schema.metadata or {})
+        metadata[_RANGES_KEY] = json.dumps(ranges).encode()
+        table = table.replace_schema_metadata(metadata)
+
+        os.makedirs(os.path.dirname(file), exist_ok=True)
+        temp = f"{file}.{os.getpid()}.{threading.get_ident()}.tmp"
+        pq.write_table(table, temp)
+        os.replace(temp, file)
+
+    def ranges(self, ticker: str, datatype: str) -> list:
+        """
+        Returns the epoch ranges cached for a symbol and datatype
+
+        Args:
+            ticker (str): The ticker the rows were requested by
+            datatype (str): The data type of the rows
+
+        Returns:
+            list: Inclusive (start, end) epoch pairs, in order
+        """
+        file = self._file(ticker, datatype)
+        with self._lock_for(file):
+            return self._load(file)[1]
+
+    # pylint: disable=too-many-arguments
+    def fetch(self, ticker: str, start: int, end: int, datatype: str,
+              fetch, *, if_none_match: str = "") -> pa.Table:
+        """
+        Returns the rows of a window, fetching only the parts that aren't cached
+
+        Args:
+            ticker (str): The ticker to query from the database
+            start (int): The unix epoch time to start the query from
+            end (int): The unix epoch time to stop searching at
+            datatype (str): The data type that's being requested
+            fetch (callable): Called as ``fetch(ticker, start, end, datatype)``
+                to request a missing range from the server
+            if_none_match (str, optional): Ignored, merged rows carry no etag
+
+        Raises:
+            errors.MoabNotFoundError: If there are no rows in the window
+
+        Returns:
+            pyarrow.Table: The rows in the window, oldest first
+        """
+        del if_none_match
+        file = self._file(ticker, datatype)
+        with self._lock_for(file):
+            table, ranges = self._load(file)
+            missing = missing_ranges(ranges, start, end)
+
+            if missing:
+                fetched = _fetch_missing(ticker, missing, datatype, fetch)
+                table = _merge_rows(table, fetched, missing)
+                settled = int(time.time()) - SETTLE_SECONDS
+                covered = [(lo, min(hi, settled)) for lo, hi in missing
+                           if lo <= settled]
+                ranges = merge_ranges(ranges + covered)
+                if table is not None:
+                    self._save(file, table, ranges)
+
+        rows = None if table is None else _slice_rows(table, start, end)
+        if rows is None or rows.num_rows == 0:
+            raise errors.MoabNotFoundError(ticker + " not found")
+        return rows
+
+
+class MemoryCache:  # pylint: disable=too-many-instance-attributes
+    """
+    Keeps recently decoded windows in memory, evicting the least recently
+    used ones once their total size exceeds a byte budget. Concurrent
+    requests for the same window share a single server request.
+
+    Windows that end within ``SETTLE_SECONDS`` of now stay fresh for the
+    datatype's ``OPEN_TTL``, settled windows stay fresh for ``CLOSED_TTL``.
+    Stale windows are kept until evicted, and are revalidated with their
+    etag so an unchanged window is neither downloaded nor decoded again.
+
+    Args:
+        max_bytes (int, optional): The most bytes of rows to keep
+        ttl (dict, optional): Overrides ``OPEN_TTL`` for some datatypes
+        closed_ttl (float, optional): Overrides ``CLOSED_TTL``
+
+    Attributes:
+        hits (int): Requests answered from memory
+        misses (int): Requests that had to be loaded
+        coalesced (int): Requests that waited on an identical request in flight
+        revalidated (int): Misses the server confirmed were unchanged
+        evictions (int): Windows dropped to stay within the byte budget
+    """
+
+    def __init__(self, max_bytes: int = 1 << 30, ttl: dict = None,
+                 closed_ttl: float = CLOSED_TTL):
+        self.max_bytes = max_bytes
+        self.ttl = dict(OPEN_TTL, **(ttl or {}))
+        self.closed_ttl = closed_ttl
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.revalidated = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def _lookup(self, key):
+        """
+        Returns a cached table, or None, and whether it's still fresh.
+        Call with the lock held.
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            return None, False
+        expires, table = entry
+        self._entries.move_to_end(key)
+        return table, expires >= time.monotonic()
+
+    def _drop(self, key):
+        _, table = self._entries.pop(key)
+        self._bytes -= table.nbytes
+
+    def _store(self, key, table: pa.Table, lifetime: float):
+        """Adds a table, evicting old ones as needed. Call with the lock held."""
+        if key in self._entries:
+            self._drop(key)
+        if table.nbytes > self.max_bytes:
+            return
+        self._entries[key] = (time.monotonic() + lifetime, table)
+        self._bytes += table.nbytes
+        while self._bytes > self.max_bytes:
+            self._drop(next(iter(self._entries)))
+            self.evictions += 1
+
+    # pylint: disable=too-many-arguments
+    def fetch(self, ticker: str, start: int, end: int, datatype: str,
+              fetch, *, if_none_match: str = "") -> pa.Table:
+        """
+        Returns the rows of a window from memory, or loads them once
+
+        Args:
+            ticker (str): The ticker to query from the database
+            start (int): The unix epoch time to start the query from
+            end (int): The unix epoch time to stop searching at
+            datatype (str): The data type that's being requested
+            fetch (callable): Called as ``fetch(ticker, start, end, datatype)``
+                to load the window when it isn't cached, with ``if_none_match``
+                when revalidating a stale copy
+            if_none_match (str, optional): Ignored, this is the outermost cache
+
+        Returns:
+            pyarrow.Table: The rows in the window, shared with the cache
+        """
+        del if_none_match
+        key = (datatype, ticker, start, end)
+        with self._lock:
+            stale, fresh = self._lookup(key)
+            if fresh:
+                self.hits += 1
+                return stale
+            pending = self._inflight.get(key)
+            if pending is None:
+                self.misses += 1
+                leader = cf.Future()
+                self._inflight[key] = leader
+            else:
+                self.coalesced += 1
+
+        if pending is not None:
+            return pending.result()
+
+        etag = "" if stale is None else table_etag(stale)
+        try:
+            if etag:
+                table = fetch(ticker, start, end, datatype, if_none_match=etag)
+            else:
+                table = fetch(ticker, start, end, datatype)
+        except NotModified:
+            table = stale
+            with self._lock:
+                self.revalidated += 1
+        except BaseException as exc:
+            with self._lock:
+                del self._inflight[key]
+            leader.set_exception(exc)
+            raise
+
+        with self._lock:
+            self._store(key, table,
+                        _lifetime(self.ttl, self.closed_ttl, datatype, end))
+            del self._inflight[key]
+        leader.set_result(table)
+        return table
+
+    def stats(self) -> dict:
+        """
+        Returns the cache's counters
+
+        Returns:
+            dict: The hits, misses, coalesced requests, revalidated misses,
+            evictions, entries and bytes held
+        """
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses,
+                    "coalesced": self.coalesced,
+                    "revalidated": self.revalidated,
+                    "evictions": self.evictions,
+                    "entries": len(self._entries), "bytes": self._bytes}
+
+    def clear(self):
+        """Drops every cached window"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+
+class SharedCache:
+    """
+    Keeps decoded windows in a directory shared by several processes.
+    The first process to request a window fetches it while holding a file
+    lock, the others wait on the lock and then memory-map the result instead
+    of sending their own request. Windows the server has no data for are
+    remembered for the datatype's ``OPEN_TTL``, so the others don't ask
+    again one after another either.
+
+    Freshness and revalidation follow the same rules as ``MemoryCache``.
+
+    Args:
+        path (str): The directory to share windows through
+        ttl (dict, optional): Overrides ``OPEN_TTL`` for some datatypes
+        closed_ttl (float, optional): Overrides ``CLOSED_TTL``
+    """
+
+    def __init__(self, path: str, ttl: dict = None,
+                 closed_ttl: float = CLOSED_TTL):
+        self.path = path
+        self.ttl = dict(OPEN_TTL, **(ttl or {}))
+        self.closed_ttl = closed_ttl
+        os.makedirs(path, exist_ok=True)
+
+    @staticmethod
+    def _read(file: str, lifetime: float):
+        """Memory-maps a cached window, or returns None, and whether it's fresh"""
+        try:
+            fresh = os.path.getmtime(file) + lifetime >= time.time()
+            return pa.ipc.open_file(pa.memory_map(file)).read_all(), fresh
+        except (OSError, pa.ArrowInvalid):
+            return None, False
+
+    @staticmethod
+    def _write(file: str, table: pa.Table):
+        """Atomically replaces a cached window"""
+        temp = f"{file}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with pa.OSFile(temp, "wb") as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        os.replace(temp, file)
+
+    def _missing(self, file: str, datatype: str) -> bool:
+        """Whether the server recently had no data for a window"""
+        try:
+            marked = os.path.getmtime(file + ".missing")
+        except OSError:
+            return False
+        return marked + self.ttl.get(datatype, DEFAULT_OPEN_TTL) >= time.time()
+
+    # pylint: disable=too-many-arguments
+    def fetch(self, ticker: str, start: int, end: int, datatype: str,
+              fetch, *, if_none_match: str = "") -> pa.Table:
+        """
+        Returns the rows of a window from the shared directory, or loads
+        them in exactly one of the processes asking for them
+
+        Args:
+            ticker (str): The ticker to query from the database
+            start (int): The unix epoch time to start the query from
+            end (int): The unix epoch time to stop searching at
+            datatype (str): The data type that's being requested
+            fetch (callable): Called as ``fetch(ticker, start, end, datatype)``
+                to load the window when it isn't cached, with ``if_none_match``
+                when revalidating a stale copy
+            if_none_match (str, optional): Ignored, mapping the shared copy
+                is as cheap as reusing the caller's
+
+        Raises:
+            errors.MoabNotFoundError: If the server has no data for the
+                window, or had none within the datatype's ``OPEN_TTL``
+
+        Returns:
+            pyarrow.Table: The rows in the window, memory-mapped where possible
+        """
+        del if_none_match
+        name = hashlib.sha1(f"{datatype}\0{ticker}\0{start}\0{end}".encode())
+        file = os.path.join(self.path, name.hexdigest() + ".arrow")
+        lifetime = _lifetime(self.ttl, self.closed_ttl, datatype, end)
+
+        table, fresh = self._read(file, lifetime)
+        if fresh:
+            return table
+        if self._missing(file, datatype):
+            raise errors.MoabNotFoundError(ticker + " not found")
+
+        with _FileLock(file + ".lock"):
+            # Another process may have fetched it while we waited
+            stale, fresh = self._read(file, lifetime)
+            if fresh:
+                return stale
+            if self._missing(file, datatype):
+                raise errors.MoabNotFoundError(ticker + " not found")
+
+            etag = "" if stale is None else table_etag(stale)
+            try:
+                if etag:
+                    table = fetch(ticker, start, end, datatype,
+                                  if_none_match=etag)
+                else:
+                    table = fetch(ticker, start, end, datatype)
+            except NotModified:
+                os.utime(file)
+                return stale
+            except errors.MoabNotFoundError:
+                with open(file + ".missing", "wb"):
+                    pass
+                raise
+
+            self._write(file, table)
+            if os.path.exists(file + ".missing"):
+                os.remove(file + ".missing")
+
+        mapped, _ = self._read(file, lifetime)
+        return table if mapped is None else mapped
+
+    def clear(self):
+        """Deletes every window and lock in the shared directory"""
+        for name in os.listdir(self.path):
+            if name.endswith((".arrow", ".missing", ".lock")):
+                try:
+                    os.remove(os.path.join(self.path, name))
+                except OSError:
+                    # A lock still held on a platform that can't delete it
+                    pass
+
+
+class _FileLock:
+    """
+    An exclusive lock on a file, held across processes and threads.
+    Where locks are advisory, the file is deleted on release, and a
+    process that locked a file deleted under it locks the new one instead.
+    """
+
+    def __init__(self, path: str):
+        self._path = path
+        self._fd = None
+
+    def __enter__(self):
+        if fcntl is not None:
+            while True:
+                self._fd = os.open(self._path, os.O_RDWR | os.O_CREAT)
+                fcntl.flock(self._fd, fcntl.LOCK_EX)
+                if self._holds_path():
+                    return self
+                os.close(self._fd)
+
+        # pylint: disable=import-outside-toplevel,import-error
+        import msvcrt
+        self._fd = os.open(self._path, os.O_RDWR | os.O_CREAT)
+        while True:
+            try:
+                msvcrt.locking(self._fd, msvcrt.LK_LOCK, 1)
+                return self
+            except OSError:
+                # LK_LOCK gives up after about 10 seconds
+                continue
+
+    def _holds_path(self) -> bool:
+        """Whether the locked file is still the one at the lock's path"""
+        try:
+            return os.stat(self._path).st_ino == os.fstat(self._fd).st_ino
+        except FileNotFoundError:
+            return False
+
+    def __exit__(self, *exc):
+        if fcntl is not None:
+            if self._holds_path():
+                os.remove(self._path)
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        else:
+            # pylint: disable=import-outside-toplevel,import-error
+            import msvcrt
+            os.lseek(self._fd, 0, os.SEEK_SET)
+            msvcrt.locking(self._fd, msvcrt.LK_UNLCK, 1)
+        os.close(self._fd)
+        self._fd = None
+
+
+class PayloadCache:
+    """
+    Keeps the raw payloads returned by the server in a ``CacheBackend``,
+    ahead of any decoding. With a backend such as ``RedisBackend`` machines
+    across a cluster share what any of them fetched. Arrow payloads are
+    compressed before they are stored, Parquet payloads already are.
+
+    Freshness follows the same rules as ``MemoryCache``. Stale payloads are
+    kept for ``REVALIDATE_SECONDS`` so they can be revalidated with their etag.
+
+    Args:
+        backend (CacheBackend): The store to keep payloads in
+        ttl (dict, optional): Overrides ``OPEN_TTL`` for some datatypes
+        closed_ttl (float, optional): Overrides ``CLOSED_TTL``
+    """
+
+    def __init__(self, backend: CacheBackend, ttl: dict = None,
+                 closed_ttl: float = CLOSED_TTL):
+        self.backend = backend
+        self.ttl = dict(OPEN_TTL, **(ttl or {}))
+        self.closed_ttl = closed_ttl
+
+    # pylint: disable=too-many-arguments
+    def fetch(self, ticker: str, start: int, end: int, datatype: str,
+              fetch, *, if_none_match: str = "") -> tuple:
+        """
+        Returns the payload of a window from the backend, or fetches and stores it
+
+        Args:
+            ticker (str): The ticker to query from the database
+            start (int): The unix epoch time to start the query from
+            end (int): The unix epoch time to stop searching at
+            datatype (str): The data type that's being requested
+            fetch (callable): Called as ``fetch(ticker, start, end, datatype)``
+                to request the payload when it isn't cached, with
+                ``if_none_match`` when revalidating
+            if_none_match (str, optional): The etag of a copy the caller holds
+
+        Raises:
+            NotModified: If the caller's copy is still current
+
+        Returns:
+            tuple: The payload bytes, its format and its etag
+        """
+        key = payload_key(ticker, start, end, datatype)
+        value = self.backend.get(key)
+        cached = None if value is None else _unpack_payload(value)
+        if cached is not None and cached[3] >= time.time():
+            payload = cached[:3]
+        else:
+            payload = self._refresh(key, (ticker, start, end, datatype),
+                                    fetch, cached, if_none_match)
+
+        if if_none_match and payload[2] == if_none_match:
+            raise NotModified(if_none_match)
+        return payload
+
+    def _refresh(self, key: str, window: tuple, fetch, cached,
+                 if_none_match: str) -> tuple:
+        """Fetches a payload, revalidating the stale copy if there is one"""
+        etag = if_none_match if cached is None else cached[2]
+        try:
+            if etag:
+                payload = fetch(*window, if_none_match=etag)
+            else:
+                payload = fetch(*window)
+        except NotModified:
+            if cached is None:
+                raise
+            payload = cached[:3]
+
+        lifetime = _lifetime(self.ttl, self.closed_ttl, window[3], window[2])
+        self.backend.set(key, _pack_payload(*payload, time.time() + lifetime),
+                         lifetime + REVALIDATE_SECONDS)
+        return payload
+
+    def invalidate(self, ticker: str, start: int, end: int, datatype: str):
+        """
+        Removes a window's payload from the backend
+
+        Args:
+            ticker (str): The ticker the window was requested by
+            start (int): The window's start epoch
+            end (int): The window's end epoch
+            datatype (str): The data type of the window
+        """
+        self.backend.delete(payload_key(ticker, start, end, datatype))
+
+
+def payload_key(ticker: str, start: int, end: int, datatype: str) -> str:
+    """
+    Returns the backend key a window's payload is stored under
+
+    Args:
+        ticker (str): The ticker the window was requested by
+        start (int): The window's start epoch, from ``get_unix_dates``
+        end (int): The window's end epoch, from ``get_unix_dates``
+        datatype (str): The data type of the window
+
+    Returns:
+        str: The key
+    """
+    return f"v1:{datatype}:{ticker}:{start}:{end}"
+
+
+def _pack_payload(data: bytes, payload_format: str, etag: str,
+                  fresh_until: float) -> bytes:
+    """Wraps a payload for storage, compressing it if it isn't already"""
+    codec = ""
+    if payload_format == "arrow" and pa.Codec.is_available("zstd"):
+        codec = "zstd"
+        body = pa.compress(data, codec=codec, asbytes=True)
+    else:
+        body = data
+    etag = etag.encode()
+    header = _PAYLOAD_HEADER.pack(_PAYLOAD_MAGIC, payload_format.encode(),
+                                  codec.encode(), len(data), fresh_until,
+                                  len(etag))
+    return header + etag + body
+
+
+def _unpack_payload(value: bytes):
+    """
+    Unwraps a stored payload into its bytes, format, etag and the epoch
+    it's fresh until, None if it isn't one
+    """
+    if len(value) < _PAYLOAD_HEADER.size:
+        return None
+    (magic, payload_format, codec, size, fresh_until,
+     etag_size) = _PAYLOAD_HEADER.unpack_from(value)
+    if magic != _PAYLOAD_MAGIC:
+        return None
+    payload_format = payload_format.rstrip(b"\0").decode()
+    codec = codec.rstrip(b"\0").decode()
+    offset = _PAYLOAD_HEADER.size + etag_size
+    etag = bytes(value[_PAYLOAD_HEADER.size:offset]).decode()
+    body = memoryview(value)[offset:]
+    if codec:
+        try:
+            body = pa.decompress(body, size, codec=codec)
+        except (pa.ArrowException, ValueError):
+            return None
+    return body, payload_format, etag, fresh_until
+
+
+def with_etag(table: pa.Table, etag: str) -> pa.Table:
+    """
+    Attaches an etag to a table's schema metadata
+
+    Args:
+        table (pyarrow.Table): The decoded window
+        etag (str): The etag the server sent with it, may be empty
+
+    Returns:
+        pyarrow.Table: The table, carrying the etag
+    """
+    if not etag:
+        return table
+    metadata = dict(table.schema.metadata or {})
+    metadata[_ETAG_KEY] = etag.encode()
+    return table.replace_schema_metadata(metadata)
+
+
+def table_etag(table: pa.Table) -> str:
+    """
+    Returns the etag attached to a table by ``with_etag``
+
+    Args:
+        table (pyarrow.Table): The decoded window
+
+    Returns:
+        str: The etag, empty if the table doesn't carry one
+    """
+    metadata = table.schema.metadata or {}
+    return metadata.get(_ETAG_KEY, b"").decode()
+
+
+def merge_ranges(ranges: list) -> list:
+    """
+    Merges overlapping or adjacent inclusive epoch ranges
+
+    Args:
+        ranges (list): Pairs of (start, end) epochs
+
+    Returns:
+        list: The merged pairs, in order
+    """
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def missing_ranges(ranges: list, start: int, end: int) -> list:
+    """
+    Finds the parts of an inclusive epoch window not covered by ranges
+
+    Args:
+        ranges (list): Merged pairs of covered (start, end) epochs
+        start (int): The start of the window
+        end (int): The end of the window
+
+    Returns:
+        list: The uncovered (start, end) pairs, in order
+    """
+    missing = []
+    cursor = start
+    for lo, hi in ranges:
+        if hi < cursor:
+            continue
+        if lo > end:
+            break
+        if lo > cursor:
+            missing.append((cursor, lo - 1))
+        cursor = hi + 1
+    if cursor <= end:
+        missing.append((cursor, end))
+    return missing
+
+
+def _lifetime(ttl: dict, closed_ttl: float, datatype: str, end: int) -> float:
+    """Returns how many seconds a cached window stays fresh"""
+    if end <= time.time() - SETTLE_SECONDS:
+        return closed_ttl
+    return ttl.get(datatype, DEFAULT_OPEN_TTL)
+
+
+def _fetch_missing(ticker: str, missing: list, datatype: str, fetch) -> list:
+    """Fetches each missing range, skipping ranges without rows"""
+    fetched = []
+    for start, end in missing:
+        try:
+            fetched.append(fetch(ticker, start, end, datatype))
+        except errors.MoabNotFoundError:
+            pass
+    return fetched
+
+
+def _time_column(table: pa.Table) -> str:
+    return "Time" if "Time" in table.column_names else "Date"
+
+
+def _slice_rows(table: pa.Table, start: int, end: int) -> pa.Table:
+    """Returns the rows of a table within an inclusive epoch window"""
+    epochs = timewindows.to_epochs_arrow(table[_time_column(table)])
+    return table.filter(pc.and_(pc.greater_equal(epochs, start),
+                                pc.less_equal(epochs, end)))
+
+
+def _merge_rows(table: pa.Table, fetched: list, fetched_ranges: list) -> pa.Table:
+    """Replaces the cached rows in fetched_ranges with freshly fetched ones"""
+    if table is not None:
+        epochs = timewindows.to_epochs_arrow(table[_time_column(table)])
+        keep = None
+        for lo, hi in fetched_ranges:
+            outside = pc.or_(pc.less(epochs, lo), pc.greater(epochs, hi))
+            keep = outside if keep is None else pc.and_(keep, outside)
+        fetched = [table.filter(keep)] + fetched
+
+    if not fetched:
+        return table
+    # Merged rows no longer match any single etag
+    metadata = dict(fetched[0].schema.metadata or {})
+    metadata.pop(_ETAG_KEY, None)
+    merged = pa.concat_tables([part.replace_schema_metadata(metadata)
+                               for part in fetched],
+                              promote_options="permissive")
+    return merged.sort_by(_time_column(merged))
+
+
+_RANGE_CACHE = None
+_MEMORY_CACHE = None
+_SHARED_CACHE = None
+_PAYLOAD_CACHE = None
+
+
+def active_caches() -> list:
+    """
+    Returns the enabled caches, outermost first. Each one answers from
+    itself or asks the next, the last one asks the server.
+
+    Returns:
+        list: The enabled MemoryCache, SharedCache and RangeCache
+    """
+    return [layer for layer in (_MEMORY_CACHE, _SHARED_CACHE, _RANGE_CACHE)
+            if layer is not None]
+
+
+def get_range_cache() -> RangeCache:
+    """
+    Returns the on-disk range cache, if one is enabled
+
+    Returns:
+        RangeCache: The active cache, or None
+    """
+    return _RANGE_CACHE
+
+
+def enable_cache(path: str):
+    """
+    Keeps fetched rows on disk and only requests the parts of a window
+    that haven't been fetched before. Useful when the same history is
+    read over and over, across sessions.
+
+    Args:
+        path (str): The directory to keep cached rows in
+
+    Returns:
+        None: On success, this will return nothing
+
+    Example::
+
+        import moabdb as mdb
+        mdb.enable_cache("~/.moabdb")
+        df = mdb.get_equity("AAPL", "5y") # Fetched from the server
+        df = mdb.get_equity("AAPL", "5y") # Read from disk
+
+    """
+    # pylint: disable=global-statement
+    global _RANGE_CACHE
+    _RANGE_CACHE = RangeCache(os.path.expanduser(path))
+
+
+def disable_cache():
+    """
+    Stops using the on-disk range cache. Cached files are left in place.
+
+    Returns:
+        None: On success, this will return nothing
+    """
+    # pylint: disable=global-statement
+    global _RANGE_CACHE
+    _RANGE_CACHE = None
+
+
+def get_memory_cache() -> MemoryCache:
+    """
+    Returns the in-memory cache, if one is enabled
+
+    Returns:
+        MemoryCache: The active cache, or None
+    """
+    return _MEMORY_CACHE
+
+
+def enable_memory_cache(max_bytes: int = 1 << 30, ttl: dict = None,
+                        closed_ttl: float = CLOSED_TTL):
+    """
+    Keeps recently requested windows in memory so repeated requests in a
+    long-running process skip the server and the decode. Identical requests
+    made at the same time share one server request.
+
+    Args:
+        max_bytes (int, optional): The most bytes of rows to keep
+        ttl (dict, optional): Seconds windows that may still change stay fresh,
+            by datatype, for example ``{"intraday_stocks": 10}``
+        closed_ttl (float, optional): Seconds settled windows stay fresh
+
+    Returns:
+        None: On success, this will return nothing
+
+    Example::
+
+        import moabdb as mdb
+        mdb.enable_memory_cache(max_bytes=2 << 30)
+        df = mdb.get_equity("AAPL", "5y")
+        print(mdb.cache_stats())
+
+    """
+    # pylint: disable=global-statement
+    global _MEMORY_CACHE
+    _MEMORY_CACHE = MemoryCache(max_bytes, ttl, closed_ttl)
+
+
+def disable_memory_cache():
+    """
+    Stops using the in-memory cache and frees the windows it held
+
+    Returns:
+        None: On success, this will return nothing
+    """
+    # pylint: disable=global-statement
+    global _MEMORY_CACHE
+    _MEMORY_CACHE = None
+
+
+def cache_stats() -> dict:
+    """
+    Returns the in-memory cache's hit, miss and eviction counters
+
+    Returns:
+        dict: The counters, empty if the in-memory cache isn't enabled
+    """
+    memory = _MEMORY_CACHE
+    return {} if memory is None else memory.stats()
+
+
+def enable_shared_cache(path: str, ttl: dict = None,
+                        closed_ttl: float = CLOSED_TTL):
+    """
+    Shares fetched windows between processes through a directory.
+    When several processes on a machine request the same window, one of
+    them fetches it and the rest read its copy, so a machine sends each
+    request once no matter how many workers it runs.
+
+    Args:
+        path (str): The directory to share windows through,
+            the same for every process
+        ttl (dict, optional): Seconds windows that may still change stay fresh,
+            by datatype, for example ``{"intraday_stocks": 10}``
+        closed_ttl (float, optional): Seconds settled windows stay fresh
+
+    Returns:
+        None: On success, this will return nothing
+
+    Example::
+
+        import moabdb as mdb
+        mdb.enable_shared_cache("/dev/shm/moabdb")
+        df = mdb.get_equity("AAPL", "5y")
+
+    """
+    # pylint: disable=global-statement
+    global _SHARED_CACHE
+    _SHARED_CACHE = SharedCache(os.path.expanduser(path), ttl, closed_ttl)
+
+
+def disable_shared_cache():
+    """
+    Stops using the shared cache. Cached files are left in place.
+
+    Returns:
+        None: On success, this will return nothing
+    """
+    # pylint: disable=global-statement
+    global _SHARED_CACHE
+    _SHARED_CACHE = None
+
+
+def get_payload_cache() -> PayloadCache:
+    """
+    Returns the payload cache, if one is enabled
+
+    Returns:
+        PayloadCache: The active cache, or None
+    """
+    return _PAYLOAD_CACHE
+
+
+def enable_payload_cache(backend: CacheBackend, ttl: dict = None,
+                         closed_ttl: float = CLOSED_TTL):
+    """
+    Keeps the raw payloads returned by the server in a key-value store.
+    Pointing every machine in a cluster at the same ``RedisBackend``
+    means each window is downloaded once for the whole cluster.
+
+    Args:
+        backend (CacheBackend): The store to keep payloads in, such as
+            ``MemoryBackend``, ``DiskBackend`` or ``RedisBackend``
+        ttl (dict, optional): Seconds windows that may still change stay fresh,
+            by datatype, for example ``{"intraday_stocks": 10}``
+        closed_ttl (float, optional): Seconds settled windows stay fresh
+
+    Returns:
+        None: On success, this will return nothing
+
+    Example::
+
+        import moabdb as mdb
+        mdb.enable_payload_cache(mdb.RedisBackend("cache.internal"))
+        df = mdb.get_equity("AAPL", "5y")
+
+    """
+    if not isinstance(backend, CacheBackend):
+        raise errors.MoabRequestError("Backend must subclass CacheBackend")
+
+    # pylint: disable=global-statement
+    global _PAYLOAD_CACHE
+    _PAYLOAD_CACHE = PayloadCache(backend, ttl, closed_ttl)
+
+
+def disable_payload_cache():
+    """
+    Stops using the payload cache. The backend is left open.
+
+    Returns:
+        None: On success, this will return nothing
+    """
+    # pylint: disable=global-statement
+    global _PAYLOAD_CACHE
+    _PAYLOAD_CACHE = None
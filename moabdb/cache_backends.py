@@ -0,0 +1,293 @@
+"""MoabDB Cache Backends"""
+
+from collections import OrderedDict
+import hashlib
+import os
+import socket
+import struct
+import threading
+import time
+
+
+class CacheBackend:
+    """
+    Base class for the key-value stores that hold cached response payloads.
+    Backends are best effort: a store that can't be reached behaves like
+    an empty one instead of failing the request. Subclasses must be safe to
+    call from multiple threads at once.
+    """
+
+    def get(self, key: str) -> bytes:
+        """
+        Looks up a value
+
+        Args:
+            key (str): The key to look up
+
+        Returns:
+            bytes: The stored value, or None if it's missing or expired
+        """
+        raise NotImplementedError
+
+    def set(self, key: str, value: bytes, ttl: float):
+        """
+        Stores a value
+
+        Args:
+            key (str): The key to store the value under
+            value (bytes): The value to store
+            ttl (float): Seconds until the value expires
+        """
+        raise NotImplementedError
+
+    def delete(self, key: str):
+        """
+        Removes a value, if it's stored
+
+        Args:
+            key (str): The key to remove
+        """
+        raise NotImplementedError
+
+    def close(self):
+        """Releases any connections held by the backend"""
+
+
+class MemoryBackend(CacheBackend):
+    """
+    Keeps values in this process, evicting the least recently used ones
+    once their total size exceeds a byte budget.
+
+    Args:
+        max_bytes (int, optional): The most bytes of values to keep
+    """
+
+    def __init__(self, max_bytes: int = 1 << 30):
+        self.max_bytes = max_bytes
+        self._values = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                self._pop(key)
+                return None
+            self._values.move_to_end(key)
+            return entry[1]
+
+    def _pop(self, key):
+        _, value = self._values.pop(key)
+        self._bytes -= len(value)
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            if key in self._values:
+                self._pop(key)
+            if len(value) > self.max_bytes:
+                return
+            self._values[key] = (time.monotonic() + ttl, value)
+            self._bytes += len(value)
+            while self._bytes > self.max_bytes:
+                self._pop(next(iter(self._values)))
+
+    def delete(self, key):
+        with self._lock:
+            if key in self._values:
+                self._pop(key)
+
+
+class DiskBackend(CacheBackend):
+    """
+    Keeps values as files in a directory, which may be shared by
+    several processes.
+
+    Args:
+        path (str): The directory to keep values in
+    """
+
+    _EXPIRY = struct.Struct(">d")
+
+    def __init__(self, path: str):
+        self.path = os.path.expanduser(path)
+        os.makedirs(self.path, exist_ok=True)
+
+    def _file(self, key: str) -> str:
+        return os.path.join(self.path, hashlib.sha1(key.encode()).hexdigest())
+
+    def get(self, key):
+        try:
+            with open(self._file(key), "rb") as file:
+                value = file.read()
+        except OSError:
+            return None
+        if len(value) < self._EXPIRY.size:
+            return None
+        if self._EXPIRY.unpack_from(value)[0] < time.time():
+            return None
+        return value[self._EXPIRY.size:]
+
+    def set(self, key, value, ttl):
+        file = self._file(key)
+        temp = f"{file}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(temp, "wb") as out:
+                out.write(self._EXPIRY.pack(time.time() + ttl))
+                out.write(value)
+            os.replace(temp, file)
+        except OSError:
+            pass
+
+    def delete(self, key):
+        try:
+            os.remove(self._file(key))
+        except OSError:
+            pass
+
+
+class RedisBackend(CacheBackend):  # pylint: disable=too-many-instance-attributes
+    """
+    Keeps values in a server that speaks the Redis protocol, so machines
+    across a cluster can share what any of them fetched. Only the ``GET``,
+    ``SET``, ``DEL``, ``AUTH`` and ``SELECT`` commands are used.
+
+    Args:
+        host (str, optional): The server's host name
+        port (int, optional): The server's port
+        db (int, optional): The database number to select
+        password (str, optional): The password to authenticate with
+        prefix (str, optional): Prepended to every key
+        timeout (float, optional): Seconds to wait on the server
+        max_connections (int, optional): Idle connections to keep open
+    """
+
+    # pylint: disable=too-many-arguments
+    def __init__(self, host: str = "127.0.0.1", port: int = 6379, *,
+                 db: int = 0, password: str = None, prefix: str = "moabdb:",
+                 timeout: float = 5.0, max_connections: int = 16):
+        self.host = host
+        self.port = port
+        self.db = db
+        self.password = password
+        self.prefix = prefix
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self._idle = []
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        sock = socket.create_connection((self.host, self.port), self.timeout)
+        conn = (sock, sock.makefile("rb"))
+        try:
+            if self.password is not None:
+                _call(conn, "AUTH", self.password)
+            if self.db:
+                _call(conn, "SELECT", str(self.db))
+        except BaseException:
+            _hang_up(conn)
+            raise
+        return conn
+
+    def _command(self, *args):
+        """
+        Runs a command on a pooled connection, None if the server is
+        unreachable or its reply can't be read. The connection is dropped
+        after any error, as its stream may be left mid-reply.
+        """
+        with self._lock:
+            conn = self._idle.pop() if self._idle else None
+        try:
+            if conn is None:
+                conn = self._connect()
+            reply = _call(conn, *args)
+        except (OSError, ValueError, _RedisError):
+            if conn is not None:
+                _hang_up(conn)
+            return None
+
+        with self._lock:
+            if len(self._idle) < self.max_connections:
+                self._idle.append(conn)
+                conn = None
+        if conn is not None:
+            _hang_up(conn)
+        return reply
+
+    def get(self, key):
+        return self._command("GET", self.prefix + key)
+
+    def set(self, key, value, ttl):
+        self._command("SET", self.prefix + key, value,
+                      "PX", str(max(1, int(ttl * 1000))))
+
+    def delete(self, key):
+        self._command("DEL", self.prefix + key)
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            _hang_up(conn)
+
+
+class _RedisError(Exception):
+    """An error reply from a Redis protocol server"""
+
+
+def _call(conn, *args):
+    """Sends a command and reads its reply"""
+    sock, reader = conn
+    parts = [b"*%d\r\n" % len(args)]
+    for arg in args:
+        if isinstance(arg, str):
+            arg = arg.encode()
+        parts.append(b"$%d\r\n%s\r\n" % (len(arg), arg))
+    sock.sendall(b"".join(parts))
+    return read_reply(reader)
+
+
+def read_reply(reader):
+    """
+    Reads a single Redis protocol reply
+
+    Args:
+        reader (io.BufferedReader): The stream to read from
+
+    Returns:
+        The decoded reply: bytes, int, str, list or None
+    """
+    line = reader.readline()
+    if not line.endswith(b"\r\n"):
+        raise ConnectionError("Connection closed by server")
+    kind, body = line[:1], line[1:-2]
+
+    if kind == b"+":
+        return body.decode()
+    if kind == b"-":
+        raise _RedisError(body.decode())
+    if kind == b":":
+        return int(body)
+    if kind == b"$":
+        size = int(body)
+        if size < 0:
+            return None
+        value = reader.read(size + 2)
+        if len(value) != size + 2:
+            raise ConnectionError("Connection closed by server")
+        return value[:-2]
+    if kind == b"*":
+        size = int(body)
+        return None if size < 0 else [read_reply(reader) for _ in range(size)]
+    raise ConnectionError("Invalid reply from server")
+
+
+def _hang_up(conn):
+    sock, reader = conn
+    try:
+        reader.close()
+        sock.close()
+    except OSError:
+        pass
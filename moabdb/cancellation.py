@@ -0,0 +1,225 @@
+"""MoabDB Deadlines and Cancellation"""
+
+import contextlib
+import contextvars
+import threading
+import time
+from . import errors
+
+# Longest a wait goes without checking for cancellation, in seconds
+POLL_INTERVAL = 0.05
+
+_SCOPE = contextvars.ContextVar("moabdb_scope", default=None)
+
+
+class CancellationToken:
+    """
+    Stops the calls it's passed to from another thread. Cancelling stops
+    new requests from being scheduled and aborts the ones in flight, and
+    the call raises ``MoabCancelledError`` soon after. A token can be shared
+    by several calls and stays cancelled once cancelled.
+
+    Example::
+
+        import threading
+        import moabdb as mdb
+        token = mdb.CancellationToken()
+        threading.Timer(5, token.cancel).start()
+        df = mdb.get_equity(sp500_tickers, "1y", cancel=token)
+
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._callbacks = {}
+        self._lock = threading.Lock()
+
+    @property
+    def cancelled(self) -> bool:
+        """Whether ``cancel`` has been called"""
+        return self._event.is_set()
+
+    def cancel(self):
+        """Cancels every call using this token"""
+        with self._lock:
+            self._event.set()
+            callbacks, self._callbacks = list(self._callbacks.values()), {}
+        for callback in callbacks:
+            callback()
+
+    @contextlib.contextmanager
+    def on_cancel(self, callback):
+        """
+        Calls a function if the token is cancelled while the block runs
+
+        Args:
+            callback (callable): Called without arguments, from the
+                thread that cancels
+        """
+        key = object()
+        with self._lock:
+            cancelled = self._event.is_set()
+            if not cancelled:
+                self._callbacks[key] = callback
+        if cancelled:
+            callback()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._callbacks.pop(key, None)
+
+
+class Scope:
+    """
+    The deadline and cancellation tokens governing the requests made
+    within a ``scope`` block
+
+    Attributes:
+        deadline (float): The ``time.monotonic`` the work must finish by, or None
+        tokens (tuple): The tokens that can cancel the work
+    """
+
+    def __init__(self, deadline: float = None, tokens: tuple = ()):
+        self.deadline = deadline
+        self.tokens = tokens
+
+    @property
+    def cancelled(self) -> bool:
+        """Whether any of the scope's tokens has been cancelled"""
+        return any(token.cancelled for token in self.tokens)
+
+    def remaining(self) -> float:
+        """
+        Returns the seconds left before the deadline
+
+        Returns:
+            float: The seconds left, None if there's no deadline
+        """
+        if self.deadline is None:
+            return None
+        return self.deadline - time.monotonic()
+
+    def check(self):
+        """
+        Raises if the work should stop
+
+        Raises:
+            errors.MoabCancelledError: If a token has been cancelled
+            errors.MoabDeadlineError: If the deadline has passed
+        """
+        if self.cancelled:
+            raise errors.MoabCancelledError("Request was cancelled")
+        remaining = self.remaining()
+        if remaining is not None and remaining <= 0:
+            raise errors.MoabDeadlineError("Request deadline exceeded")
+
+    def interval(self, wait: float = None) -> float:
+        """Returns how long to wait before checking the scope again"""
+        wait = POLL_INTERVAL if wait is None else min(wait, POLL_INTERVAL)
+        remaining = self.remaining()
+        return wait if remaining is None else max(0.0, min(wait, remaining))
+
+    @contextlib.contextmanager
+    def on_cancel(self, callback):
+        """Calls a function if any of the scope's tokens is cancelled"""
+        with contextlib.ExitStack() as stack:
+            for token in self.tokens:
+                stack.enter_context(token.on_cancel(callback))
+            yield
+
+
+@contextlib.contextmanager
+def scope(deadline: float = None, cancel: CancellationToken = None):
+    """
+    Applies a deadline and a cancellation token to the requests made within
+    the block, including those made by worker threads through ``fan_out``.
+    Nested scopes keep the earlier deadline and every token.
+
+    Args:
+        deadline (float, optional): Seconds the block may take
+        cancel (CancellationToken, optional): A token that stops the block
+
+    Yields:
+        Scope: The combined scope, or None if there's neither
+    """
+    parent = _SCOPE.get()
+    if deadline is None and cancel is None:
+        yield parent
+        return
+    if deadline is not None and deadline <= 0:
+        raise errors.MoabRequestError("deadline must be positive")
+
+    ends = None if deadline is None else time.monotonic() + deadline
+    tokens = () if cancel is None else (cancel,)
+    if parent is not None:
+        if parent.deadline is not None:
+            ends = parent.deadline if ends is None else min(ends, parent.deadline)
+        tokens = parent.tokens + tokens
+
+    active = Scope(ends, tokens)
+    reset = _SCOPE.set(active)
+    try:
+        yield active
+    finally:
+        _SCOPE.reset(reset)
+
+
+def current() -> Scope:
+    """
+    Returns the scope governing the calling code
+
+    Returns:
+        Scope: The active scope, or None
+    """
+    return _SCOPE.get()
+
+
+def check():
+    """Raises if the active scope has been cancelled or run out of time"""
+    active = _SCOPE.get()
+    if active is not None:
+        active.check()
+
+
+def request_timeout(default: float) -> float:
+    """
+    Returns the timeout for the next request, shrunk to fit the deadline
+
+    Args:
+        default (float): The timeout to use without a deadline
+
+    Raises:
+        errors.MoabCancelledError: If the active scope has been cancelled
+        errors.MoabDeadlineError: If the deadline has passed
+
+    Returns:
+        float: Seconds the request may take
+    """
+    active = _SCOPE.get()
+    if active is None:
+        return default
+    active.check()
+    remaining = active.remaining()
+    return default if remaining is None else min(default, remaining)
+
+
+def sleep(seconds: float):
+    """
+    Sleeps, waking early to raise if the active scope is cancelled or
+    its deadline passes first
+
+    Args:
+        seconds (float): The time to sleep for
+    """
+    active = _SCOPE.get()
+    if active is None:
+        time.sleep(seconds)
+        return
+    ends = time.monotonic() + seconds
+    while True:
+        active.check()
+        left = ends - time.monotonic()
+        if left <= 0:
+            return
+        time.sleep(active.interval(left))
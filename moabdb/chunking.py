@@ -0,0 +1,150 @@
+"""MoabDB Time-Range Chunking"""
+
+import threading
+from . import errors
+
+# Payload bytes each request should stay under, unless configured otherwise
+DEFAULT_CHUNK_BYTES = 64 << 20
+
+# Payload bytes per calendar day assumed before any are observed
+DEFAULT_BYTES_PER_DAY = {"intraday_stocks": 1 << 20}
+
+# Weight of each new observation in the running estimate
+SMOOTHING = 0.2
+
+# Windows shorter than this many days aren't observed, as a few seconds
+# of data say little about the size of a whole day
+MIN_OBSERVED_DAYS = 1
+
+# Windows shorter than this many days are weighted down in proportion
+FULL_WEIGHT_DAYS = 7
+
+_DAY = 86400
+
+_CHUNK_BYTES = DEFAULT_CHUNK_BYTES
+_BYTES_PER_DAY = dict(DEFAULT_BYTES_PER_DAY)
+_LOCK = threading.Lock()
+
+
+def configure_chunking(chunk_bytes: int = DEFAULT_CHUNK_BYTES):
+    """
+    Sets how much data a single request may return. Longer windows are
+    split into sub-ranges that are requested in parallel and joined in
+    order, so no one request runs into the timeout and the memory held
+    per request stays bounded. Sub-ranges are sized from the payload
+    bytes per day seen so far for each datatype.
+
+    Args:
+        chunk_bytes (int, optional): The payload bytes each request
+            should stay under
+
+    Returns:
+        None: On success, this will return nothing
+
+    Example::
+
+        import moabdb as mdb
+        mdb.configure_chunking(16 << 20)
+        df = mdb.get_equity("SPY", start="2020-01-01", end="2023-01-01",
+                            intraday=True)
+
+    """
+    if chunk_bytes < 1:
+        raise errors.MoabRequestError("chunk_bytes must be positive")
+
+    # pylint: disable=global-statement
+    global _CHUNK_BYTES
+    _CHUNK_BYTES = chunk_bytes
+
+
+def disable_chunking():
+    """
+    Sends every window as a single request, however long
+
+    Returns:
+        None: On success, this will return nothing
+    """
+    # pylint: disable=global-statement
+    global _CHUNK_BYTES
+    _CHUNK_BYTES = None
+
+
+def observe(datatype: str, start: int, end: int, size: int):
+    """
+    Records the size of a payload returned for a window. Windows shorter
+    than ``MIN_OBSERVED_DAYS`` are ignored and windows shorter than
+    ``FULL_WEIGHT_DAYS`` count for less, so tail polls don't drag the
+    estimate down.
+
+    Args:
+        datatype (str): The datatype requested
+        start (int): The first epoch of the window
+        end (int): The last epoch of the window
+        size (int): The payload's size in bytes
+    """
+    days = (end - start + 1) / _DAY
+    if days < MIN_OBSERVED_DAYS:
+        return
+    per_day = size / days
+    weight = SMOOTHING * min(1.0, days / FULL_WEIGHT_DAYS)
+    with _LOCK:
+        estimate = _BYTES_PER_DAY.get(datatype)
+        _BYTES_PER_DAY[datatype] = per_day if estimate is None else \
+            estimate + weight * (per_day - estimate)
+
+
+def fit(datatype: str, start: int, end: int, limit: int) -> int:
+    """
+    Returns how many symbols' windows should fit in one request
+
+    Args:
+        datatype (str): The datatype requested
+        start (int): The first epoch of the window
+        end (int): The last epoch of the window
+        limit (int): The most symbols to return
+
+    Returns:
+        int: The number of symbols, between 1 and ``limit``
+    """
+    chunk_bytes = _CHUNK_BYTES
+    with _LOCK:
+        per_day = _BYTES_PER_DAY.get(datatype)
+    if chunk_bytes is None or not per_day:
+        return max(1, limit)
+    window = max(_DAY, end - start + 1) / _DAY * per_day
+    return max(1, min(limit, int(chunk_bytes // window)))
+
+
+def split(datatype: str, start: int, end: int) -> list:
+    """
+    Splits a window into sub-ranges that should each return about
+    ``chunk_bytes`` or less. Sub-range lengths are rounded down to a power
+    of two days and aligned to multiples of it, so repeated requests for
+    overlapping windows ask the caches for the same sub-ranges.
+
+    Args:
+        datatype (str): The datatype requested
+        start (int): The first epoch of the window
+        end (int): The last epoch of the window
+
+    Returns:
+        list: The ``(start, end)`` epochs of each sub-range, in order
+    """
+    chunk_bytes = _CHUNK_BYTES
+    with _LOCK:
+        per_day = _BYTES_PER_DAY.get(datatype)
+    if chunk_bytes is None or not per_day or \
+            (end - start + 1) / _DAY * per_day <= chunk_bytes:
+        return [(start, end)]
+
+    days = 1
+    while days * 2 * per_day <= chunk_bytes:
+        days *= 2
+    step = days * _DAY
+
+    windows = []
+    while start <= end:
+        stop = min(end, start - start % step + step - 1)
+        windows.append((start, stop))
+        start = stop + 1
+    return windows
@@ -1,17 +1,33 @@
 """MoabDB Constants Manager"""
 # pylint: disable=unused-import
 
-from typing import Union
+from typing import Iterator, Union
 import io
 import concurrent.futures as cf
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
 from . import proto_wrapper
+from . import retry
+from . import errors
 
 
 API_KEY = ""
 API_USERNAME = ""
 DB_URL = "https://api.moabdb.com/"
 
+# Payload format asked of the server, "arrow" or "parquet"
+PAYLOAD_FORMAT = "arrow"
+PAYLOAD_FORMATS = ["arrow", "parquet"]
+
+# Representations get_equity and get_rates can return
+OUTPUT_FORMATS = ["pandas", "arrow", "polars", "numpy"]
+
+# Most symbols asked for in a single request, 0 to request symbols one by one
+BATCH_SIZE = 500
+
 DAILY_COLUMNS = ['Symbol', 'Date', 'Open', 'High', 'Low', 'Close', 'VWAP',\
                  'BidPrc', 'AskPrc', 'Volume', 'Trades']
 
@@ -60,7 +76,11 @@ def login(username: str, key: str):
     req.token = key
     req.username = username
 
-    res = req.send(DB_URL + 'login/v1/')
+    policy = retry.get_retry_policy()
+    if policy is None:
+        res = req.send(DB_URL + 'login/v1/')
+    else:
+        res = policy.call(lambda: req.send(DB_URL + 'login/v1/'), hedge=False)
 
     res.throw()
     # pylint: disable=global-statement
@@ -69,3 +89,62 @@ def login(username: str, key: str):
 
     API_KEY = key
     API_USERNAME = username
+
+
+def set_payload_format(payload_format: str):
+    """
+    Chooses the payload format requested from the server.
+    Arrow IPC streams decode with almost no CPU work, Parquet payloads are smaller.
+    Servers that can't produce the requested format answer with Parquet.
+
+    Args:
+        payload_format (str): Either "arrow" or "parquet"
+
+    Returns:
+        None: On success, this will return nothing
+
+    Raises:
+        errors.MoabRequestError: If the format isn't supported
+
+    Example::
+
+        import moabdb as mdb
+        mdb.set_payload_format("parquet")
+
+    """
+    if payload_format not in PAYLOAD_FORMATS:
+        raise errors.MoabRequestError(
+            "Unknown payload format, accepts: " + ", ".join(PAYLOAD_FORMATS))
+
+    # pylint: disable=global-statement
+    global PAYLOAD_FORMAT
+    PAYLOAD_FORMAT = payload_format
+
+
+def set_batch_size(batch_size: int):
+    """
+    Chooses how many symbols a multi-ticker request asks for at once.
+    Batched symbols share one request, one credentials check and one payload.
+    If the server doesn't answer batches, symbols are requested one by one.
+
+    Args:
+        batch_size (int): The most symbols per request, 0 to disable batching
+
+    Returns:
+        None: On success, this will return nothing
+
+    Raises:
+        errors.MoabRequestError: If the size is negative
+
+    Example::
+
+        import moabdb as mdb
+        mdb.set_batch_size(100)
+
+    """
+    if batch_size < 0:
+        raise errors.MoabRequestError("batch_size can't be negative")
+
+    # pylint: disable=global-statement
+    global BATCH_SIZE
+    BATCH_SIZE = batch_size
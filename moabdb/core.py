@@ -10,7 +10,8 @@
 
 """
 
-All data retrieved using the ``moabdb`` API are returned as pandas DataFrames.
+All data retrieved using the ``moabdb`` API are returned as pandas DataFrames,
+or as Arrow tables, Polars frames or NumPy arrays when asked with ``output``.
 
 Usage without login
 -------------------
@@ -32,19 +33,31 @@ To view the source code visit https://github.com/MoabDB.
 
 """
 
-from . import constants
+from . import cancellation
 from . import errors
 from . import timewindows
-from .lib import _check_access, _server_req
-from .constants import pd, Union, cf
+from .cancellation import CancellationToken
+from .lib import _equity_datatype, _equity_symbols, _rates_datatype
+from .lib import _server_req, _server_req_many, _projection
+from .lib import _server_req_table, _server_req_iter, _sharing
+from .lib import _output_format, _output, _round_table, _to_pandas
+from .lib import _equity_frame, _rates_frame, _split_failures, _equity_table
+from .constants import pd, Union, Iterator, RATES_COLUMNS
 
 
 
+# pylint: disable=too-many-arguments,too-many-locals
 def get_equity(tickers: Union[str, list],
                sample: str = "1m",
                start: str = None,
                end: str = None,
-               intraday: bool = False) -> pd.DataFrame:
+               intraday: bool = False,
+               *,
+               columns: Union[str, list] = None,
+               output: str = "pandas",
+               on_error: str = "raise",
+               deadline: float = None,
+               cancel: CancellationToken = None) -> Union[pd.DataFrame, tuple]:
     """
 
     Returns a ``pandas.DataFrame`` of historical price and volume information
@@ -98,6 +111,31 @@ def get_equity(tickers: Union[str, list],
         Default is False to return end-of-day data.
         See moabdb.com for subscriptions for intraday access.
 
+    columns : str or list of str, optional
+        The columns to return, such as ``["Close", "Volume"]``. Only these
+        columns are downloaded and decoded, ``Symbol`` and the time column
+        are always included. Default is every column.
+
+    output : {"pandas", "arrow", "polars", "numpy"}, optional, default "pandas"
+        The representation to return. "arrow" returns a ``pyarrow.Table``,
+        "polars" a ``polars.DataFrame`` (requires polars), and "numpy" a
+        dict of contiguous NumPy arrays keyed by column. These skip pandas
+        entirely and are in long format: ``Symbol`` and the time column are
+        ordinary columns, with one row per ticker and time in ticker order.
+
+    on_error : {"raise", "collect"}, optional, default "raise"
+        With "raise", the first ticker that fails raises its error and
+        nothing is returned. With "collect", tickers that fail are left out
+        and reported instead, so only they need requesting again.
+
+    deadline : float, optional
+        Seconds the whole call may take. Each request's timeout shrinks to
+        fit what's left, and ``MoabDeadlineError`` is raised once it runs out.
+
+    cancel : CancellationToken, optional
+        A token that stops the call from another thread, raising
+        ``MoabCancelledError``.
+
 
     Returns
     -------
@@ -109,6 +147,13 @@ def get_equity(tickers: Union[str, list],
         index.If the request is for multiple tickers, the DataFrame will be returned
         with multi-index columns, with the first level being the ticker symbol.
 
+        With ``on_error="collect"``, a tuple of the DataFrame and a second
+        DataFrame with the ``Symbol``, ``Error`` class name and ``Message`` of
+        each ticker that failed.
+
+        With ``output`` other than "pandas", the rows in that representation
+        instead, see ``output``.
+
 
         Daily data includes the following variables:
 
@@ -190,57 +235,155 @@ def get_equity(tickers: Union[str, list],
         If the data requested wasn't found
     errors.MoabUnknownError:
         If the error code couldn't be parsed
+    errors.MoabDeadlineError:
+        If the call runs past its deadline
+    errors.MoabCancelledError:
+        If the call is cancelled through its token
 
     """
 
     # Check intraday authorization
-    if intraday is True:
-        equity_freq = "intraday_stocks"
-        columns = constants.INTRA_COLUMNS
-        if not _check_access():
-            raise errors.MoabRequestError(
-                "Intraday needs API credentials, see moabdb.com")
-    else:
-        equity_freq = "daily_stocks"
-        columns = constants.DAILY_COLUMNS
+    equity_freq, available = _equity_datatype(intraday)
+    projection = _projection(columns, available, 2)
+    arrow = _output_format(output) != "pandas"
+    if on_error not in ("raise", "collect"):
+        raise errors.MoabRequestError("on_error must be 'raise' or 'collect'")
+    collect = on_error == "collect"
 
     # String time to integer time
     start_tm, end_tm = timewindows.get_unix_dates(sample, start, end)
 
-    # Single ticker request
-    if isinstance(tickers, str):
-        return_db = _server_req(
-            str.upper(tickers), start_tm, end_tm, equity_freq)
-        return_db = return_db[columns]
-        return_db = return_db.set_index(columns[1])
-
-    # Multiple tickers request
-    elif isinstance(tickers, list):
-        processed = []
-        calls = len(tickers)
-        with cf.ThreadPoolExecutor() as pool:
-            for result in pool.map(_server_req, tickers, [start_tm]*calls,
-                                   [end_tm]*calls, [equity_freq]*calls):
-                processed.append(result)
-        return_db = pd.concat(processed)[columns]
-        return_db = return_db.set_index(columns[0:2]).unstack(0)
-
-    # Unknown ticker request
+    # Single or multiple tickers request
+    symbols = _equity_symbols(tickers)
+
+    with cancellation.scope(deadline, cancel):
+        if isinstance(tickers, str) and not collect:
+            request = _server_req_table if arrow else _server_req
+            processed = [request(symbols[0], start_tm, end_tm,
+                                 equity_freq, columns=projection)]
+        else:
+            processed = _server_req_many(symbols, start_tm, end_tm,
+                                         equity_freq, columns=projection,
+                                         return_exceptions=collect,
+                                         arrow=arrow)
+
+    # Shape and round the returned data
+    columns = projection or available
+    failures = None
+    if collect:
+        processed, failures = _split_failures(symbols, processed)
+    if arrow:
+        return_db = _output(_equity_table(processed, columns), output)
     else:
-        raise errors.MoabRequestError("Invalid window type")
+        return_db = _equity_frame(processed, columns, isinstance(tickers, str))
+    return return_db if failures is None else (return_db, failures)
+
+
+def iter_equity(ticker: str,
+                sample: str = "1m",
+                start: str = None,
+                end: str = None,
+                intraday: bool = False,
+                *,
+                columns: Union[str, list] = None,
+                output: str = "pandas") -> Iterator:
+    """
+
+    Yields the price and volume information of a single ticker in
+    consecutive slices, decoding each slice while the rest of the response
+    is still downloading. The first rows of a long intraday window arrive
+    long before the last, and only one slice needs to be held in memory
+    at a time.
+
+
+    Parameters
+    ----------
+    ticker : str
+        The ticker to look up.
+
+    sample : str, optional
+        Sample period length. It can be used alone or with ``start`` | ``end``.
 
-    # Round float columns
-    float_columns = return_db.select_dtypes(include=['float32', 'float64'])
-    if float_columns.size > 0:
-        return_db[float_columns.columns] = float_columns.astype(
-            'float64').round(4)
+    start : str, optional
+        Sample start date. Requires one of ``end`` or ``sample``.
+
+    end : str, optional
+        Sample end date. Requires one of ``start`` or ``sample``.
 
-    return return_db
+    intraday : bool, optional, default False
+        Set to True to return intraday data.
+        Default is False to return end-of-day data.
+        See moabdb.com for subscriptions for intraday access.
+
+    columns : str or list of str, optional
+        The columns to return, see ``get_equity``.
+
+    output : {"pandas", "arrow", "polars", "numpy"}, optional, default "pandas"
+        The representation of each slice, see ``get_equity``.
+
+
+    Yields
+    ------
+    out : pandas.DataFrame
+        Consecutive slices of the rows ``get_equity(ticker, ...)`` returns,
+        in time order and shaped the same way.
+
+
+    Raises
+    ------
+    errors.MoabResponseError:
+        If there's a problem interpreting the response
+    errors.MoabRequestError:
+        If the server has a problem interpreting the request,
+        or if an invalid parameter is passed
+    errors.MoabInternalError:
+        If the server runs into an unrecoverable error internally
+    errors.MoabHttpError:
+        If there's a problem transporting the payload or receiving a response
+    errors.MoabUnauthorizedError:
+        If the user is not authorized to request the datatype
+    errors.MoabNotFoundError:
+        If the data requested wasn't found
+    errors.MoabUnknownError:
+        If the error code couldn't be parsed
+
+
+    Example::
+
+        import moabdb as mdb
+        for df in mdb.iter_equity("SPY", "1y", intraday=True):
+            process(df)
+
+    """
+
+    # Check intraday authorization
+    equity_freq, available = _equity_datatype(intraday)
+    projection = _projection(columns, available, 2)
+    arrow = _output_format(output) != "pandas"
+    if not isinstance(ticker, str):
+        raise errors.MoabRequestError("iter_equity takes a single ticker")
+
+    # String time to integer time
+    start_tm, end_tm = timewindows.get_unix_dates(sample, start, end)
+
+    columns = projection or available
+    for table in _server_req_iter(_equity_symbols(ticker)[0], start_tm,
+                                  end_tm, equity_freq, projection):
+        if arrow:
+            yield _output(_round_table(table.select(columns)), output)
+        else:
+            yield _equity_frame([_to_pandas(table, release=not _sharing())],
+                                columns, True)
 
 
 def get_rates(sample: str = "1y",
               start: str = None,
-              end: str = None) -> pd.DataFrame:
+              end: str = None,
+              *,
+              columns: Union[str, list] = None,
+              output: str = "pandas",
+              deadline: float = None,
+              cancel: CancellationToken = None) -> pd.DataFrame:
     """
 
     Returns a ``pandas.DataFrame`` of historical interest rates.
@@ -263,6 +406,23 @@ def get_rates(sample: str = "1y",
     end : str, optional
         Sample end date. Requires one of ``start`` or ``sample``.
 
+    columns : str or list of str, optional
+        The columns to return, such as ``"Treasury_10y"``. Only these
+        columns are downloaded and decoded, ``Date`` is always included.
+        Default is every column.
+
+    output : {"pandas", "arrow", "polars", "numpy"}, optional, default "pandas"
+        The representation to return, see ``get_equity``. Other than
+        "pandas", ``Date`` is an ordinary column.
+
+    deadline : float, optional
+        Seconds the whole call may take. Each request's timeout shrinks to
+        fit what's left, and ``MoabDeadlineError`` is raised once it runs out.
+
+    cancel : CancellationToken, optional
+        A token that stops the call from another thread, raising
+        ``MoabCancelledError``.
+
 
     Returns
     -------
@@ -329,23 +489,28 @@ def get_rates(sample: str = "1y",
         If the data requested wasn't found
     errors.MoabUnknownError:
         If the error code couldn't be parsed
+    errors.MoabDeadlineError:
+        If the call runs past its deadline
+    errors.MoabCancelledError:
+        If the call is cancelled through its token
 
     """
 
     # Check authorization
-    if not _check_access():
-        raise errors.MoabRequestError(
-            "Premium datasets needs API credentials, see moabdb.com")
+    symbol, datatype = _rates_datatype()
+    projection = _projection(columns, RATES_COLUMNS, 1)
+    arrow = _output_format(output) != "pandas"
 
     # String time to integer time
     start_tm, end_tm = timewindows.get_unix_dates(sample, start, end)
 
     # Request treasury data
-    columns = constants.RATES_COLUMNS
-    return_db = _server_req("INTERNAL_TREASURY",
-                            start_tm, end_tm, "treasuries")
+    with cancellation.scope(deadline, cancel):
+        request = _server_req_table if arrow else _server_req
+        return_db = request(symbol, start_tm, end_tm, datatype,
+                            columns=projection)
 
     # Format treasury data
-    return_db = return_db[columns].set_index(columns[0])
-
-    return return_db
+    if arrow:
+        return _output(return_db.select(projection or RATES_COLUMNS), output)
+    return _rates_frame(return_db, projection)
@@ -133,3 +133,57 @@ class MoabUnknownError(MoabError):
 
     def __str__(self):
         return self.message
+
+
+class MoabThrottledError(MoabRequestError):
+    """Exception raised when the server rejects a request for exceeding its rate limit.
+        Raised once the limiter has given up retrying, see ``configure_limiter``.
+
+    Args:
+        message (str): The message that was returned with the error
+        retry_after (float, optional): Seconds the server asked the client to wait
+
+    Attributes:
+        message (str): The message that was returned with the error
+        retry_after (float): Seconds the server asked the client to wait, or None
+    """
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class MoabCancelledError(MoabError):
+    """Exception raised when a request is stopped through its ``CancellationToken``
+
+    Args:
+        message (str): A description of what was cancelled
+
+    Attributes:
+        message (str): A description of what was cancelled
+    """
+
+    def __init__(self, message):
+        super().__init__(message)
+        self.message = message
+
+    def __str__(self):
+        return self.message
+
+
+class MoabDeadlineError(MoabError):
+    """Exception raised when a call runs past the ``deadline`` it was given
+
+    Args:
+        message (str): A description of what ran out of time
+
+    Attributes:
+        message (str): A description of what ran out of time
+    """
+
+    def __init__(self, message):
+        super().__init__(message)
+        self.message = message
+
+    def __str__(self):
+        return self.message
@@ -0,0 +1,314 @@
+"""MoabDB Shared Executor"""
+
+from collections import deque
+import asyncio
+import contextlib
+import contextvars
+import functools
+import os
+import threading
+from .constants import cf
+from . import cancellation
+from . import errors
+
+# Worker threads of the shared executor, unless configured otherwise
+DEFAULT_MAX_WORKERS = min(32, (os.cpu_count() or 1) + 4)
+
+_EXECUTOR = None
+_MAX_WORKERS = DEFAULT_MAX_WORKERS
+_LIMIT = None
+_LOCK = threading.Lock()
+_WORKER = threading.local()
+
+
+def configure_executor(max_workers: int = DEFAULT_MAX_WORKERS,
+                       max_in_flight: int = None):
+    """
+    Configures the worker threads shared by every multi-ticker request in
+    the process, and the limit on requests in flight across all callers.
+    Requests already running finish under the previous settings.
+
+    Args:
+        max_workers (int, optional): The number of worker threads
+        max_in_flight (int, optional): The most requests to have in flight
+            at once across all threads and event loops, None for no limit
+
+    Returns:
+        None: On success, this will return nothing
+
+    Example::
+
+        import moabdb as mdb
+        mdb.configure_executor(max_workers=64, max_in_flight=16)
+        df = mdb.get_equity(sp500_tickers, "1y")
+
+    """
+    if max_workers < 1:
+        raise errors.MoabRequestError("max_workers must be positive")
+    if max_in_flight is not None and max_in_flight < 1:
+        raise errors.MoabRequestError("max_in_flight must be positive")
+
+    # pylint: disable=global-statement
+    global _EXECUTOR, _MAX_WORKERS, _LIMIT
+
+    with _LOCK:
+        previous = _EXECUTOR
+        _EXECUTOR = None
+        _MAX_WORKERS = max_workers
+        _LIMIT = None if max_in_flight is None else _Slots(max_in_flight)
+    if previous is not None:
+        previous.shutdown(wait=False)
+
+
+def get_executor() -> cf.ThreadPoolExecutor:
+    """
+    Returns the executor shared by the library, creating it on first use
+
+    Returns:
+        concurrent.futures.ThreadPoolExecutor: The shared executor
+    """
+    # pylint: disable=global-statement
+    global _EXECUTOR
+
+    executor = _EXECUTOR
+    if executor is not None:
+        return executor
+
+    with _LOCK:
+        if _EXECUTOR is None:
+            _EXECUTOR = cf.ThreadPoolExecutor(
+                _MAX_WORKERS, thread_name_prefix="moabdb",
+                initializer=_mark_worker)
+        return _EXECUTOR
+
+
+def _mark_worker():
+    _WORKER.active = True
+
+
+def fan_out(function, *iterables, return_exceptions: bool = False) -> list:
+    """
+    Maps a function over the shared executor and returns the results in
+    order. Called from one of the executor's own workers, calls that no
+    worker has started yet are run by the calling worker itself, so nested
+    bulk requests spread over idle workers but can't deadlock the pool.
+
+    The calls run within the caller's ``cancellation.scope``. If the scope
+    is cancelled or runs out of time, or a call fails, calls that haven't
+    started are dropped and this raises without waiting on the ones in flight.
+
+    Args:
+        function (callable): The function to call
+        *iterables: The arguments of each call, as in ``map``
+        return_exceptions (bool, optional): Whether a call failing with a
+            ``MoabError`` returns the error in place of its result, rather
+            than raising. Cancellation and deadline errors are still raised.
+
+    Returns:
+        list: The result of each call
+    """
+    if return_exceptions:
+        function = functools.partial(_returning_errors, function)
+
+    pool = get_executor()
+    calls = list(zip(*iterables))
+    futures = [pool.submit(contextvars.copy_context().run, function, *args)
+               for args in calls]
+    scope = cancellation.current()
+    try:
+        if getattr(_WORKER, "active", False):
+            return [_run_or_wait(future, function, args, scope)
+                    for future, args in zip(futures, calls)]
+
+        pending = futures
+        while pending:
+            if scope is not None:
+                scope.check()
+            done, pending = cf.wait(
+                pending, None if scope is None else scope.interval(),
+                return_when=cf.FIRST_EXCEPTION)
+            failed = [future for future in futures
+                      if future in done and future.exception() is not None]
+            if failed:
+                raise failed[0].exception()
+        return [future.result() for future in futures]
+    finally:
+        for future in futures:
+            future.cancel()
+
+
+def _run_or_wait(future: cf.Future, function, args: tuple, scope):
+    """Runs a call in this thread unless a worker has started it, then waits for it"""
+    if future.cancel():
+        if scope is not None:
+            scope.check()
+        return function(*args)
+    while True:
+        if scope is not None:
+            scope.check()
+        try:
+            return future.result(None if scope is None else scope.interval())
+        except cf.TimeoutError:
+            continue
+
+
+def _returning_errors(function, *args):
+    """Calls a function, returning the ``MoabError`` it raises"""
+    try:
+        return function(*args)
+    except (errors.MoabCancelledError, errors.MoabDeadlineError):
+        raise
+    except errors.MoabError as exc:
+        return exc
+
+
+class AsyncWaiters:
+    """
+    Coroutines waiting to be woken from any thread, such as when another
+    thread frees what they wait for. Waiting doesn't hold a thread.
+    """
+
+    def __init__(self):
+        self._waiting = deque()
+        self._lock = threading.Lock()
+
+    def add(self) -> asyncio.Future:
+        """
+        Registers the running coroutine as waiting. Call it under the lock
+        that guards what's being waited for, so a wake can't be missed.
+
+        Returns:
+            asyncio.Future: The future to pass to ``wait``
+        """
+        waiter = asyncio.get_running_loop().create_future()
+        with self._lock:
+            self._waiting.append(waiter)
+        return waiter
+
+    async def wait(self, waiter: asyncio.Future, timeout: float = None):
+        """
+        Waits until woken by ``notify`` or until the timeout passes
+
+        Args:
+            waiter (asyncio.Future): The future returned by ``add``
+            timeout (float, optional): Seconds to wait, None for no limit
+        """
+        try:
+            await asyncio.wait((waiter,), timeout=timeout)
+        except asyncio.CancelledError:
+            if waiter.done():
+                # Pass on a wake that's no longer going to be used
+                self.notify()
+            raise
+        finally:
+            if not waiter.done():
+                waiter.cancel()
+                with self._lock:
+                    if waiter in self._waiting:
+                        self._waiting.remove(waiter)
+
+    def notify(self):
+        """Wakes the longest waiting coroutine, if any"""
+        while True:
+            with self._lock:
+                if not self._waiting:
+                    return
+                waiter = self._waiting.popleft()
+            try:
+                waiter.get_loop().call_soon_threadsafe(self._wake, waiter)
+                return
+            except RuntimeError:
+                # Its event loop has closed
+                continue
+
+    def notify_all(self):
+        """Wakes every waiting coroutine"""
+        with self._lock:
+            waiting, self._waiting = self._waiting, deque()
+        for waiter in waiting:
+            try:
+                waiter.get_loop().call_soon_threadsafe(self._wake, waiter)
+            except RuntimeError:
+                pass
+
+    def _wake(self, waiter: asyncio.Future):
+        if waiter.done():
+            # It stopped waiting before the wake arrived
+            self.notify()
+        else:
+            waiter.set_result(None)
+
+
+class _Slots:
+    """The in-flight request slots, shared by threads and event loops"""
+
+    def __init__(self, size: int):
+        self._free = size
+        self._cond = threading.Condition()
+        self._waiters = AsyncWaiters()
+
+    def acquire(self, timeout: float = None) -> bool:
+        """Takes a slot, waiting up to ``timeout`` seconds for one to free up"""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._free > 0, timeout):
+                return False
+            self._free -= 1
+            return True
+
+    async def acquire_async(self, timeout: float = None) -> bool:
+        """Coroutine version of ``acquire``"""
+        with self._cond:
+            if self._free > 0:
+                self._free -= 1
+                return True
+            waiter = self._waiters.add()
+        await self._waiters.wait(waiter, timeout)
+        with self._cond:
+            if self._free > 0:
+                self._free -= 1
+                return True
+            return False
+
+    def release(self):
+        """Returns a slot"""
+        with self._cond:
+            self._free += 1
+            self._cond.notify()
+        self._waiters.notify()
+
+
+@contextlib.contextmanager
+def in_flight():
+    """Holds one of the in-flight request slots while a request is sent"""
+    limit = _LIMIT
+    if limit is None:
+        yield
+        return
+    scope = cancellation.current()
+    while not limit.acquire(None if scope is None else scope.interval()):
+        scope.check()
+    try:
+        yield
+    finally:
+        limit.release()
+
+
+@contextlib.asynccontextmanager
+async def in_flight_async():
+    """
+    Holds an in-flight request slot without blocking the event loop or
+    a thread, until the active scope is cancelled or runs out of time
+    """
+    limit = _LIMIT
+    if limit is None:
+        yield
+        return
+    scope = cancellation.current()
+    while not await limit.acquire_async(
+            None if scope is None else scope.interval()):
+        if scope is not None:
+            scope.check()
+    try:
+        yield
+    finally:
+        limit.release()
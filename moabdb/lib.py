@@ -1,9 +1,29 @@
 """MoabDB API Library"""
 
+from typing import Iterator
+import asyncio
+import functools
+import weakref
+from . import cache
+from . import cancellation
+from . import chunking
 from . import constants
+from . import executor
+from . import limiter
 from . import proto_wrapper
+from . import retry
+from . import transport
 from . import errors
-from .constants import pd, io
+from .constants import pd, pa, pc, pq, io, np
+
+try:
+    import polars as pl
+except ImportError:
+    pl = None
+
+# URLs found not to answer batched requests, by the transport reaching them
+_UNBATCHED = weakref.WeakKeyDictionary()
+
 
 def _check_access() -> bool:
     """
@@ -17,7 +37,251 @@ def _check_access() -> bool:
     return not (constants.API_KEY == "" or constants.API_USERNAME == "")
 
 
-def _server_req(ticker, start, end, datatype) -> pd.DataFrame:
+def _equity_datatype(intraday: bool) -> tuple:
+    """
+    Picks the datatype and columns of an equity request
+
+    Args:
+        intraday (bool): Whether intraday data is requested
+
+    Raises:
+        errors.MoabRequestError: If intraday data is requested without credentials
+
+    Returns:
+        tuple: The datatype and its columns
+    """
+    if intraday is True:
+        if not _check_access():
+            raise errors.MoabRequestError(
+                "Intraday needs API credentials, see moabdb.com")
+        return "intraday_stocks", constants.INTRA_COLUMNS
+    return "daily_stocks", constants.DAILY_COLUMNS
+
+
+def _rates_datatype() -> tuple:
+    """
+    Picks the symbol and datatype of a rates request
+
+    Raises:
+        errors.MoabRequestError: If the user hasn't set credentials
+
+    Returns:
+        tuple: The symbol and datatype
+    """
+    if not _check_access():
+        raise errors.MoabRequestError(
+            "Premium datasets needs API credentials, see moabdb.com")
+    return "INTERNAL_TREASURY", "treasuries"
+
+
+def _equity_symbols(tickers) -> list:
+    """
+    Lists the symbols of an equity request
+
+    Args:
+        tickers (str or list): A single ticker, or a list of tickers
+
+    Raises:
+        errors.MoabRequestError: If tickers is neither a string nor a list
+
+    Returns:
+        list: The symbols to request, upper case and without duplicates
+    """
+    if isinstance(tickers, str):
+        return [str.upper(tickers)]
+    if isinstance(tickers, list):
+        return list(dict.fromkeys(map(str.upper, tickers)))
+    raise errors.MoabRequestError("Invalid window type")
+
+
+def _projection(requested, available: list, keys: int) -> list:
+    """
+    Picks the columns to request
+
+    Args:
+        requested (str or list): The columns asked for, None for all of them
+        available (list): The columns of the datatype, key columns first
+        keys (int): The number of key columns, which are always included
+
+    Raises:
+        errors.MoabRequestError: If a column isn't available
+
+    Returns:
+        list: The key columns followed by the requested columns,
+        None if all of them are requested
+    """
+    if requested is None:
+        return None
+    if isinstance(requested, str):
+        requested = [requested]
+    unknown = [column for column in requested if column not in available]
+    if unknown:
+        raise errors.MoabRequestError(
+            "Unknown columns: " + ", ".join(map(str, unknown)))
+    return list(dict.fromkeys(available[:keys] + list(requested)))
+
+
+def _round_floats(frame: pd.DataFrame) -> pd.DataFrame:
+    """
+    Rounds the float columns of a returned frame to 4 decimal places
+
+    Args:
+        frame (pandas.DataFrame): The frame to round, modified in place
+
+    Returns:
+        pandas.DataFrame: The same frame
+    """
+    float_columns = frame.select_dtypes(include=['float32', 'float64'])
+    if float_columns.size > 0:
+        frame[float_columns.columns] = float_columns.astype(
+            'float64').round(4)
+    return frame
+
+
+def _equity_frame(frames: list, columns: list, single: bool) -> pd.DataFrame:
+    """
+    Shapes the frames returned for an equity request like ``get_equity``
+
+    Args:
+        frames (list): The returned frame of each ticker, in order
+        columns (list): The columns of the datatype, symbol and time first
+        single (bool): Whether a single ticker was requested as a string
+
+    Returns:
+        pandas.DataFrame: Indexed by time, with a column level per ticker
+        unless a single ticker was requested
+    """
+    if not frames:
+        return pd.DataFrame()
+    if single:
+        return_db = frames[0][columns].set_index(columns[1])
+    else:
+        return_db = pd.concat(frames)[columns]
+        return_db = return_db.set_index(columns[0:2]).unstack(0)
+    return _round_floats(return_db)
+
+
+def _split_failures(tickers: list, results: list) -> tuple:
+    """
+    Separates the frames returned by a bulk request from its failures
+
+    Args:
+        tickers (list): The ticker of each request, in order
+        results (list): The returned frame or raised ``MoabError`` of each request
+
+    Returns:
+        tuple: The returned frames, and a ``pandas.DataFrame`` with the
+        ``Symbol``, ``Error`` class name and ``Message`` of each failure
+    """
+    frames, failures = [], []
+    for ticker, result in zip(tickers, results):
+        if isinstance(result, errors.MoabError):
+            failures.append((ticker, type(result).__name__, str(result)))
+        else:
+            frames.append(result)
+    return frames, pd.DataFrame(failures,
+                                columns=["Symbol", "Error", "Message"])
+
+
+def _rates_frame(frame: pd.DataFrame, columns: list = None) -> pd.DataFrame:
+    """
+    Shapes the frame returned for a rates request like ``get_rates``
+
+    Args:
+        frame (pandas.DataFrame): The returned treasury data
+        columns (list, optional): The columns requested, date first
+
+    Returns:
+        pandas.DataFrame: Indexed by date
+    """
+    columns = columns or constants.RATES_COLUMNS
+    return frame[columns].set_index(columns[0])
+
+
+def _output_format(output: str) -> str:
+    """
+    Checks a requested output format
+
+    Args:
+        output (str): One of ``constants.OUTPUT_FORMATS``
+
+    Raises:
+        errors.MoabRequestError: If the format is unknown, or needs a
+            package that isn't installed
+
+    Returns:
+        str: The same format
+    """
+    if output not in constants.OUTPUT_FORMATS:
+        raise errors.MoabRequestError(
+            "output must be one of " + ", ".join(constants.OUTPUT_FORMATS))
+    if output == "polars" and pl is None:
+        raise errors.MoabRequestError(
+            "Polars output needs polars, install with 'pip install polars'")
+    return output
+
+
+def _round_table(table: pa.Table) -> pa.Table:
+    """
+    Rounds the float columns of a returned table to 4 decimal places,
+    like ``_round_floats``
+
+    Args:
+        table (pyarrow.Table): The table to round
+
+    Returns:
+        pyarrow.Table: The rounded table
+    """
+    for position, field in enumerate(table.schema):
+        if pa.types.is_floating(field.type):
+            table = table.set_column(position, field.name, pc.round(
+                table.column(position).cast(pa.float64()), 4))
+    return table
+
+
+def _equity_table(tables: list, columns: list) -> pa.Table:
+    """
+    Joins the tables returned for an equity request in long format
+
+    Args:
+        tables (list): The returned table of each ticker, in order
+        columns (list): The columns of the datatype, symbol and time first
+
+    Returns:
+        pyarrow.Table: One row per ticker and time, in ticker order
+    """
+    if not tables:
+        return pa.table({column: pa.array([]) for column in columns})
+    return _round_table(_concat_tables(
+        [table.select(columns) for table in tables]))
+
+
+def _output(table: pa.Table, output: str):
+    """
+    Converts a shaped table to the requested output format. The schema
+    metadata is dropped, it holds the server's pandas metadata and the
+    etag attached by the caches.
+
+    Args:
+        table (pyarrow.Table): The rows to return
+        output (str): "arrow", "polars" or "numpy"
+
+    Returns:
+        The table, a ``polars.DataFrame``, or a dict of contiguous
+        NumPy arrays keyed by column
+    """
+    table = table.replace_schema_metadata(None)
+    if output == "polars":
+        return pl.from_arrow(table)
+    if output == "numpy":
+        table = table.combine_chunks()
+        return {name: np.ascontiguousarray(
+                    table.column(name).to_numpy())
+                for name in table.column_names}
+    return table
+
+
+def _server_req(ticker, start, end, datatype, columns=None) -> pd.DataFrame:
     """
     Creates a high level request and parses the response
 
@@ -26,6 +290,10 @@ def _server_req(ticker, start, end, datatype) -> pd.DataFrame:
         start (int): The unix epoch time to start the query from
         end (int): The unix epoch time to stop searching at
         datatype (str): The data type that's being requested
+        columns (list, optional): The columns to return, None for all.
+            The server is asked for just these columns and only they are
+            decoded. While a cache is enabled, whole windows are fetched
+            so the cached copy serves any columns.
 
     Raises:
         errors.MoabResponseError: If there's a problem interpreting the response
@@ -40,25 +308,590 @@ def _server_req(ticker, start, end, datatype) -> pd.DataFrame:
         pandas.DataFrame: A DataFrame containing the returned data.
 
     """
+    return _to_pandas(_server_req_table(ticker, start, end, datatype, columns),
+                      release=not _sharing())
+
+
+def _server_req_table(ticker, start, end, datatype, columns=None) -> pa.Table:
+    """
+    Creates a high level request and returns the response as Arrow,
+    see _server_req for arguments and errors
+
+    Returns:
+        pyarrow.Table: The returned data, shared with the memory cache
+        while it's enabled
+    """
+    # Long windows are requested as sub-ranges in parallel
+    windows = chunking.split(datatype, start, end)
+    if len(windows) > 1:
+        calls = len(windows)
+        return _join_windows(executor.fan_out(
+            functools.partial(_server_req_window, columns=columns),
+            [ticker]*calls, *zip(*windows), [datatype]*calls,
+            return_exceptions=True))
+    return _server_req_window(ticker, start, end, datatype, columns)
+
+
+def _caching() -> bool:
+    """Whether any cache is enabled"""
+    return bool(cache.active_caches()) or cache.get_payload_cache() is not None
+
+
+def _sharing() -> bool:
+    """Whether returned tables are shared with the memory cache"""
+    return any(isinstance(layer, cache.MemoryCache)
+               for layer in cache.active_caches())
+
+
+# pylint: disable=too-many-arguments,too-many-locals
+def _server_req_many(tickers, start, end, datatype, *, columns=None,
+                     return_exceptions: bool = False,
+                     arrow: bool = False) -> list:
+    """
+    Requests the same window for several tickers. While no cache is
+    enabled, tickers are asked for in batches of up to
+    ``constants.BATCH_SIZE``, sized to keep each payload within the
+    chunk size, and the batches are requested concurrently. Tickers the
+    server didn't answer in a batch are requested one by one.
+    See _server_req for arguments and errors.
+
+    Args:
+        tickers (list): The tickers to query, without duplicates
+        return_exceptions (bool, optional): Whether a ticker that fails
+            returns its ``MoabError`` in place of its frame
+        arrow (bool, optional): Whether to return Arrow tables instead
+            of DataFrames
+
+    Returns:
+        list: The frame, or error, of each ticker in order
+    """
+    size = 1
+    if not _caching() and len(tickers) > 1 and constants.BATCH_SIZE > 1 \
+            and _batching():
+        size = chunking.fit(datatype, start, end, constants.BATCH_SIZE)
+
+    results = {}
+    if size > 1:
+        batches = [tickers[first:first + size]
+                   for first in range(0, len(tickers), size)]
+        calls = len(batches)
+        answers = executor.fan_out(
+            functools.partial(_server_req_batch, columns=columns, arrow=arrow),
+            batches, [start]*calls, [end]*calls, [datatype]*calls,
+            return_exceptions=return_exceptions)
+        for batch, answer in zip(batches, answers):
+            if isinstance(answer, errors.MoabError):
+                answer = dict.fromkeys(batch, answer)
+            results.update(answer or {})
+
+    rest = [ticker for ticker in tickers if ticker not in results]
+    calls = len(rest)
+    results.update(zip(rest, executor.fan_out(
+        functools.partial(_server_req_table if arrow else _server_req,
+                          columns=columns),
+        rest, [start]*calls, [end]*calls, [datatype]*calls,
+        return_exceptions=return_exceptions)))
+
+    ordered = [results[ticker] for ticker in tickers]
+    if not return_exceptions:
+        for result in ordered:
+            if isinstance(result, errors.MoabError):
+                raise result
+    return ordered
+
+
+def _batching() -> bool:
+    """Whether the server reached through the active transport answers batches"""
+    return constants.DB_URL not in _UNBATCHED.get(transport.get_transport(), ())
+
+
+def _server_req_batch(tickers, start, end, datatype, *, columns=None,
+                      arrow: bool = False) -> dict:
+    """
+    Requests a window for several tickers in a single request,
+    see _server_req for arguments and errors
+
+    Returns:
+        dict: The frame, or Arrow table, of each ticker, or the
+        ``MoabNotFoundError`` of tickers without data. None if the server
+        doesn't answer batches, it's then no longer sent any.
+    """
+    req = _make_request("", start, end, datatype, columns)
+    req.symbols.extend(tickers)
+    res = _send(req.send, constants.DB_URL + 'request/v1/',
+                datatype + "/batch")
+
+    if not res.batched:
+        # Servers that predate batches read the request as one for symbol ""
+        if res.code not in (200, 400, 404):
+            res.throw()
+        _UNBATCHED.setdefault(transport.get_transport(),
+                              set()).add(constants.DB_URL)
+        return None
+    missing = {ticker: errors.MoabNotFoundError(ticker + " not found")
+               for ticker in tickers}
+    if res.code == 404:
+        return missing
+    res.throw()
+
+    # Each read of a bytes field may copy the whole payload
+    data = res.data
+    found = _split_symbols(_decode_table(data, res.format, columns))
+    if found and columns is None:
+        chunking.observe(datatype, start, end, len(data) // len(found))
+    if not arrow:
+        found = {symbol: _to_pandas(table) for symbol, table in found.items()}
+    return {ticker: found.get(ticker, missing[ticker]) for ticker in tickers}
+
+
+def _split_symbols(table: pa.Table) -> dict:
+    """
+    Splits the rows of a batched response by symbol, keeping their order
+
+    Args:
+        table (pyarrow.Table): Rows of several symbols, with a ``Symbol`` column
+
+    Returns:
+        dict: The rows of each symbol
+    """
+    encoded = pc.dictionary_encode(
+        table.column("Symbol")).combine_chunks()
+    codes = encoded.indices.to_numpy(zero_copy_only=False)
+    order = np.argsort(codes, kind="stable")
+    table = table.take(pa.array(order))
+    ends = np.cumsum(np.bincount(codes, minlength=len(encoded.dictionary)))
+    return {symbol: table.slice(end - count, count)
+            for symbol, end, count in zip(
+                encoded.dictionary.to_pylist(), ends,
+                np.diff(ends, prepend=0))}
+
+
+def _server_req_window(ticker, start, end, datatype, columns=None) -> pa.Table:
+    """
+    Requests a single window through the enabled caches,
+    see _server_req for arguments and errors
+    """
+    # Each enabled cache answers or asks the next, the last asks the server
+    layers = cache.active_caches()
+    if not layers:
+        if datatype == "intraday_stocks" and \
+                cache.get_payload_cache() is None:
+            # Decode while the body downloads instead of buffering it whole
+            return _read_window(ticker, start, end, datatype, columns)
+        return _fetch_table(ticker, start, end, datatype, columns=columns)
+
+    load = _fetch_table
+    for layer in reversed(layers):
+        load = functools.partial(layer.fetch, fetch=load)
+    table = load(ticker, start, end, datatype)
+    return table if columns is None else table.select(columns)
+
+
+async def _server_req_async(ticker, start, end, datatype,
+                            columns=None) -> pd.DataFrame:
+    """
+    Creates a high level request and parses the response without blocking
+    the event loop, see _server_req for arguments and errors.
+    Decoding runs in the loop's executor. The caches block on locks and
+    files, so while any are enabled the whole request runs in the executor.
+
+    Returns:
+        pandas.DataFrame: A DataFrame containing the returned data.
+    """
+    loop = asyncio.get_running_loop()
+    pool = executor.get_executor()
+    if _caching():
+        return await loop.run_in_executor(pool, functools.partial(
+            _server_req, ticker, start, end, datatype, columns))
+
+    table = _join_windows(await asyncio.gather(
+        *(_server_req_window_async(ticker, first, last, datatype, columns)
+          for first, last in chunking.split(datatype, start, end)),
+        return_exceptions=True))
+    return await loop.run_in_executor(pool, _to_pandas, table)
+
+
+async def _server_req_window_async(ticker, start, end, datatype,
+                                   columns=None) -> pa.Table:
+    """
+    Requests a single window from the server without blocking the
+    event loop, see _server_req for arguments and errors
+    """
+    loop = asyncio.get_running_loop()
+    req = _make_request(ticker, start, end, datatype, columns)
+    res = await _send_async(req.send_async, constants.DB_URL + 'request/v1/',
+                            datatype)
+    res.throw()
+    data = res.data
+    if columns is None:
+        chunking.observe(datatype, start, end, len(data))
+
+    return await loop.run_in_executor(
+        executor.get_executor(), _decode_table, data, res.format, columns)
+
+
+def _join_windows(results: list) -> pa.Table:
+    """
+    Joins the tables returned for consecutive sub-ranges of a window.
+    Sub-ranges without data are skipped, the window is only not found
+    if none of them has data.
+
+    Args:
+        results (list): The returned table or raised error of each sub-range
+
+    Raises:
+        errors.MoabError: The first error other than not found, or not found
+            if no sub-range has data
+
+    Returns:
+        pyarrow.Table: The rows of every sub-range, in order
+    """
+    for result in results:
+        if isinstance(result, BaseException) and \
+                not isinstance(result, errors.MoabNotFoundError):
+            raise result
+    tables = [result for result in results
+              if not isinstance(result, errors.MoabNotFoundError)]
+    if not tables:
+        raise results[0]
+    if len(tables) == 1:
+        return tables[0]
+    return _concat_tables(tables)
+
+
+def _concat_tables(tables: list) -> pa.Table:
+    """
+    Concatenates tables returned by separate requests, promoting column
+    types that differ between them, such as string and large_string or a
+    column that's all null in some of them
+
+    Raises:
+        errors.MoabResponseError: If the columns can't be reconciled
+
+    Returns:
+        pyarrow.Table: The rows of every table, in order
+    """
+    try:
+        return pa.concat_tables(tables, promote_options="permissive")
+    except (pa.ArrowInvalid, pa.ArrowTypeError) as exc:
+        raise errors.MoabResponseError(
+            "Server returned inconsistent data") from exc
+
+
+def _fetch_table(ticker, start, end, datatype, *, if_none_match="",
+                 columns=None) -> pa.Table:
+    """
+    Requests a window from the payload cache or the server and decodes it,
+    see _server_req for arguments and errors
+
+    Args:
+        if_none_match (str, optional): The etag of a copy the caller holds
+        columns (list, optional): The columns to decode, the server is only
+            asked for them if the payload cache is disabled
+
+    Raises:
+        cache.NotModified: If the caller's copy is still current
+
+    Returns:
+        pyarrow.Table: The returned data, carrying its etag
+    """
+    payloads = cache.get_payload_cache()
+    if payloads is not None:
+        data, payload_format, etag = payloads.fetch(
+            ticker, start, end, datatype, _fetch_payload,
+            if_none_match=if_none_match)
+    else:
+        data, payload_format, etag = _fetch_payload(
+            ticker, start, end, datatype, if_none_match=if_none_match,
+            columns=columns)
+
+    return cache.with_etag(
+        _decode_table(data, payload_format, columns), etag)
+
+
+def _fetch_payload(ticker, start, end, datatype, *, if_none_match="",
+                   columns=None) -> tuple:
+    """
+    Requests a window from the server,
+    see _server_req for arguments and errors
+
+    Args:
+        if_none_match (str, optional): The etag of a copy the caller holds
+        columns (list, optional): The columns to ask for, None for all
+
+    Raises:
+        cache.NotModified: If the caller's copy is still current
+
+    Returns:
+        tuple: The payload bytes, its format and its etag
+    """
     # Request data from moabdb server
+    req = _make_request(ticker, start, end, datatype, columns)
+    req.if_none_match = if_none_match
+    res = _send(req.send, constants.DB_URL + 'request/v1/', datatype)
+
+    if res.code == 304:
+        raise cache.NotModified(if_none_match)
+    res.throw()
+    data = res.data
+    if columns is None:
+        chunking.observe(datatype, start, end, len(data))
+
+    return data, res.format, res.etag
+
+
+def _server_req_iter(ticker, start, end, datatype,
+                     columns=None) -> Iterator[pa.Table]:
+    """
+    Creates a high level request and parses the response while it downloads,
+    yielding rows as soon as they can be decoded. Long windows are requested
+    one sub-range at a time. While a cache is enabled, each sub-range is
+    loaded through it and yielded whole.
+
+    Args:
+        ticker (str): The ticker to query from the database
+        start (int): The unix epoch time to start the query from
+        end (int): The unix epoch time to stop searching at
+        datatype (str): The data type that's being requested
+        columns (list, optional): The columns to return, None for all
+
+    Raises:
+        errors.MoabResponseError: If there's a problem interpreting the response
+        errors.MoabRequestError: If the server has a problem interpreting the request
+        errors.MoabInternalError: If the server runs into an unrecoverable error internally
+        errors.MoabHttpError: If there's a problem transporting the payload or receiving a response
+        errors.MoabUnauthorizedError: If the user is not authorized to request the datatype
+        errors.MoabNotFoundError: If none of the sub-ranges has data
+        errors.MoabUnknownError: If the error code couldn't be parsed
+
+    Yields:
+        pyarrow.Table: Consecutive slices of the returned data
+
+    """
+    missing = None
+    for first, last in chunking.split(datatype, start, end):
+        try:
+            if _caching():
+                yield _server_req_window(ticker, first, last, datatype, columns)
+            else:
+                yield from _stream_window(ticker, first, last, datatype,
+                                          columns)
+        except errors.MoabNotFoundError as exc:
+            missing = exc
+            continue
+        missing = False
+    if missing:
+        raise missing
+
+
+def _read_window(ticker, start, end, datatype, columns=None) -> pa.Table:
+    """
+    Requests a single window from the server and decodes it while it
+    downloads, see _server_req for arguments and errors. The body is read
+    before the in-flight slot and limiter slot are given back, so they
+    bound the whole transfer, and a transfer cut short is retried.
+    """
+    req = _make_request(ticker, start, end, datatype, columns)
+    scope = cancellation.current()
+
+    def receive(url) -> tuple:
+        res = req.send_stream(url)
+        try:
+            if res.header.code != 200:
+                return res, None
+            tables = []
+            for table in _iter_tables(io.BufferedReader(res)):
+                if scope is not None:
+                    scope.check()
+                tables.append(table)
+            return res, tables
+        finally:
+            res.close()
+
+    res, tables = _send(receive, constants.DB_URL + 'request/v1/', datatype)
+    res.throw()
+    if columns is None:
+        chunking.observe(datatype, start, end, res.length)
+    table = tables[0] if len(tables) == 1 else _concat_tables(tables)
+    return table if columns is None else table.select(columns)
+
+
+def _stream_window(ticker, start, end, datatype,
+                   columns=None) -> Iterator[pa.Table]:
+    """
+    Requests a single window from the server and decodes it while it
+    downloads. Arrow payloads are decoded one record batch at a time as
+    they arrive. Parquet keeps its index at the end of the file, so Parquet
+    payloads are downloaded first and then decoded one row group at a time.
+    An in-flight slot is only held while the request is sent, not while
+    the caller works through the rows, so the body isn't retried or hedged.
+    See _server_req_iter for arguments and errors.
+
+    Yields:
+        pyarrow.Table: Consecutive slices of the returned data
+    """
+    req = _make_request(ticker, start, end, datatype, columns)
+    # A hedged copy would download the whole body a second time
+    res = _send(req.send_stream, constants.DB_URL + 'request/v1/',
+                datatype, hedge=False)
+    try:
+        res.throw()
+        if columns is None:
+            chunking.observe(datatype, start, end, res.length)
+        scope = cancellation.current()
+        for table in _iter_tables(io.BufferedReader(res)):
+            if scope is not None:
+                scope.check()
+            yield table if columns is None else table.select(columns)
+    finally:
+        res.close()
+
+
+def _send(send, url, key: str = None, hedge: bool = True):
+    """
+    Sends a request under the active retry policy. Every attempt, and
+    every hedged copy, holds its own in-flight slot and goes through the
+    active limiter on its own, so waits between attempts hold no slot
+    and aren't counted as latency.
+
+    Args:
+        send (callable): The request's send or send_stream method
+        url (str): The URL to send the request to
+        key (str, optional): The kind of request, such as its datatype,
+            whose latencies the limiter compares it with
+        hedge (bool, optional): Whether the request may be hedged
+
+    Returns:
+        The response returned by send
+    """
+    attempt = functools.partial(_send_once, send, url, key)
+    policy = retry.get_retry_policy()
+    if policy is None:
+        return attempt()
+    return policy.call(attempt, hedge=hedge)
+
+
+def _send_once(send, url, key: str = None):
+    """
+    Sends a request within an in-flight slot and the active limiter,
+    resending it if the server throttles it, see _send
+    """
+    with executor.in_flight():
+        pacer = limiter.get_limiter()
+        if pacer is None:
+            return send(url)
+        return pacer.call(functools.partial(send, url), key)
+
+
+async def _send_async(send, url, key: str = None):
+    """Coroutine version of _send, send is the request's send_async method"""
+    async def attempt():
+        async with executor.in_flight_async():
+            pacer = limiter.get_limiter()
+            if pacer is None:
+                return await send(url)
+            return await pacer.call_async(functools.partial(send, url), key)
+
+    policy = retry.get_retry_policy()
+    if policy is None:
+        return await attempt()
+    return await policy.call_async(attempt)
+
+
+def _make_request(ticker, start, end, datatype,
+                  columns=None) -> proto_wrapper.REQUEST:
+    """Builds a data request carrying the user's credentials"""
     req = proto_wrapper.REQUEST()
     req.symbol = ticker
     req.start = start
     req.end = end
     req.datatype = datatype
+    req.format = constants.PAYLOAD_FORMAT
+    req.columns.extend(columns or [])
 
     if constants.API_KEY != "":
         req.token = constants.API_KEY
         req.username = constants.API_USERNAME
+    return req
 
-    res = req.send(constants.DB_URL + 'request/v1/')
 
-    res.throw()
+def _iter_tables(payload: io.BufferedReader) -> Iterator[pa.Table]:
+    """
+    Decodes a payload that is still downloading into consecutive tables
+
+    Args:
+        payload (io.BufferedReader): The payload, read as it arrives
+
+    Raises:
+        errors.MoabResponseError: If the payload can't be decoded
+
+    Yields:
+        pyarrow.Table: Consecutive slices of the payload's rows, or a
+        single empty table if it has none
+    """
+    try:
+        if payload.peek(4)[:4] == b"PAR1":
+            parquet = pq.ParquetFile(pa.py_buffer(payload.read()))
+            for group in range(parquet.num_row_groups):
+                yield parquet.read_row_group(group)
+            if parquet.num_row_groups == 0:
+                yield parquet.schema_arrow.empty_table()
+            return
+
+        reader = pa.ipc.open_stream(payload)
+        empty = True
+        for batch in reader:
+            empty = False
+            yield pa.Table.from_batches([batch])
+        if empty:
+            yield reader.schema.empty_table()
+    except errors.MoabError:
+        raise
+    except Exception as exc:
+        raise errors.MoabResponseError("Server returned invalid data") from exc
+
 
-    # Place data into a dataframe
-    pq_file = io.BytesIO(res.data)
+def _decode_table(data: bytes, payload_format: str,
+                  columns: list = None) -> pa.Table:
+    """
+    Decodes a response payload into an Arrow table without copying it.
+    Arrow payloads are mapped in place, Parquet payloads are read
+    straight from the response buffer.
+
+    Args:
+        data (bytes): The payload returned by the server
+        payload_format (str): The format reported by the server, servers
+            that predate the format field send Parquet
+        columns (list, optional): The columns to decode, None for all.
+            Parquet skips the other columns entirely.
+
+    Raises:
+        errors.MoabResponseError: If the payload can't be decoded
+
+    Returns:
+        pyarrow.Table: The decoded rows
+    """
+    buffer = pa.py_buffer(data)
     try:
-        d_f = pd.read_parquet(pq_file)
-        return d_f
+        if payload_format == "arrow":
+            table = pa.ipc.open_stream(buffer).read_all()
+            return table if columns is None else table.select(columns)
+        return pq.read_table(pa.BufferReader(buffer), columns=columns)
     except Exception as exc:
         raise errors.MoabResponseError("Server returned invalid data") from exc
+
+
+def _to_pandas(table: pa.Table, release: bool = True) -> pd.DataFrame:
+    """
+    Converts an Arrow table to pandas, letting numeric columns share memory
+    where possible.
+
+    Args:
+        table (pyarrow.Table): The table to convert
+        release (bool, optional): Release Arrow buffers as columns are converted.
+            The table must not be used afterwards.
+
+    Returns:
+        pandas.DataFrame: The converted rows
+    """
+    return table.to_pandas(split_blocks=True, self_destruct=release)
@@ -0,0 +1,372 @@
+"""MoabDB Adaptive Concurrency Limiter"""
+
+from collections import deque
+import threading
+import time
+from . import cancellation
+from . import errors
+from . import executor
+
+# Completed requests per latency window
+LATENCY_WINDOW = 32
+
+# Concurrency is cut by this factor on a throttle, and on slow windows
+THROTTLE_BACKOFF = 0.5
+LATENCY_BACKOFF = 0.75
+
+# A window is slow when its 90th percentile exceeds this multiple of the
+# baseline median of its kind of request, unless target_latency is set
+LATENCY_TOLERANCE = 4.0
+
+# How far the baseline moves towards a slower window's median, so it follows
+# lasting changes instead of holding on to the fastest window ever seen
+BASELINE_DECAY = 0.1
+
+# Latency only cuts the limits while at least this fraction of the
+# concurrency limit is in flight, as otherwise the client isn't the cause
+LOADED_FRACTION = 0.75
+
+# Seconds to wait after a throttle without a Retry-After header
+DEFAULT_RETRY_AFTER = 1.0
+
+
+class AdaptiveLimiter:  # pylint: disable=too-many-instance-attributes
+    """
+    Paces requests to the MoabDB API. The number of requests allowed in
+    flight grows by one per round of successful requests and is cut
+    whenever the server throttles a request or latency climbs, settling
+    on the most the server will take (AIMD). An optional token bucket
+    caps the request rate as well. It's cut in the same way and grows back
+    by one request per second per round, up to the rate configured.
+
+    Latency is tracked separately for each kind of request, such as each
+    datatype, against a baseline that decays towards recent medians. It
+    only cuts the limits while the limiter is close to full, so slow
+    requests that aren't queueing behind each other leave them alone.
+
+    Throttled requests wait out the server's ``Retry-After`` and are sent
+    again, up to ``max_retries`` times, instead of failing the whole call.
+
+    Args:
+        concurrency (int, optional): The requests allowed in flight to start with
+        min_concurrency (int, optional): The fewest requests allowed in flight
+        max_concurrency (int, optional): The most requests allowed in flight
+        rate (float, optional): The most requests per second to allow,
+            None for no limit
+        burst (int, optional): Requests that may be sent at once when the
+            token bucket is full, defaults to ``rate``
+        target_latency (float, optional): Seconds the 90th percentile latency
+            should stay under, defaults to a multiple of the baseline median
+        max_retries (int, optional): Times to resend a throttled request
+
+    Attributes:
+        throttles (int): Requests the server throttled
+        retries (int): Throttled requests that were sent again
+    """
+
+    # pylint: disable=too-many-arguments
+    def __init__(self, concurrency: int = 32, *, min_concurrency: int = 1,
+                 max_concurrency: int = 256, rate: float = None,
+                 burst: int = None, target_latency: float = None,
+                 max_retries: int = 5):
+        if not 1 <= min_concurrency <= concurrency <= max_concurrency:
+            raise errors.MoabRequestError("Invalid concurrency limits")
+        if rate is not None and rate <= 0:
+            raise errors.MoabRequestError("rate must be positive")
+
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.target_latency = target_latency
+        self.max_retries = max_retries
+        self.throttles = 0
+        self.retries = 0
+        self._limit = float(concurrency)
+        self.max_rate = rate
+        self._rate = rate
+        self._burst = float(burst or rate or 1)
+        self._tokens = self._burst
+        self._refilled = time.monotonic()
+        self._blocked_until = 0.0
+        self._backed_off = 0.0
+        self._in_flight = 0
+        self._latencies = {}
+        self._percentiles = (None, None)
+        self._baselines = {}
+        self._cond = threading.Condition()
+        self._waiters = executor.AsyncWaiters()
+
+    def _try_acquire(self) -> tuple:
+        """
+        Takes a request slot if one is free. Call with the lock held.
+
+        Returns:
+            tuple: The time the slot was taken, or None, and seconds to wait
+        """
+        now = time.monotonic()
+        if now < self._blocked_until:
+            return None, self._blocked_until - now
+        if self._in_flight >= int(self._limit):
+            return None, None
+
+        if self._rate is not None:
+            elapsed = now - self._refilled
+            self._tokens = min(self._burst, self._tokens + elapsed * self._rate)
+            self._refilled = now
+            if self._tokens < 1:
+                return None, (1 - self._tokens) / self._rate
+            self._tokens -= 1
+
+        self._in_flight += 1
+        return now, None
+
+    def acquire(self) -> float:
+        """
+        Waits for a request slot
+
+        Returns:
+            float: The time the slot was taken, to pass to ``release``
+        """
+        scope = cancellation.current()
+        with self._cond:
+            while True:
+                started, wait = self._try_acquire()
+                if started is not None:
+                    return started
+                if scope is not None:
+                    scope.check()
+                    wait = scope.interval(wait)
+                self._cond.wait(wait)
+
+    async def acquire_async(self) -> float:
+        """
+        Waits for a request slot without blocking the event loop
+
+        Returns:
+            float: The time the slot was taken, to pass to ``release``
+        """
+        scope = cancellation.current()
+        while True:
+            with self._cond:
+                started, wait = self._try_acquire()
+                if started is not None:
+                    return started
+                waiter = self._waiters.add()
+            if scope is not None:
+                scope.check()
+                wait = scope.interval(wait)
+            await self._waiters.wait(waiter, wait)
+
+    # pylint: disable=too-many-arguments
+    def release(self, started: float, throttled: bool = False,
+                retry_after: float = None, failed: bool = False,
+                key: str = None):
+        """
+        Returns a request slot and adjusts the limits from its outcome
+
+        Args:
+            started (float): The value returned by ``acquire``
+            throttled (bool, optional): Whether the server throttled the request
+            retry_after (float, optional): Seconds the server asked to wait
+            failed (bool, optional): Whether the request failed for another
+                reason, which leaves the limits alone
+            key (str, optional): The kind of request, such as its datatype,
+                whose latencies it's compared with
+        """
+        now = time.monotonic()
+        with self._cond:
+            loaded = self._in_flight >= int(self._limit) * LOADED_FRACTION
+            self._in_flight -= 1
+            if throttled:
+                self.throttles += 1
+                wait = DEFAULT_RETRY_AFTER if retry_after is None else retry_after
+                self._blocked_until = max(self._blocked_until, now + wait)
+                self._back_off(started, THROTTLE_BACKOFF)
+            elif not failed:
+                self._succeeded(started, now - started, key, loaded)
+            self._cond.notify_all()
+        self._waiters.notify_all()
+
+    def _back_off(self, started: float, factor: float):
+        """Cuts the limits, once for all the requests sent before the last cut"""
+        if started < self._backed_off:
+            return
+        self._backed_off = time.monotonic()
+        self._limit = max(self.min_concurrency, self._limit * factor)
+        if self._rate is not None:
+            self._rate = max(0.1, self._rate * factor)
+
+    def _succeeded(self, started: float, latency: float, key: str,
+                   loaded: bool):
+        """Grows the limits by one per round, unless latency is climbing"""
+        self._limit = min(self.max_concurrency, self._limit + 1 / self._limit)
+        if self._rate is not None:
+            self._rate = min(self.max_rate, self._rate + 1 / self._rate)
+
+        latencies = self._latencies.setdefault(
+            key, deque(maxlen=LATENCY_WINDOW))
+        latencies.append(latency)
+        if len(latencies) < LATENCY_WINDOW:
+            return
+        ordered = sorted(latencies)
+        latencies.clear()
+        median, p90 = ordered[len(ordered) // 2], ordered[len(ordered) * 9 // 10]
+        self._percentiles = (median, p90)
+        baseline = self._baselines.get(key, median)
+        target = self.target_latency
+        if target is None:
+            target = baseline * LATENCY_TOLERANCE
+        self._baselines[key] = min(median,
+                                   baseline + BASELINE_DECAY * (median - baseline))
+
+        if loaded and p90 > target:
+            self._back_off(started, LATENCY_BACKOFF)
+
+    def call(self, send, key: str = None):
+        """
+        Sends a request within the limits, resending it if it's throttled
+
+        Args:
+            send (callable): Sends the request and returns its response
+            key (str, optional): The kind of request, see ``release``
+
+        Raises:
+            errors.MoabThrottledError: If the request is still throttled
+                after ``max_retries`` retries
+
+        Returns:
+            The value returned by ``send``
+        """
+        attempt = 0
+        while True:
+            started = self.acquire()
+            try:
+                result = send()
+            except errors.MoabThrottledError as exc:
+                self.release(started, throttled=True,
+                             retry_after=exc.retry_after)
+                if attempt >= self.max_retries:
+                    raise
+                attempt += 1
+                self._count_retry()
+                continue
+            except BaseException:
+                self.release(started, failed=True)
+                raise
+            self.release(started, key=key)
+            return result
+
+    async def call_async(self, send, key: str = None):
+        """
+        Coroutine version of ``call``
+
+        Args:
+            send (callable): Returns a coroutine that sends the request
+            key (str, optional): The kind of request, see ``release``
+
+        Returns:
+            The value the coroutine returns
+        """
+        attempt = 0
+        while True:
+            started = await self.acquire_async()
+            try:
+                result = await send()
+            except errors.MoabThrottledError as exc:
+                self.release(started, throttled=True,
+                             retry_after=exc.retry_after)
+                if attempt >= self.max_retries:
+                    raise
+                attempt += 1
+                self._count_retry()
+                continue
+            except BaseException:
+                self.release(started, failed=True)
+                raise
+            self.release(started, key=key)
+            return result
+
+    def _count_retry(self):
+        with self._cond:
+            self.retries += 1
+
+    def stats(self) -> dict:
+        """
+        Returns the current limits and throttle counters
+
+        Returns:
+            dict: The concurrency limit, requests in flight, rate limit,
+            throttles, retries, seconds left to wait on a Retry-After and
+            the median and 90th percentile latency of the last window
+        """
+        with self._cond:
+            return {"concurrency": int(self._limit),
+                    "in_flight": self._in_flight,
+                    "rate": self._rate,
+                    "throttles": self.throttles,
+                    "retries": self.retries,
+                    "blocked_for": max(0.0, self._blocked_until
+                                       - time.monotonic()),
+                    "latency_p50": self._percentiles[0],
+                    "latency_p90": self._percentiles[1]}
+
+
+_LIMITER = AdaptiveLimiter()
+
+
+def get_limiter() -> AdaptiveLimiter:
+    """
+    Returns the limiter pacing requests, if one is enabled
+
+    Returns:
+        AdaptiveLimiter: The active limiter, or None
+    """
+    return _LIMITER
+
+
+def configure_limiter(concurrency: int = 32, **kwargs):
+    """
+    Replaces the limiter that paces requests to the MoabDB API.
+    A limiter with the default settings is enabled out of the box.
+
+    Args:
+        concurrency (int, optional): The requests allowed in flight to start with
+        **kwargs: The other settings of ``AdaptiveLimiter``, such as
+            ``max_concurrency``, ``rate`` or ``max_retries``
+
+    Returns:
+        None: On success, this will return nothing
+
+    Example::
+
+        import moabdb as mdb
+        mdb.configure_limiter(rate=50, max_concurrency=64)
+        df = mdb.get_equity(sp500_tickers, "1y")
+        print(mdb.limiter_stats())
+
+    """
+    # pylint: disable=global-statement
+    global _LIMITER
+    _LIMITER = AdaptiveLimiter(concurrency, **kwargs)
+
+
+def disable_limiter():
+    """
+    Stops pacing requests, a throttled request then fails right away
+
+    Returns:
+        None: On success, this will return nothing
+    """
+    # pylint: disable=global-statement
+    global _LIMITER
+    _LIMITER = None
+
+
+def limiter_stats() -> dict:
+    """
+    Returns the limiter's current limits and throttle counters
+
+    Returns:
+        dict: See ``AdaptiveLimiter.stats``, empty if the limiter is disabled
+    """
+    limiter = _LIMITER
+    return {} if limiter is None else limiter.stats()
@@ -0,0 +1,392 @@
+"""Local stand-in for the MoabDB API, for tests and benchmarks"""
+
+from base64 import b64encode, b64decode
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import gzip
+import hashlib
+import socketserver
+import threading
+import time
+from requests.structures import CaseInsensitiveDict
+from .constants import pd, io, pa
+from .transport import TransportResponse, zstandard
+from .cache_backends import read_reply
+from . import proto_wrapper
+from . import timewindows
+
+# Rows per Arrow record batch or Parquet row group in served payloads
+ROWS_PER_BATCH = 1 << 16
+
+
+class LocalServer:  # pylint: disable=too-many-instance-attributes
+    """
+    Answers MoabDB API requests from in-memory DataFrames.
+    An instance can be passed straight to ``moabdb.InProcessTransport``,
+    or served over HTTP on localhost with ``serve``.
+
+    Args:
+        users (dict, optional): Maps usernames to API keys. If omitted,
+            any credentials are accepted.
+        binary (bool, optional): Whether binary requests are understood.
+            Set to False to behave like a server that only speaks base64.
+        arrow (bool, optional): Whether Arrow IPC payloads can be produced.
+            Set to False to behave like a server that only sends Parquet.
+        batch (bool, optional): Whether requests for several symbols are
+            understood. Set to False to behave like a server that only
+            answers one symbol per request.
+
+    Attributes:
+        requests (int): Number of API requests that have been handled
+        not_modified (int): Number of requests answered with code 304
+            because the client's etag still matched
+
+    Example::
+
+        import moabdb as mdb
+        server = mdb.LocalServer()
+        server.add("AAPL", "daily_stocks", aapl_df)
+        mdb.set_transport(mdb.InProcessTransport(server))
+        df = mdb.get_equity("AAPL", start="2022-01-01", end="2023-01-01")
+
+    """
+
+    def __init__(self, users: dict = None, binary: bool = True,
+                 arrow: bool = True, batch: bool = True):
+        self.users = users
+        self.binary = binary
+        self.arrow = arrow
+        self.batch = batch
+        self.requests = 0
+        self.not_modified = 0
+        self._tables = {}
+        self._lock = threading.Lock()
+        self._httpd = None
+
+    def add(self, symbol: str, datatype: str, frame: pd.DataFrame):
+        """
+        Stores rows to be served for a symbol and datatype
+
+        Args:
+            symbol (str): The symbol the rows are requested by
+            datatype (str): The data type, such as ``daily_stocks``
+            frame (pandas.DataFrame): The rows, with a ``Date`` or ``Time`` column
+        """
+        with self._lock:
+            self._tables[(datatype, symbol)] = frame.reset_index(drop=True)
+
+    def _authorized(self, req) -> bool:
+        if self.users is None:
+            return True
+        return self.users.get(req.username) == req.token
+
+    def _rows(self, req, symbol: str) -> pd.DataFrame:
+        frame = self._tables.get((req.datatype, symbol))
+        if frame is None:
+            return None
+        time_col = "Time" if "Time" in frame.columns else "Date"
+        epochs = timewindows.to_epochs(frame[time_col])
+        return frame[(epochs >= req.start) & (epochs <= req.end)]
+
+    def _batch_rows(self, req, res) -> pd.DataFrame:
+        """Gathers the rows of every symbol in a batch, noting those without any"""
+        found = []
+        for symbol in dict.fromkeys(req.symbols):
+            rows = self._rows(req, symbol)
+            if rows is None or rows.empty:
+                res.missing.append(symbol)
+            else:
+                found.append(rows)
+        return pd.concat(found, ignore_index=True) if found else None
+
+    def handle(self, req) -> proto_wrapper.RESPONSE:
+        """
+        Answers a single decoded request
+
+        Args:
+            req (Request): The request to answer
+
+        Returns:
+            Response: The response the API would have sent
+        """
+        with self._lock:
+            self.requests += 1
+
+        res = proto_wrapper.RESPONSE()
+        res.code = 200
+        batched = self.batch and len(req.symbols) > 0
+        res.batched = batched
+        if not self._authorized(req):
+            res.code = 401
+            return res
+
+        if batched:
+            rows = self._batch_rows(req, res)
+        else:
+            rows = self._rows(req, req.symbol)
+        if rows is None or rows.empty:
+            res.code = 404
+            res.message = ", ".join(req.symbols) if batched else req.symbol
+            return res
+
+        if req.columns:
+            rows = rows[[column for column in req.columns
+                         if column in rows.columns]]
+        data = _encode_rows(rows, req.format if self.arrow else "")
+        if self.arrow:
+            res.format = req.format if req.format == "arrow" else "parquet"
+        res.etag = hashlib.sha1(data).hexdigest()
+        if req.if_none_match == res.etag:
+            with self._lock:
+                self.not_modified += 1
+            res.code = 304
+            return res
+        res.data = data
+        return res
+
+    def login(self, req) -> proto_wrapper.RESPONSE:
+        """
+        Answers a login request
+
+        Args:
+            req (Request): The login request
+
+        Returns:
+            Response: Code 200 if the credentials are accepted, 401 otherwise
+        """
+        res = proto_wrapper.RESPONSE()
+        res.code = 200 if self._authorized(req) else 401
+        return res
+
+    def __call__(self, method, url, headers, body) -> TransportResponse:
+        binary = self.binary and headers.get("Content-Type", "").startswith(
+            proto_wrapper.PROTOBUF_MIME)
+        try:
+            if binary:
+                req = proto_wrapper.REQUEST().FromString(body)
+            else:
+                req = proto_wrapper.REQUEST().FromString(
+                    b64decode(headers["x-req"]))
+        except Exception:  # pylint: disable=broad-exception-caught
+            return TransportResponse(400, {}, b"")
+
+        if url.rstrip("/").endswith("login/v1"):
+            res = self.login(req)
+        else:
+            res = self.handle(req)
+        payload = res.SerializeToString()
+
+        if not binary:
+            return TransportResponse(200, {}, b64encode(payload))
+
+        res_headers = {"Content-Type": proto_wrapper.PROTOBUF_MIME}
+        encoding = _pick_encoding(headers.get("Accept-Encoding", ""))
+        if encoding == "zstd":
+            payload = zstandard.ZstdCompressor().compress(payload)
+            res_headers["Content-Encoding"] = encoding
+        elif encoding == "gzip":
+            payload = gzip.compress(payload, compresslevel=1)
+            res_headers["Content-Encoding"] = encoding
+        return TransportResponse(200, res_headers, payload)
+
+    def serve(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """
+        Starts answering requests over HTTP on a background thread
+
+        Args:
+            host (str, optional): The interface to listen on
+            port (int, optional): The port to listen on, 0 picks a free port
+
+        Returns:
+            str: The base URL to assign to ``moabdb.constants.DB_URL``
+        """
+        self._httpd = ThreadingHTTPServer((host, port), _HttpHandler)
+        self._httpd.daemon_threads = True
+        self._httpd.moab = self
+        threading.Thread(target=self._httpd.serve_forever, daemon=True).start()
+        return f"http://{host}:{self._httpd.server_port}/"
+
+    def shutdown(self):
+        """Stops the HTTP server started by ``serve``"""
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+
+
+class _HttpHandler(BaseHTTPRequestHandler):
+    """Adapts HTTP requests to LocalServer calls"""
+    protocol_version = "HTTP/1.1"
+
+    def _dispatch(self, method):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else None
+        headers = CaseInsensitiveDict(self.headers.items())
+        res = self.server.moab(method, self.path, headers, body)
+
+        self.send_response(res.status_code)
+        for key, value in res.headers.items():
+            self.send_header(key, value)
+        self.send_header("Content-Length", str(len(res.content)))
+        self.end_headers()
+        self.wfile.write(res.content)
+
+    # pylint: disable=invalid-name
+    def do_GET(self):
+        """Answers base64 requests"""
+        self._dispatch("GET")
+
+    def do_POST(self):
+        """Answers binary requests"""
+        self._dispatch("POST")
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        pass
+
+
+class LocalKVServer:
+    """
+    A small in-process stand-in for a Redis server, for testing
+    ``RedisBackend`` without one. Understands ``PING``, ``AUTH``, ``SELECT``,
+    ``GET``, ``SET`` with ``EX`` or ``PX``, ``DEL``, ``DBSIZE`` and ``FLUSHDB``.
+
+    Args:
+        password (str, optional): The password clients must send with ``AUTH``
+
+    Example::
+
+        import moabdb as mdb
+        kv = mdb.LocalKVServer()
+        host, port = kv.serve()
+        mdb.enable_payload_cache(mdb.RedisBackend(host, port))
+
+    """
+
+    def __init__(self, password: str = None):
+        self.password = password
+        self.values = {}
+        self._lock = threading.Lock()
+        self._server = None
+
+    def execute(self, args: list):  # pylint: disable=too-many-return-statements
+        """
+        Runs a single command
+
+        Args:
+            args (list): The command name and its arguments, in bytes
+
+        Returns:
+            The reply: bytes, int, str, or None
+        """
+        name = args[0].decode().upper()
+        with self._lock:
+            if name == "PING":
+                return "PONG"
+            if name == "AUTH":
+                if self.password is not None and args[-1].decode() != self.password:
+                    return _KVError("WRONGPASS invalid password")
+                return "OK"
+            if name == "SELECT":
+                return "OK"
+            if name == "GET":
+                entry = self.values.get(args[1])
+                if entry is None or entry[0] < time.monotonic():
+                    return None
+                return entry[1]
+            if name == "SET":
+                expires = float("inf")
+                for option, value in zip(args[3::2], args[4::2]):
+                    scale = {b"EX": 1, b"PX": 0.001}.get(option.upper())
+                    if scale is None:
+                        return _KVError("ERR syntax error")
+                    expires = time.monotonic() + int(value) * scale
+                self.values[args[1]] = (expires, args[2])
+                return "OK"
+            if name == "DEL":
+                return sum(self.values.pop(key, None) is not None
+                           for key in args[1:])
+            if name == "DBSIZE":
+                return len(self.values)
+            if name == "FLUSHDB":
+                self.values.clear()
+                return "OK"
+        return _KVError("ERR unknown command " + name)
+
+    def serve(self, host: str = "127.0.0.1", port: int = 0) -> tuple:
+        """
+        Starts answering the Redis protocol on a background thread
+
+        Args:
+            host (str, optional): The interface to listen on
+            port (int, optional): The port to listen on, 0 picks a free port
+
+        Returns:
+            tuple: The host and port to pass to ``moabdb.RedisBackend``
+        """
+        self._server = socketserver.ThreadingTCPServer((host, port), _KVHandler)
+        self._server.daemon_threads = True
+        self._server.moab = self
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return host, self._server.server_address[1]
+
+    def shutdown(self):
+        """Stops the server started by ``serve``"""
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+class _KVError(str):
+    """An error reply"""
+
+
+class _KVHandler(socketserver.StreamRequestHandler):
+    """Adapts Redis protocol connections to LocalKVServer calls"""
+
+    def handle(self):
+        while True:
+            try:
+                args = read_reply(self.rfile)
+            except (ConnectionError, ValueError):
+                return
+            if not isinstance(args, list) or not args:
+                return
+            self.wfile.write(_encode_reply(self.server.moab.execute(args)))
+
+
+def _encode_reply(reply) -> bytes:
+    """Encodes a Redis protocol reply"""
+    if reply is None:
+        return b"$-1\r\n"
+    if isinstance(reply, _KVError):
+        return b"-" + reply.encode() + b"\r\n"
+    if isinstance(reply, str):
+        return b"+" + reply.encode() + b"\r\n"
+    if isinstance(reply, int):
+        return b":%d\r\n" % reply
+    return b"$%d\r\n%s\r\n" % (len(reply), reply)
+
+
+def _encode_rows(rows: pd.DataFrame, payload_format: str) -> bytes:
+    """Serializes rows in the requested payload format"""
+    if payload_format == "arrow":
+        table = pa.Table.from_pandas(rows, preserve_index=False)
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table, max_chunksize=ROWS_PER_BATCH)
+        return sink.getvalue().to_pybytes()
+
+    buffer = io.BytesIO()
+    rows.to_parquet(buffer, index=False, row_group_size=ROWS_PER_BATCH)
+    return buffer.getvalue()
+
+
+def _pick_encoding(accept_encoding: str) -> str:
+    """Picks the best content encoding offered by the client"""
+    offered = [enc.split(";")[0].strip().lower()
+               for enc in accept_encoding.split(",")]
+    if "zstd" in offered and zstandard is not None:
+        return "zstd"
+    if "gzip" in offered:
+        return "gzip"
+    return None
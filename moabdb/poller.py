@@ -0,0 +1,158 @@
+"""MoabDB Intraday Poller"""
+
+import asyncio
+import threading
+import time
+from . import errors
+from . import timewindows
+from .lib import _equity_datatype, _server_req_many, _round_floats
+from .constants import Union
+
+
+class IntradayPoller:  # pylint: disable=too-many-instance-attributes
+    """
+    Follows the tail of intraday data for a set of symbols. Each tick
+    requests the seconds after the oldest ``Time`` seen across the symbols
+    in batched requests, and each symbol keeps only the rows newer than
+    its own last ``Time``.
+
+    The wait between polls adapts to the data: it shrinks towards
+    ``min_interval`` while new rows keep arriving and grows towards
+    ``max_interval`` while they don't. A symbol whose request fails keeps
+    its place, is handed to ``on_error`` as ``on_error(symbol, error)``
+    and is asked for again on the next tick, which comes later.
+
+    New rows are handed to ``callback`` as ``callback(symbol, frame)``,
+    returned by ``poll``, or yielded by iterating the poller with
+    ``async for``. Frames have the same layout as a single ticker
+    ``get_equity(..., intraday=True)`` request.
+
+    Args:
+        tickers (str or list of str): The ticker(s) to follow
+        callback (callable, optional): Called with each symbol's new rows
+        on_error (callable, optional): Called with each symbol whose request
+            failed and its ``MoabError``
+        since (int, optional): The epoch to start following from,
+            defaults to the time the poller is created
+        min_interval (float, optional): The shortest wait between polls, in seconds
+        max_interval (float, optional): The longest wait between polls, in seconds
+
+    Attributes:
+        interval (float): The current wait between polls, in seconds
+        last_seen (dict): The epoch of the last row delivered for each symbol
+        failures (dict): The ``MoabError`` of each symbol that failed in the
+            last poll
+
+    Example::
+
+        import moabdb as mdb
+        mdb.login("your-signup-email@mail.com", "secret_key")
+        poller = mdb.IntradayPoller(["AAPL", "MSFT"], callback=print)
+        poller.run()
+
+    """
+
+    # pylint: disable=too-many-arguments
+    def __init__(self, tickers: Union[str, list], callback=None, *,
+                 on_error=None, since: int = None, min_interval: float = 1.0,
+                 max_interval: float = 30.0):
+        if isinstance(tickers, str):
+            tickers = [tickers]
+        elif not isinstance(tickers, list):
+            raise errors.MoabRequestError("Invalid ticker type")
+        if not 0 < min_interval <= max_interval:
+            raise errors.MoabRequestError("Invalid poll interval")
+
+        self.datatype, self.columns = _equity_datatype(True)
+        self.callback = callback
+        self.on_error = on_error
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.interval = min_interval
+        since = int(time.time()) if since is None else int(since)
+        self.last_seen = {str.upper(ticker): since - 1 for ticker in tickers}
+        self.failures = {}
+        self._stopped = threading.Event()
+
+    def poll(self) -> dict:
+        """
+        Requests the rows that arrived since the last poll. Symbols whose
+        request fails are left out and listed in ``failures``.
+
+        Raises:
+            errors.MoabDeadlineError: If the poll runs past an active deadline
+            errors.MoabCancelledError: If the poll is cancelled through an active token
+
+        Returns:
+            dict: The new rows of each symbol that has any
+        """
+        now = int(time.time())
+        tickers = [ticker for ticker, last in self.last_seen.items()
+                   if last < now]
+        start = min((self.last_seen[ticker] for ticker in tickers),
+                    default=now) + 1
+        results = _server_req_many(tickers, start, now, self.datatype,
+                                   return_exceptions=True)
+
+        new, self.failures = {}, {}
+        for ticker, frame in zip(tickers, results):
+            if isinstance(frame, errors.MoabNotFoundError):
+                continue
+            if isinstance(frame, errors.MoabError):
+                self.failures[ticker] = frame
+                continue
+            epochs = timewindows.to_epochs(frame[self.columns[1]])
+            frame = frame[epochs > self.last_seen[ticker]]
+            if frame.empty:
+                continue
+            self.last_seen[ticker] = int(epochs.max())
+            new[ticker] = _round_floats(
+                frame[self.columns].set_index(self.columns[1]))
+
+        self._adapt(sum(len(frame) for frame in new.values()),
+                    bool(self.failures))
+        if self.on_error is not None:
+            for ticker, exc in self.failures.items():
+                self.on_error(ticker, exc)
+        if self.callback is not None:
+            for ticker, frame in new.items():
+                self.callback(ticker, frame)
+        return new
+
+    def _adapt(self, rows: int, failed: bool = False):
+        """
+        Polls sooner while rows are arriving and later while they aren't,
+        backing off further while requests fail
+        """
+        if failed:
+            self.interval = min(self.max_interval, self.interval * 2)
+        elif rows:
+            self.interval = max(self.min_interval, self.interval / 2)
+        else:
+            self.interval = min(self.max_interval, self.interval * 1.5)
+
+    def run(self):
+        """
+        Polls until ``stop`` is called, handing new rows to the callback
+
+        Returns:
+            None: Once stopped
+        """
+        self._stopped.clear()
+        while not self._stopped.is_set():
+            self.poll()
+            self._stopped.wait(self.interval)
+
+    def stop(self):
+        """Stops ``run`` and any ``async for`` loop over the poller"""
+        self._stopped.set()
+
+    async def __aiter__(self):
+        """Yields (symbol, frame) pairs of new rows until ``stop`` is called"""
+        self._stopped.clear()
+        loop = asyncio.get_running_loop()
+        while not self._stopped.is_set():
+            new = await loop.run_in_executor(None, self.poll)
+            for item in new.items():
+                yield item
+            await asyncio.sleep(self.interval)
@@ -1,15 +1,48 @@
 """Take that stupid Intellisense, I do what I want!"""
 
 from base64 import b64encode, b64decode
-import requests
+from email.utils import parsedate_to_datetime
+import io
+import time
 
 # pylint: disable=no-name-in-module
 from .protocol_pb2 import Request as _Req, Response as _Response
+from . import cancellation
 from . import errors
+from . import transport
 
 REQUEST = _Req
 RESPONSE = _Response
 
+PROTOBUF_MIME = "application/x-protobuf"
+
+# Whether requests are sent as raw protobuf instead of base64, see set_binary_mode
+_BINARY = False
+
+
+def set_binary_mode(enabled: bool = True):
+    """
+    Switches between base64 and binary requests.
+    In binary mode the request is POSTed as raw protobuf and the server
+    answers with raw, optionally compressed, protobuf instead of base64 text.
+    If the server rejects binary requests, the client falls back to base64.
+
+    Args:
+        enabled (bool): True to send binary requests
+
+    Returns:
+        None: On success, this will return nothing
+
+    Example::
+
+        import moabdb as mdb
+        mdb.set_binary_mode()
+
+    """
+    # pylint: disable=global-statement
+    global _BINARY
+    _BINARY = enabled
+
 
 def throw(res: _Response):
     """Throws appropriate errors for bad res codes"""
@@ -31,32 +64,293 @@ def throw(res: _Response):
 setattr(_Response, "throw", throw)
 
 
+def _wire_request(serialized_req: bytes, url, binary: bool) -> tuple:
+    """Returns the method, URL, headers and body of a request in either wire format"""
+    if binary:
+        headers = {
+            'Content-Type': PROTOBUF_MIME,
+            'Accept': PROTOBUF_MIME,
+            'Accept-Encoding': transport.ACCEPT_ENCODING
+        }
+        return "POST", url, headers, serialized_req
+
+    headers = {
+        'x-req': b64encode(serialized_req)
+    }
+    return "GET", url, headers, None
+
+
+def _exchange(serialized_req: bytes, url, binary: bool, stream: bool = False):
+    """Sends a serialized request in either wire format"""
+    active = transport.get_transport()
+    wire = _wire_request(serialized_req, url, binary)
+    timeout = cancellation.request_timeout(180)
+    scope = cancellation.current()
+    if scope is None or stream:
+        exchange = active.stream if stream else active.request
+        return exchange(*wire, timeout=timeout)
+    return _exchange_within(active, wire, timeout, scope)
+
+
+def _exchange_within(active, wire: tuple, timeout: float, scope):
+    """
+    Receives a response a chunk at a time, so the transfer can be aborted
+    when the scope is cancelled or its deadline passes
+    """
+    res = active.stream(*wire, timeout=timeout)
+    chunks = []
+    try:
+        with scope.on_cancel(res.close):
+            for chunk in res.chunks:
+                scope.check()
+                chunks.append(chunk)
+    except errors.MoabError:
+        scope.check()
+        raise
+    except Exception:
+        # Closing the connection under a read fails it in transport specific ways
+        scope.check()
+        raise
+    finally:
+        res.close()
+    scope.check()
+    return transport.TransportResponse(res.status_code, res.headers,
+                                       b"".join(chunks))
+
+
+def _binary_refused(binary: bool, status_code: int) -> bool:
+    """Whether a response means the server doesn't understand binary requests"""
+    # API errors come back inside a 200, so these mean binary isn't understood
+    return binary and status_code in (400, 405, 415)
+
+
+def _check_status(status_code: int, headers=None):
+    """Throws appropriate errors for bad HTTP status codes"""
+    if status_code == 429:
+        raise errors.MoabThrottledError(
+            "Too many requests", _retry_after((headers or {}).get("Retry-After")))
+    if status_code == 502:
+        raise errors.MoabInternalError("Take2 server is down")
+    if status_code != 200:
+        raise errors.MoabHttpError("Unknown error")
+
+
+def _retry_after(value) -> float:
+    """Parses a Retry-After header, given in seconds or as an HTTP date"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when.timestamp() - time.time())
+
+
+def _negotiate(request: _Req, url, stream: bool = False):
+    """Sends a request, dropping to base64 if binary isn't understood"""
+    serialized_req = request.SerializeToString()
+    binary = _BINARY
+    res = _exchange(serialized_req, url, binary, stream)
+
+    if _binary_refused(binary, res.status_code):
+        if stream:
+            res.close()
+        set_binary_mode(False)
+        res = _exchange(serialized_req, url, False, stream)
+
+    if res.status_code != 200 and stream:
+        res.close()
+    _check_status(res.status_code, res.headers)
+
+    return res
+
+
+def _parse_response(res) -> _Response:
+    """Decodes a buffered response in either wire format"""
+    if res.headers.get('Content-Type', '').startswith(PROTOBUF_MIME):
+        return RESPONSE().FromString(res.content)
+    return RESPONSE().FromString(b64decode(res.content))
+
+
 def send(request: _Req, url) -> _Response:
     """
-    Sends a request to the MoabDB API
+    Sends a request to the MoabDB API through the active transport.
+    Retries are left to the caller, see ``lib._send``
+    :param Request: The request to send
+    :return: The response from the server
+    """
+    return _parse_response(_negotiate(request, url))
+
+
+setattr(_Req, "send", send)
+
+
+async def send_async(request: _Req, url) -> _Response:
+    """
+    Sends a request to the MoabDB API through the active async transport.
+    Retries are left to the caller, see ``lib._send_async``
     :param Request: The request to send
     :return: The response from the server
     """
     serialized_req = request.SerializeToString()
-    headers = {
-        'x-req': b64encode(serialized_req)
-    }
+    active = transport.get_async_transport()
+    binary = _BINARY
+    res = await active.request(*_wire_request(serialized_req, url, binary),
+                               timeout=cancellation.request_timeout(180))
 
-    try:
-        res = requests.get(url, headers=headers, timeout=180)
+    if _binary_refused(binary, res.status_code):
+        set_binary_mode(False)
+        res = await active.request(*_wire_request(serialized_req, url, False),
+                                   timeout=cancellation.request_timeout(180))
 
-        if res.status_code == 429:
-            raise errors.MoabRequestError("Too many requests")
-        if res.status_code == 502:
-            raise errors.MoabInternalError("Take2 server is down")
-        if res.status_code != 200:
-            raise errors.MoabHttpError("Unknown error")
+    _check_status(res.status_code, res.headers)
+    return _parse_response(res)
 
-        res = RESPONSE().FromString(b64decode(res.text))
-        return res
 
-    except requests.exceptions.Timeout as exc:
-        raise errors.MoabHttpError("Connecting to server timed out") from exc
+setattr(_Req, "send_async", send_async)
 
 
-setattr(_Req, "send", send)
+def send_stream(request: _Req, url) -> "StreamedResponse":
+    """
+    Sends a request to the MoabDB API and returns as soon as the
+    response starts arriving, see StreamedResponse
+    :param Request: The request to send
+    :return: The response from the server, with data still downloading
+    """
+    res = _negotiate(request, url, stream=True)
+    binary = res.headers.get('Content-Type', '').startswith(PROTOBUF_MIME)
+    return StreamedResponse(res, binary)
+
+
+setattr(_Req, "send_stream", send_stream)
+
+
+class StreamedResponse(io.RawIOBase):  # pylint: disable=too-many-instance-attributes
+    """
+    A Response that is parsed while it downloads.
+    The fields ahead of ``data`` are parsed up front, ``data`` itself is read
+    like a file, and fields after it are merged into ``header`` once it has
+    been read to the end.
+
+    Args:
+        stream (transport.TransportStream): The response being received
+        binary (bool): False if the body is base64 text
+
+    Attributes:
+        header (Response): Every field of the response except ``data``
+        length (int): The size of ``data`` in bytes
+    """
+
+    # Field number and wire type of Response.data
+    _DATA_FIELD = 3
+    _LENGTH_DELIMITED = 2
+
+    def __init__(self, stream, binary: bool):
+        super().__init__()
+        self.header = RESPONSE()
+        self._stream = stream
+        self._chunks = iter(stream.chunks)
+        self._binary = binary
+        self._pending = b""
+        self._buffer = bytearray()
+        self._remaining = 0
+        self.length = 0
+        self._parse_fields()
+
+    def throw(self):
+        """Throws appropriate errors for bad res codes"""
+        self.header.throw()
+
+    def _fill(self) -> bool:
+        """Moves the next decoded chunk into the buffer, False at the end of the body"""
+        for chunk in self._chunks:
+            if self._binary:
+                self._buffer += chunk
+                return True
+            self._pending += chunk
+            cut = len(self._pending) // 4 * 4
+            if cut:
+                self._buffer += b64decode(self._pending[:cut])
+                self._pending = self._pending[cut:]
+                return True
+        return False
+
+    def _take(self, size: int) -> bytes:
+        while len(self._buffer) < size:
+            if not self._fill():
+                raise errors.MoabHttpError("Server response was cut short")
+        taken = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        return taken
+
+    def _varint(self) -> bytes:
+        raw = b""
+        while True:
+            byte = self._take(1)
+            raw += byte
+            if byte[0] < 0x80:
+                return raw
+
+    def _parse_fields(self):
+        """Parses fields into header until data starts or the body ends"""
+        while self._buffer or self._fill():
+            tag = self._varint()
+            field, wire_type = divmod(_read_varint(tag), 8)
+
+            if wire_type == 0:
+                raw = self._varint()
+            elif wire_type == 1:
+                raw = self._take(8)
+            elif wire_type == 5:
+                raw = self._take(4)
+            elif wire_type == self._LENGTH_DELIMITED:
+                length = self._varint()
+                if field == self._DATA_FIELD:
+                    self._remaining = self.length = _read_varint(length)
+                    return
+                raw = length + self._take(_read_varint(length))
+            else:
+                raise errors.MoabResponseError("Server returned invalid data")
+
+            try:
+                self.header.MergeFromString(tag + raw)
+            except Exception as exc:  # pylint: disable=broad-exception-caught
+                raise errors.MoabResponseError(
+                    "Server returned invalid data") from exc
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer) -> int:
+        if self._remaining == 0:
+            return 0
+        size = min(len(buffer), self._remaining)
+        while len(self._buffer) < size:
+            if not self._fill():
+                raise errors.MoabHttpError("Server response was cut short")
+
+        buffer[:size] = self._buffer[:size]
+        del self._buffer[:size]
+        self._remaining -= size
+
+        # Pick up whatever follows the data field
+        if self._remaining == 0:
+            self._parse_fields()
+        return size
+
+    def close(self):
+        if not self.closed:
+            self._stream.close()
+        super().close()
+
+
+def _read_varint(raw: bytes) -> int:
+    """Decodes a protobuf varint"""
+    value = 0
+    for shift, byte in enumerate(raw):
+        value |= (byte & 0x7F) << (7 * shift)
+    return value
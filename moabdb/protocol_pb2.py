@@ -12,7 +12,7 @@ from google.protobuf import symbol_database as _symbol_database
 _sym_db = _symbol_database.Default()
 
 
-DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x11PATH/moabdb.proto\"n\n\x07Request\x12\x0e\n\x06symbol\x18\x01 \x01(\t\x12\x10\n\x08\x64\x61tatype\x18\x02 \x01(\t\x12\r\n\x05start\x18\x03 \x01(\r\x12\x0b\n\x03\x65nd\x18\x04 \x01(\r\x12\x10\n\x08username\x18\x05 \x01(\t\x12\r\n\x05token\x18\x06 \x01(\tJ\x04\x08\x07\x10\x10\"=\n\x08Response\x12\x0c\n\x04\x63ode\x18\x01 \x01(\r\x12\x0f\n\x07message\x18\x02 \x01(\t\x12\x0c\n\x04\x64\x61ta\x18\x03 \x01(\x0cJ\x04\x08\x04\x10\x10\x62\x06proto3')
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x11PATH/moabdb.proto\"\xb7\x01\n\x07Request\x12\x0e\n\x06symbol\x18\x01 \x01(\t\x12\x10\n\x08\x64\x61tatype\x18\x02 \x01(\t\x12\r\n\x05start\x18\x03 \x01(\r\x12\x0b\n\x03\x65nd\x18\x04 \x01(\r\x12\x10\n\x08username\x18\x05 \x01(\t\x12\r\n\x05token\x18\x06 \x01(\t\x12\x0e\n\x06\x66ormat\x18\x10 \x01(\t\x12\x15\n\rif_none_match\x18\x11 \x01(\t\x12\x0f\n\x07symbols\x18\x12 \x03(\t\x12\x0f\n\x07\x63olumns\x18\x13 \x03(\tJ\x04\x08\x07\x10\x10\"}\n\x08Response\x12\x0c\n\x04\x63ode\x18\x01 \x01(\r\x12\x0f\n\x07message\x18\x02 \x01(\t\x12\x0c\n\x04\x64\x61ta\x18\x03 \x01(\x0c\x12\x0e\n\x06\x66ormat\x18\x10 \x01(\t\x12\x0c\n\x04\x65tag\x18\x11 \x01(\t\x12\x0f\n\x07missing\x18\x12 \x03(\t\x12\x0f\n\x07\x62\x61tched\x18\x13 \x01(\x08J\x04\x08\x04\x10\x10\x62\x06proto3')
 
 _builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, globals())
 _builder.BuildTopDescriptorsAndMessages(
@@ -20,8 +20,8 @@ _builder.BuildTopDescriptorsAndMessages(
 if _descriptor._USE_C_DESCRIPTORS == False:
 
     DESCRIPTOR._options = None
-    _REQUEST._serialized_start = 21
-    _REQUEST._serialized_end = 131
-    _RESPONSE._serialized_start = 133
-    _RESPONSE._serialized_end = 194
+    _REQUEST._serialized_start = 22
+    _REQUEST._serialized_end = 205
+    _RESPONSE._serialized_start = 207
+    _RESPONSE._serialized_end = 332
 # @@protoc_insertion_point(module_scope)
@@ -0,0 +1,309 @@
+"""MoabDB Retries and Hedged Requests"""
+
+from collections import deque
+import asyncio
+import concurrent.futures as cf
+import contextvars
+import random
+import threading
+import time
+from . import cancellation
+from . import errors
+
+# Attempts made after a failure, by the class of error raised
+DEFAULT_RETRIES = {errors.MoabInternalError: 3, errors.MoabHttpError: 2}
+
+# Threads that run hedged requests
+HEDGE_WORKERS = 64
+
+
+class RetryBudget:
+    """
+    Caps retries and hedged requests at a fraction of recent requests,
+    so a struggling server isn't buried under repeats of its failures.
+
+    Args:
+        ratio (float, optional): Retries allowed per request sent
+        min_per_second (float, optional): Retries always allowed per second,
+            so lightly used clients can still retry
+        window (float, optional): Seconds of history the budget covers
+    """
+
+    def __init__(self, ratio: float = 0.1, min_per_second: float = 1.0,
+                 window: float = 10.0):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.window = window
+        self._requests = deque()
+        self._retries = deque()
+        self._lock = threading.Lock()
+
+    def _prune(self, now: float):
+        for stamps in (self._requests, self._retries):
+            while stamps and stamps[0] < now - self.window:
+                stamps.popleft()
+
+    def deposit(self):
+        """Records a request"""
+        now = time.monotonic()
+        with self._lock:
+            self._prune(now)
+            self._requests.append(now)
+
+    def withdraw(self) -> bool:
+        """
+        Takes a retry from the budget
+
+        Returns:
+            bool: Whether a retry may be sent
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._prune(now)
+            allowed = (self.min_per_second * self.window
+                       + self.ratio * len(self._requests))
+            if len(self._retries) >= allowed:
+                return False
+            self._retries.append(now)
+            return True
+
+
+class RetryPolicy:  # pylint: disable=too-many-instance-attributes
+    """
+    Resends requests that fail with a transient error, waiting an
+    exponentially growing, randomly jittered delay between attempts.
+    Optionally hedges requests: one that hasn't been answered within
+    ``hedge_after`` seconds is sent again, and whichever copy answers
+    first is used. Retries and hedges are both drawn from a shared
+    ``RetryBudget``.
+
+    Args:
+        retries (dict, optional): Maps error classes to the number of times
+            to resend a request failing with them, see ``DEFAULT_RETRIES``
+        base_delay (float, optional): Seconds to wait before the first retry
+        max_delay (float, optional): The longest wait between attempts, in seconds
+        hedge_after (float, optional): Seconds to wait on an answer before
+            sending a hedged copy, None to never hedge
+        budget (RetryBudget, optional): The budget retries and hedges draw from
+
+    Attributes:
+        retried (int): Requests sent again after a failure
+        hedged (int): Hedged copies sent
+        hedge_wins (int): Hedged copies that answered first
+        exhausted (int): Retries and hedges skipped for lack of budget
+    """
+
+    # pylint: disable=too-many-arguments
+    def __init__(self, retries: dict = None, *, base_delay: float = 0.1,
+                 max_delay: float = 5.0, hedge_after: float = None,
+                 budget: RetryBudget = None):
+        self.retries = dict(DEFAULT_RETRIES if retries is None else retries)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.hedge_after = hedge_after
+        self.budget = budget or RetryBudget()
+        self.retried = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.exhausted = 0
+        self._lock = threading.Lock()
+        self._pool = None
+
+    def _count(self, name: str):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def _next_delay(self, exc: Exception, attempt: int) -> float:
+        """Returns the wait before resending a failed request, None to give up"""
+        limit = next((count for kind, count in self.retries.items()
+                      if isinstance(exc, kind)), 0)
+        if attempt >= limit:
+            return None
+        if not self.budget.withdraw():
+            self._count("exhausted")
+            return None
+        self._count("retried")
+        return random.uniform(0, min(self.max_delay,
+                                     self.base_delay * 2 ** attempt))
+
+    def call(self, send, hedge: bool = True):
+        """
+        Sends a request, resending it on transient errors
+
+        Args:
+            send (callable): Sends the request and returns its response
+            hedge (bool, optional): Whether the request may be hedged
+
+        Returns:
+            The value returned by ``send``
+        """
+        attempt = 0
+        while True:
+            self.budget.deposit()
+            try:
+                if hedge and self.hedge_after is not None:
+                    return self._hedged(send)
+                return send()
+            except errors.MoabError as exc:
+                delay = self._next_delay(exc, attempt)
+                if delay is None:
+                    raise
+            attempt += 1
+            cancellation.sleep(delay)
+
+    def _hedged(self, send):
+        """Sends a request, and a copy of it if it's slow to answer"""
+        with self._lock:
+            if self._pool is None:
+                self._pool = cf.ThreadPoolExecutor(
+                    HEDGE_WORKERS, thread_name_prefix="moabdb-hedge")
+            pool = self._pool
+
+        first = pool.submit(contextvars.copy_context().run, send)
+        done, _ = cf.wait([first], timeout=self.hedge_after)
+        if done:
+            return first.result()
+        if not self.budget.withdraw():
+            self._count("exhausted")
+            return first.result()
+
+        self._count("hedged")
+        second = pool.submit(contextvars.copy_context().run, send)
+        pending = {first, second}
+        while True:
+            done, pending = cf.wait(pending, return_when=cf.FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is second:
+                        self._count("hedge_wins")
+                    return future.result()
+            if not pending:
+                return first.result()
+
+    async def call_async(self, send, hedge: bool = True):
+        """
+        Coroutine version of ``call``
+
+        Args:
+            send (callable): Returns a coroutine that sends the request
+            hedge (bool, optional): Whether the request may be hedged
+
+        Returns:
+            The value the coroutine returns
+        """
+        attempt = 0
+        while True:
+            self.budget.deposit()
+            try:
+                if hedge and self.hedge_after is not None:
+                    return await self._hedged_async(send)
+                return await send()
+            except errors.MoabError as exc:
+                delay = self._next_delay(exc, attempt)
+                if delay is None:
+                    raise
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    async def _hedged_async(self, send):
+        """Coroutine version of ``_hedged``, the slower copy is cancelled"""
+        first = asyncio.ensure_future(send())
+        done, _ = await asyncio.wait([first], timeout=self.hedge_after)
+        if done:
+            return first.result()
+        if not self.budget.withdraw():
+            self._count("exhausted")
+            return await first
+
+        self._count("hedged")
+        second = asyncio.ensure_future(send())
+        pending = {first, second}
+        try:
+            while True:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is second:
+                            self._count("hedge_wins")
+                        return task.result()
+                if not pending:
+                    return first.result()
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def stats(self) -> dict:
+        """
+        Returns the policy's counters
+
+        Returns:
+            dict: The retried requests, hedged copies, hedged copies that
+            answered first, and retries skipped for lack of budget
+        """
+        with self._lock:
+            return {"retried": self.retried, "hedged": self.hedged,
+                    "hedge_wins": self.hedge_wins, "exhausted": self.exhausted}
+
+
+_POLICY = RetryPolicy()
+
+
+def get_retry_policy() -> RetryPolicy:
+    """
+    Returns the policy requests are retried with, if one is enabled
+
+    Returns:
+        RetryPolicy: The active policy, or None
+    """
+    return _POLICY
+
+
+def configure_retries(retries: dict = None, **kwargs):
+    """
+    Replaces the policy failed requests are retried with.
+    A policy retrying server errors and timeouts is enabled out of the box.
+
+    Args:
+        retries (dict, optional): Maps error classes to the number of times
+            to resend a request failing with them
+        **kwargs: The other settings of ``RetryPolicy``, such as
+            ``base_delay``, ``hedge_after`` or ``budget``
+
+    Returns:
+        None: On success, this will return nothing
+
+    Example::
+
+        import moabdb as mdb
+        mdb.configure_retries({mdb.MoabHttpError: 5}, hedge_after=2.0)
+        df = mdb.get_equity(sp500_tickers, "1y")
+        print(mdb.retry_stats())
+
+    """
+    # pylint: disable=global-statement
+    global _POLICY
+    _POLICY = RetryPolicy(retries, **kwargs)
+
+
+def disable_retries():
+    """
+    Stops retrying and hedging requests, a failed request then fails right away
+
+    Returns:
+        None: On success, this will return nothing
+    """
+    # pylint: disable=global-statement
+    global _POLICY
+    _POLICY = None
+
+
+def retry_stats() -> dict:
+    """
+    Returns the retry policy's counters
+
+    Returns:
+        dict: See ``RetryPolicy.stats``, empty if retries are disabled
+    """
+    policy = _POLICY
+    return {} if policy is None else policy.stats()
@@ -0,0 +1,191 @@
+"""MoabDB Incremental Sync"""
+
+import os
+import re
+import threading
+import time
+from . import errors
+from . import timewindows
+from .cache import SETTLE_SECONDS
+from .lib import _equity_datatype, _server_req
+from .executor import fan_out
+from .constants import pd, pq, Union
+
+# Part files are named after the first and last epoch they hold
+_PART_NAME = re.compile(r"^part-(\d+)-(\d+)\.parquet$")
+
+# Rows that may still change on the server, replaced by every sync
+_OPEN_PART = "open.parquet"
+
+
+def sync(tickers: Union[str, list], store_path: str,
+         intraday: bool = False, sample: str = "10y") -> dict:
+    """
+    Brings a local store of equity data up to date, requesting only
+    the rows newer than what each symbol already has stored.
+
+    Each symbol is kept in its own directory under
+    ``store_path/<datatype>/<SYMBOL>`` as Parquet part files, one per sync
+    that added rows. Rows newer than ``cache.SETTLE_SECONDS``, such as a
+    daily bar of a session still trading, may still change on the server.
+    They are kept apart in an ``open.parquet`` part that each sync fetches
+    again and replaces. Parts are written atomically, so an interrupted sync
+    never leaves duplicate rows and the next one picks up where it left off.
+    Read a symbol back with ``read_store``, which orders the rows by time.
+    Reading the directory with ``pandas.read_parquet`` returns the parts in
+    file name order, which puts the open rows first.
+
+    Args:
+        tickers (str or list of str): The ticker(s) to bring up to date
+        store_path (str): The directory to keep the store in
+        intraday (bool, optional): Sync intraday data instead of daily data
+        sample (str, optional): The history to fetch for symbols that
+            aren't stored yet, such as ``"10y"``
+
+    Raises:
+        errors.MoabRequestError: If the request is invalid or intraday
+            data is requested without credentials
+        errors.MoabHttpError: If there's a problem reaching the server
+        errors.MoabUnauthorizedError: If the user is not authorized to request the datatype
+
+    Returns:
+        dict: The number of rows added for each symbol, net of the open rows
+        replaced
+
+    Example::
+
+        import moabdb as mdb
+        added = mdb.sync(["AAPL", "MSFT"], "~/moabdb-store")
+        df = mdb.read_store("AAPL", "~/moabdb-store")
+
+    """
+    datatype, columns = _equity_datatype(intraday)
+
+    if isinstance(tickers, str):
+        tickers = [tickers]
+    elif not isinstance(tickers, list):
+        raise errors.MoabRequestError("Invalid ticker type")
+    tickers = list(dict.fromkeys(str.upper(ticker) for ticker in tickers))
+
+    store = os.path.join(os.path.expanduser(store_path), datatype)
+    first = timewindows.get_unix_dates(sample, None, None)[0]
+    now = int(time.time())
+
+    def sync_one(ticker):
+        return _sync_symbol(os.path.join(store, ticker), ticker,
+                            (first, now), datatype, columns)
+
+    return dict(zip(tickers, fan_out(sync_one, tickers)))
+
+
+def read_store(ticker: str, store_path: str,
+               intraday: bool = False) -> pd.DataFrame:
+    """
+    Reads a symbol's rows from a store kept by ``sync``, in time order
+
+    Args:
+        ticker (str): The ticker to read
+        store_path (str): The directory the store is kept in
+        intraday (bool, optional): Read intraday data instead of daily data
+
+    Raises:
+        errors.MoabNotFoundError: If no rows of the symbol are stored
+
+    Returns:
+        pandas.DataFrame: The stored rows, oldest first
+
+    Example::
+
+        import moabdb as mdb
+        mdb.sync("AAPL", "~/moabdb-store")
+        df = mdb.read_store("AAPL", "~/moabdb-store")
+
+    """
+    # Reading a local store needs no credentials, unlike _equity_datatype
+    datatype = "intraday_stocks" if intraday else "daily_stocks"
+    directory = os.path.join(os.path.expanduser(store_path), datatype,
+                             ticker.upper())
+    try:
+        names = sorted(name for name in os.listdir(directory)
+                       if _PART_NAME.match(name) or name == _OPEN_PART)
+    except FileNotFoundError:
+        names = []
+    if not names:
+        raise errors.MoabNotFoundError(ticker + " not stored")
+
+    frame = pd.concat([pd.read_parquet(os.path.join(directory, name))
+                       for name in names], ignore_index=True)
+    time_column = "Time" if intraday else "Date"
+    return frame.sort_values(time_column, kind="stable", ignore_index=True)
+
+
+def latest_epoch(directory: str) -> int:
+    """
+    Returns the newest settled epoch held in a symbol's store directory
+
+    Args:
+        directory (str): The symbol's directory, see ``sync``
+
+    Returns:
+        int: The epoch of the newest stored row outside ``open.parquet``,
+        or None if no such row is stored
+    """
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return None
+    ends = [int(match.group(2)) for match in map(_PART_NAME.match, names)
+            if match is not None]
+    return max(ends, default=None)
+
+
+def _sync_symbol(directory, ticker, window, datatype, columns) -> int:
+    """
+    Appends a symbol's new rows to its store and replaces its open rows,
+    returns how many rows were added
+    """
+    first, now = window
+    latest = latest_epoch(directory)
+    start = first if latest is None else latest + 1
+    if start > now:
+        return 0
+
+    try:
+        frame = _server_req(ticker, start, now, datatype)[columns]
+    except errors.MoabNotFoundError:
+        return 0
+
+    epochs = timewindows.to_epochs(frame[columns[1]])
+    new = epochs >= start
+    frame, epochs = frame[new], epochs[new]
+    if frame.empty:
+        return 0
+
+    open_file = os.path.join(directory, _OPEN_PART)
+    try:
+        replaced = pq.ParquetFile(open_file).metadata.num_rows
+    except FileNotFoundError:
+        replaced = 0
+
+    # Drop the old open rows before writing their replacements, so a crash
+    # in between loses rows the next sync fetches again rather than
+    # leaving duplicates
+    os.makedirs(directory, exist_ok=True)
+    if replaced:
+        os.remove(open_file)
+    settled = epochs <= now - SETTLE_SECONDS
+    if settled.any():
+        _write_part(directory, frame[settled],
+                    f"part-{int(epochs[settled].min())}-"
+                    f"{int(epochs[settled].max())}.parquet")
+    if not settled.all():
+        _write_part(directory, frame[~settled], _OPEN_PART)
+    return len(frame) - replaced
+
+
+def _write_part(directory: str, frame: pd.DataFrame, name: str):
+    """Atomically writes a part file"""
+    temp = os.path.join(
+        directory, f".{name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    frame.to_parquet(temp, index=False)
+    os.replace(temp, os.path.join(directory, name))
@@ -3,6 +3,8 @@
 import re
 from datetime import datetime
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
 from . import errors
 
 
@@ -85,3 +87,35 @@ def get_unix_dates(sample_len: str, start_dt: str, end_dt: str):
         raise errors.MoabRequestError("Invalid date input")
 
     return (start, end)
+
+
+def to_epochs(column: pd.Series) -> pd.Series:
+    """
+    Convert a column of timestamps into integer unix epoch seconds
+
+    Args:
+        column (pandas.Series): Datetime-like values, naive values are read as UTC
+
+    Returns:
+        pandas.Series: The epoch seconds of each value
+    """
+    column = pd.to_datetime(column)
+    if column.dt.tz is not None:
+        column = column.dt.tz_convert(None)
+    return (column - pd.Timestamp(0)) // pd.Timedelta(seconds=1)
+
+
+def to_epochs_arrow(column) -> pa.Array:
+    """
+    Convert an Arrow column of dates or timestamps into integer unix epoch seconds
+
+    Args:
+        column (pyarrow.Array or pyarrow.ChunkedArray): Date or timestamp values
+
+    Returns:
+        pyarrow.Array: The epoch seconds of each value
+    """
+    if pa.types.is_date(column.type):
+        column = column.cast(pa.timestamp("s"))
+    per_second = {"s": 1, "ms": 1000, "us": 1000000, "ns": 1000000000}
+    return pc.divide(column.cast(pa.int64()), per_second[column.type.unit])
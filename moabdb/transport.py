@@ -0,0 +1,508 @@
+"""MoabDB Transport Backends"""
+
+from collections import namedtuple
+import asyncio
+import functools
+import gzip
+import threading
+import weakref
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from . import errors
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+try:
+    import h2
+except ImportError:
+    h2 = None
+
+# Content encodings the client can decode, best first
+ACCEPT_ENCODING = "zstd, gzip" if zstandard is not None else "gzip"
+
+# Bytes read from the network at a time when streaming a response
+CHUNK_SIZE = 1 << 16
+
+
+TransportResponse = namedtuple(
+    "TransportResponse", ["status_code", "headers", "content"])
+TransportResponse.__doc__ = """
+    The raw HTTP response returned by a transport
+
+    Attributes:
+        status_code (int): The HTTP status code
+        headers (dict): The response headers, keys are case-insensitive
+        content (bytes): The response body
+    """
+
+TransportStream = namedtuple(
+    "TransportStream", ["status_code", "headers", "chunks", "close"])
+TransportStream.__doc__ = """
+    An HTTP response whose body is still being received
+
+    Attributes:
+        status_code (int): The HTTP status code
+        headers (dict): The response headers, keys are case-insensitive
+        chunks (iterator): Yields the decoded body as it arrives, in bytes
+        close (callable): Releases the connection, call once done with chunks
+    """
+
+
+def decompress(content: bytes, encoding: str) -> bytes:
+    """
+    Decodes a response body sent with a ``Content-Encoding``
+
+    Args:
+        content (bytes): The encoded body
+        encoding (str): The value of the ``Content-Encoding`` header
+
+    Returns:
+        bytes: The decoded body
+
+    Raises:
+        errors.MoabResponseError: If the encoding isn't supported or the body is corrupt
+    """
+    encoding = (encoding or "identity").strip().lower()
+    try:
+        if encoding == "identity":
+            return content
+        if encoding == "gzip":
+            return gzip.decompress(content)
+        if encoding == "zstd" and zstandard is not None:
+            return zstandard.ZstdDecompressor().decompressobj().decompress(content)
+    except Exception as exc:  # pylint: disable=broad-exception-caught
+        raise errors.MoabResponseError("Server returned corrupt data") from exc
+    raise errors.MoabResponseError("Unsupported content encoding " + encoding)
+
+
+class Transport:
+    """
+    Base class for the wire layer that ``Request.send`` dispatches through.
+    Subclasses move bytes to and from the API and must be safe to call from
+    multiple threads at once.
+    """
+
+    def request(self, method: str, url: str, headers: dict,
+                body: bytes = None, timeout: float = 180) -> TransportResponse:
+        """
+        Performs a single HTTP exchange
+
+        Args:
+            method (str): The HTTP method to use
+            url (str): The URL to send the request to
+            headers (dict): The request headers
+            body (bytes, optional): The request body
+            timeout (float, optional): Seconds to wait for the server
+
+        Returns:
+            TransportResponse: The status, headers and body of the response
+
+        Raises:
+            errors.MoabHttpError: If the server can't be reached or times out
+        """
+        raise NotImplementedError
+
+    def stream(self, method: str, url: str, headers: dict,
+               body: bytes = None, timeout: float = 180) -> TransportStream:
+        """
+        Performs a single HTTP exchange, returning before the body has been received.
+        Transports that can't stream receive the whole body and hand it out in chunks.
+
+        Args:
+            method (str): The HTTP method to use
+            url (str): The URL to send the request to
+            headers (dict): The request headers
+            body (bytes, optional): The request body
+            timeout (float, optional): Seconds to wait for the server
+
+        Returns:
+            TransportStream: The status, headers and body chunks of the response
+
+        Raises:
+            errors.MoabHttpError: If the server can't be reached or times out
+        """
+        res = self.request(method, url, headers, body, timeout)
+        content = res.content
+        chunks = (content[i:i + CHUNK_SIZE]
+                  for i in range(0, len(content), CHUNK_SIZE))
+        return TransportStream(res.status_code, res.headers, chunks,
+                               lambda: None)
+
+    def close(self):
+        """Releases any connections held by the transport"""
+
+
+class RequestsTransport(Transport):
+    """
+    Transport built on a pooled keep-alive ``requests.Session``.
+
+    Args:
+        maxsize (int, optional): Maximum number of kept-alive connections per host.
+            This should be at least the number of threads making requests.
+        connections (int, optional): Number of distinct hosts to keep pools for
+    """
+
+    def __init__(self, maxsize: int = 32, connections: int = 4):
+        if maxsize < 1 or connections < 1:
+            raise errors.MoabRequestError("Pool sizes must be positive")
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=connections,
+                              pool_maxsize=maxsize)
+        self._session.mount("https://", adapter)
+        self._session.mount("http://", adapter)
+
+    def request(self, method, url, headers, body=None, timeout=180):
+        try:
+            res = self._session.request(method, url, headers=headers,
+                                        data=body, timeout=timeout)
+        except requests.exceptions.Timeout as exc:
+            raise errors.MoabHttpError(
+                "Connecting to server timed out") from exc
+        except requests.exceptions.ConnectionError as exc:
+            raise errors.MoabHttpError(
+                "Could not connect to server") from exc
+        return TransportResponse(res.status_code, res.headers, res.content)
+
+    def stream(self, method, url, headers, body=None, timeout=180):
+        try:
+            res = self._session.request(method, url, headers=headers,
+                                        data=body, timeout=timeout,
+                                        stream=True)
+        except requests.exceptions.Timeout as exc:
+            raise errors.MoabHttpError(
+                "Connecting to server timed out") from exc
+        except requests.exceptions.ConnectionError as exc:
+            raise errors.MoabHttpError(
+                "Could not connect to server") from exc
+
+        def chunks():
+            try:
+                yield from res.iter_content(CHUNK_SIZE)
+            except requests.exceptions.RequestException as exc:
+                raise errors.MoabHttpError(
+                    "Connection to server was interrupted") from exc
+
+        return TransportStream(res.status_code, res.headers, chunks(),
+                               res.close)
+
+    def close(self):
+        self._session.close()
+
+
+class Http2Transport(Transport):
+    """
+    Transport that multiplexes concurrent requests over a single HTTP/2
+    connection. Requires the optional ``httpx[http2]`` package.
+
+    Args:
+        max_connections (int, optional): Maximum number of connections to open.
+            Each connection carries many concurrent requests.
+    """
+
+    def __init__(self, max_connections: int = 1):
+        if httpx is None or h2 is None:
+            raise errors.MoabRequestError(
+                "Http2Transport needs httpx and h2, install with "
+                "'pip install httpx[http2]'")
+        self._client = httpx.Client(
+            http2=True,
+            limits=httpx.Limits(max_connections=max_connections))
+
+    def request(self, method, url, headers, body=None, timeout=180):
+        try:
+            res = self._client.request(method, url, headers=headers,
+                                       content=body, timeout=timeout)
+        except httpx.TimeoutException as exc:
+            raise errors.MoabHttpError(
+                "Connecting to server timed out") from exc
+        except httpx.TransportError as exc:
+            raise errors.MoabHttpError(
+                "Could not connect to server") from exc
+        return TransportResponse(res.status_code, res.headers, res.content)
+
+    def stream(self, method, url, headers, body=None, timeout=180):
+        req = self._client.build_request(method, url, headers=headers,
+                                         content=body, timeout=timeout)
+        try:
+            res = self._client.send(req, stream=True)
+        except httpx.TimeoutException as exc:
+            raise errors.MoabHttpError(
+                "Connecting to server timed out") from exc
+        except httpx.TransportError as exc:
+            raise errors.MoabHttpError(
+                "Could not connect to server") from exc
+
+        def chunks():
+            try:
+                yield from res.iter_bytes(CHUNK_SIZE)
+            except httpx.TransportError as exc:
+                raise errors.MoabHttpError(
+                    "Connection to server was interrupted") from exc
+
+        return TransportStream(res.status_code, res.headers, chunks(),
+                               res.close)
+
+    def close(self):
+        self._client.close()
+
+
+class InProcessTransport(Transport):
+    """
+    Transport that answers requests from a local handler without touching
+    the network. Useful for tests and for benchmarking the client.
+
+    Args:
+        handler (callable): Called as ``handler(method, url, headers, body)``
+            and returns a ``TransportResponse``, see ``moabdb.LocalServer``
+    """
+
+    def __init__(self, handler):
+        self._handler = handler
+
+    def request(self, method, url, headers, body=None, timeout=180):
+        res = self._handler(method, url, CaseInsensitiveDict(headers), body)
+        res_headers = CaseInsensitiveDict(res.headers)
+        content = decompress(res.content, res_headers.get("Content-Encoding"))
+        return TransportResponse(res.status_code, res_headers, content)
+
+
+class AsyncTransport:
+    """
+    Base class for the wire layer that ``Request.send_async`` dispatches
+    through. Subclasses move bytes to and from the API without blocking
+    the event loop.
+    """
+
+    async def request(self, method: str, url: str, headers: dict,
+                      body: bytes = None,
+                      timeout: float = 180) -> TransportResponse:
+        """
+        Performs a single HTTP exchange
+
+        Args:
+            method (str): The HTTP method to use
+            url (str): The URL to send the request to
+            headers (dict): The request headers
+            body (bytes, optional): The request body
+            timeout (float, optional): Seconds to wait for the server
+
+        Returns:
+            TransportResponse: The status, headers and body of the response
+
+        Raises:
+            errors.MoabHttpError: If the server can't be reached or times out
+        """
+        raise NotImplementedError
+
+    async def aclose(self):
+        """Releases any connections held by the transport"""
+
+
+class ThreadedAsyncTransport(AsyncTransport):
+    """
+    Async transport that runs the blocking transport in the default
+    executor. Used when ``httpx`` isn't installed or a custom transport,
+    such as ``InProcessTransport``, has been set with ``set_transport``.
+
+    Args:
+        transport (Transport, optional): The transport to run,
+            defaults to the active one at the time of each request
+    """
+
+    def __init__(self, transport: Transport = None):
+        self._transport = transport
+
+    async def request(self, method, url, headers, body=None, timeout=180):
+        active = self._transport or get_transport()
+        call = functools.partial(active.request, method, url, headers,
+                                 body, timeout)
+        return await asyncio.get_running_loop().run_in_executor(None, call)
+
+
+class HttpxAsyncTransport(AsyncTransport):
+    """
+    Async transport built on a pooled ``httpx.AsyncClient``.
+    Requires the optional ``httpx`` package. A client is kept per event
+    loop, since connections can't move between loops.
+
+    Args:
+        max_connections (int, optional): Maximum number of connections to open
+        http2 (bool, optional): Whether to multiplex requests over HTTP/2,
+            which needs ``httpx[http2]``
+    """
+
+    def __init__(self, max_connections: int = 100, http2: bool = False):
+        if httpx is None:
+            raise errors.MoabRequestError(
+                "HttpxAsyncTransport needs httpx, install with "
+                "'pip install httpx'")
+        self.max_connections = max_connections
+        self.http2 = http2
+        self._clients = weakref.WeakKeyDictionary()
+
+    def _client(self):
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None:
+            client = httpx.AsyncClient(
+                http2=self.http2,
+                limits=httpx.Limits(max_connections=self.max_connections))
+            self._clients[loop] = client
+        return client
+
+    async def request(self, method, url, headers, body=None, timeout=180):
+        try:
+            res = await self._client().request(method, url, headers=headers,
+                                               content=body, timeout=timeout)
+        except httpx.TimeoutException as exc:
+            raise errors.MoabHttpError(
+                "Connecting to server timed out") from exc
+        except httpx.TransportError as exc:
+            raise errors.MoabHttpError(
+                "Could not connect to server") from exc
+        return TransportResponse(res.status_code, res.headers, res.content)
+
+    async def aclose(self):
+        client = self._clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.aclose()
+
+
+_TRANSPORT = None
+_TRANSPORT_LOCK = threading.Lock()
+_ASYNC_TRANSPORT = None
+_THREADED_TRANSPORT = ThreadedAsyncTransport()
+_HTTPX_TRANSPORT = None
+
+
+def get_transport() -> Transport:
+    """
+    Returns the transport used to reach the MoabDB API,
+    creating the default pooled ``RequestsTransport`` on first use.
+
+    Returns:
+        Transport: The active transport
+    """
+    # pylint: disable=global-statement
+    global _TRANSPORT
+
+    transport = _TRANSPORT
+    if transport is not None:
+        return transport
+
+    with _TRANSPORT_LOCK:
+        if _TRANSPORT is None:
+            _TRANSPORT = RequestsTransport()
+        return _TRANSPORT
+
+
+def set_transport(transport: Transport):
+    """
+    Replaces the transport used to reach the MoabDB API.
+    The previous transport is closed.
+
+    Args:
+        transport (Transport): The transport to send requests through
+
+    Returns:
+        None: On success, this will return nothing
+
+    Example::
+
+        import moabdb as mdb
+        mdb.set_transport(mdb.Http2Transport())
+
+    """
+    if not isinstance(transport, Transport):
+        raise errors.MoabRequestError("Transport must subclass Transport")
+
+    # pylint: disable=global-statement
+    global _TRANSPORT
+
+    with _TRANSPORT_LOCK:
+        previous = _TRANSPORT
+        _TRANSPORT = transport
+    if previous is not None and previous is not transport:
+        previous.close()
+
+
+def configure_pool(maxsize: int = 32, connections: int = 4):
+    """
+    Configures the keep-alive connection pool used to reach the MoabDB API.
+    The pool is shared by every request in the process, including the worker
+    threads used for multi-ticker requests. This installs a new
+    ``RequestsTransport`` as the active transport.
+
+    Args:
+        maxsize (int): Maximum number of kept-alive connections per host.
+            This should be at least the number of threads making requests.
+        connections (int): Number of distinct hosts to keep pools for
+
+    Returns:
+        None: On success, this will return nothing
+
+    Example::
+
+        import moabdb as mdb
+        mdb.configure_pool(maxsize=64)
+
+    """
+    set_transport(RequestsTransport(maxsize, connections))
+
+
+def get_async_transport() -> AsyncTransport:
+    """
+    Returns the transport used by the async API. Unless one has been set
+    with ``set_async_transport``, this is an ``HttpxAsyncTransport`` when
+    ``httpx`` is installed and the default transport is in use, otherwise
+    the active transport is run in an executor.
+
+    Returns:
+        AsyncTransport: The active async transport
+    """
+    # pylint: disable=global-statement
+    global _HTTPX_TRANSPORT
+
+    if _ASYNC_TRANSPORT is not None:
+        return _ASYNC_TRANSPORT
+    if httpx is None or not isinstance(get_transport(), RequestsTransport):
+        return _THREADED_TRANSPORT
+
+    with _TRANSPORT_LOCK:
+        if _HTTPX_TRANSPORT is None:
+            _HTTPX_TRANSPORT = HttpxAsyncTransport()
+        return _HTTPX_TRANSPORT
+
+
+def set_async_transport(transport: AsyncTransport):
+    """
+    Replaces the transport used by the async API.
+    Pass None to go back to the default.
+
+    Args:
+        transport (AsyncTransport): The transport to send async requests through
+
+    Returns:
+        None: On success, this will return nothing
+
+    Example::
+
+        import moabdb as mdb
+        mdb.set_async_transport(mdb.HttpxAsyncTransport(http2=True))
+
+    """
+    if transport is not None and not isinstance(transport, AsyncTransport):
+        raise errors.MoabRequestError("Transport must subclass AsyncTransport")
+
+    # pylint: disable=global-statement
+    global _ASYNC_TRANSPORT
+    _ASYNC_TRANSPORT = transport
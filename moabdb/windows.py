@@ -0,0 +1,240 @@
+"""
+
+Bulk requests for many short windows of equity data, such as the windows
+around events in an event study.
+
+Windows are grouped by ticker, and overlapping or nearby windows of the
+same ticker are merged, so each stretch of data is requested once. The
+merged windows are requested concurrently and each requested window is
+sliced back out of the results.
+
+>>> import moabdb as mdb
+>>> events = [("AAPL", "2023-01-20", "2023-02-10"),
+...           ("aapl", "2023-02-01", "2023-02-20"),
+...           ("MSFT", "2023-01-10", "2023-01-31")]
+>>> df = mdb.get_equity_windows(events)
+>>> df.loc[1]  # The second window, indexed by date
+
+"""
+
+from . import cancellation
+from . import errors
+from . import timewindows
+from .cancellation import CancellationToken
+from .lib import _equity_datatype, _server_req, _round_floats, _split_failures
+from .executor import fan_out
+from .constants import pd, np, Union
+
+_DAY = 86400
+
+
+# pylint: disable=too-many-arguments,too-many-locals
+def get_equity_windows(windows: Union[pd.DataFrame, list],
+                       intraday: bool = False,
+                       *,
+                       gap_days: float = 1,
+                       on_error: str = "raise",
+                       deadline: float = None,
+                       cancel: CancellationToken = None) -> Union[pd.DataFrame, tuple]:
+    """
+
+    Returns a ``pandas.DataFrame`` with the price and volume information of
+    every window requested, fetching each ticker's overlapping windows once.
+
+
+    Parameters
+    ----------
+    windows : pandas.DataFrame or list of tuple
+        The windows to look up, as a DataFrame with ``Symbol``, ``Start`` and
+        ``End`` columns or a list of ``(symbol, start, end)`` tuples.
+        Starts and ends are dates or timestamps, inclusive, read as UTC.
+        Symbols are case insensitive.
+
+    intraday : bool, optional, default False
+        Set to True to return intraday data.
+        Default is False to return end-of-day data.
+        See moabdb.com for subscriptions for intraday access.
+
+    gap_days : float, optional, default 1
+        Windows of the same ticker less than this many days apart are
+        merged and fetched together, trading a few extra rows for fewer
+        requests.
+
+    on_error : {"raise", "collect"}, optional, default "raise"
+        With "collect", tickers that fail are left out and reported
+        instead, see ``get_equity``.
+
+    deadline : float, optional
+        Seconds the whole call may take, see ``get_equity``.
+
+    cancel : CancellationToken, optional
+        A token that stops the call from another thread, see ``get_equity``.
+
+
+    Returns
+    -------
+    out : pandas.DataFrame
+        DataFrame indexed by window and time, with the same columns as
+        ``get_equity`` plus ``Symbol``. Windows are labelled by their row
+        label in ``windows``, or their position in the list, so
+        ``out.loc[label]`` holds a single window.
+        Windows without data are left out.
+
+        With ``on_error="collect"``, a tuple of the DataFrame and a second
+        DataFrame with the ``Symbol``, ``Error`` class name and ``Message``
+        of each merged request that failed.
+
+
+    Raises
+    ------
+    errors.MoabRequestError:
+        If the server has a problem interpreting the request,
+        or if an invalid parameter is passed
+    errors.MoabHttpError:
+        If there's a problem transporting the payload or receiving a response
+    errors.MoabUnauthorizedError:
+        If the user is not authorized to request the datatype
+    errors.MoabNotFoundError:
+        If no data was found for a merged window
+    errors.MoabDeadlineError:
+        If the call runs past its deadline
+    errors.MoabCancelledError:
+        If the call is cancelled through its token
+
+    """
+
+    # Check intraday authorization
+    equity_freq, columns = _equity_datatype(intraday)
+    if on_error not in ("raise", "collect"):
+        raise errors.MoabRequestError("on_error must be 'raise' or 'collect'")
+
+    # Normalize the windows and merge them per ticker
+    table, labels = _window_table(windows)
+    merged = _merge_windows(table, gap_days)
+
+    # Fetch the merged windows concurrently
+    with cancellation.scope(deadline, cancel):
+        results = fan_out(_server_req, merged["Symbol"], merged["Start"],
+                          merged["End"], [equity_freq]*len(merged),
+                          return_exceptions=True)
+    if on_error == "raise":
+        for result in results:
+            if isinstance(result, errors.MoabError):
+                raise result
+
+    # Slice each requested window out of its merged window
+    pieces = [_slice_windows(result[columns], table.iloc[rows], columns[1])
+              for rows, result in zip(merged["Rows"], results)
+              if not isinstance(result, errors.MoabError)]
+    if pieces:
+        return_db = pd.concat(pieces).sort_index(
+            level=0, sort_remaining=False, kind="stable")
+    else:
+        return_db = pd.DataFrame(columns=["Window"] + columns).set_index(
+            ["Window", columns[1]])
+    return_db.index = pd.MultiIndex.from_arrays(
+        [labels[return_db.index.get_level_values(0).to_numpy(dtype=int)],
+         return_db.index.get_level_values(1)],
+        names=[None, columns[1]])
+    return_db = _round_floats(return_db)
+
+    if on_error == "collect":
+        return return_db, _split_failures(list(merged["Symbol"]), results)[1]
+    return return_db
+
+
+def plan_windows(windows: Union[pd.DataFrame, list],
+                 gap_days: float = 1) -> pd.DataFrame:
+    """
+    Merges the windows of each ticker into the fewest requests covering
+    them all, see ``get_equity_windows``
+
+    Args:
+        windows (pandas.DataFrame or list): The windows, see ``get_equity_windows``
+        gap_days (float, optional): Windows of the same ticker less than
+            this many days apart are merged
+
+    Returns:
+        pandas.DataFrame: The ``Symbol``, ``Start`` and ``End`` epochs of each
+        request, and the ``Rows`` positions of the windows it covers
+    """
+    return _merge_windows(_window_table(windows)[0], gap_days)
+
+
+def _merge_windows(table: pd.DataFrame, gap_days: float) -> pd.DataFrame:
+    """Merges normalized windows, see ``plan_windows``"""
+    ordered = table.sort_values(["Symbol", "Start"], kind="stable")
+    reach = ordered.groupby("Symbol", sort=False)["End"].cummax()
+    previous = reach.groupby(ordered["Symbol"], sort=False).shift()
+    starts = (previous.isna() |
+              (ordered["Start"] > previous + gap_days * _DAY)).cumsum()
+
+    groups = ordered.groupby(starts.to_numpy(), sort=False)
+    positions = ordered.index.to_numpy()
+    return pd.DataFrame({
+        "Symbol": groups["Symbol"].first().to_numpy(),
+        "Start": groups["Start"].min().to_numpy(),
+        "End": groups["End"].max().to_numpy(),
+        "Rows": [positions[rows] for rows in groups.indices.values()]})
+
+
+def _window_table(windows) -> tuple:
+    """
+    Normalizes requested windows
+
+    Args:
+        windows (pandas.DataFrame or list): The windows, see ``get_equity_windows``
+
+    Raises:
+        errors.MoabRequestError: If the windows can't be read
+
+    Returns:
+        tuple: A DataFrame of upper case ``Symbol`` and ``Start`` and ``End``
+        epochs indexed by position, and the label of each window
+    """
+    if isinstance(windows, list):
+        windows = pd.DataFrame(windows, columns=["Symbol", "Start", "End"])
+    elif not isinstance(windows, pd.DataFrame) or \
+            not {"Symbol", "Start", "End"} <= set(windows.columns):
+        raise errors.MoabRequestError(
+            "windows must be a list or a DataFrame of Symbol, Start and End")
+
+    try:
+        table = pd.DataFrame({
+            "Symbol": windows["Symbol"].astype(str).str.strip().str.upper(),
+            "Start": timewindows.to_epochs(windows["Start"]),
+            "End": timewindows.to_epochs(windows["End"])}).astype(
+                {"Start": "int64", "End": "int64"})
+    except (TypeError, ValueError) as exc:
+        raise errors.MoabRequestError("Invalid window dates") from exc
+    if (table["Start"] > table["End"]).any():
+        raise errors.MoabRequestError("Window starts after it ends")
+    return table.reset_index(drop=True), windows.index.to_numpy()
+
+
+def _slice_windows(frame: pd.DataFrame, windows: pd.DataFrame,
+                   time_column: str) -> pd.DataFrame:
+    """
+    Cuts the rows of each window out of a frame covering them all
+
+    Args:
+        frame (pandas.DataFrame): The rows returned for the merged window
+        windows (pandas.DataFrame): The windows to cut, indexed by position
+        time_column (str): The frame's time column
+
+    Returns:
+        pandas.DataFrame: The rows of each window, indexed by window
+        position and time
+    """
+    epochs = timewindows.to_epochs(frame[time_column]).to_numpy()
+    if not np.all(epochs[1:] >= epochs[:-1]):
+        order = np.argsort(epochs, kind="stable")
+        frame, epochs = frame.iloc[order], epochs[order]
+
+    first = np.searchsorted(epochs, windows["Start"].to_numpy(), "left")
+    last = np.searchsorted(epochs, windows["End"].to_numpy(), "right")
+    lengths = np.maximum(last - first, 0)
+    offsets = np.repeat(first - np.cumsum(lengths) + lengths, lengths)
+    sliced = frame.iloc[offsets + np.arange(lengths.sum())]
+    sliced.insert(0, "Window", np.repeat(windows.index.to_numpy(), lengths))
+    return sliced.set_index(["Window", time_column])
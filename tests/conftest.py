@@ -0,0 +1,74 @@
+"""Shared fixtures for the moabdb tests, served by an in-process LocalServer"""
+
+import numpy as np
+import pandas as pd
+import pytest
+import moabdb as mdb
+from moabdb import cache, chunking, constants, executor, limiter
+from moabdb import proto_wrapper, retry, transport
+
+# Module settings each test may change, restored after it
+_SETTINGS = [
+    (constants, "API_KEY"), (constants, "API_USERNAME"),
+    (constants, "PAYLOAD_FORMAT"), (constants, "BATCH_SIZE"),
+    (proto_wrapper, "_BINARY"),
+    (chunking, "_CHUNK_BYTES"), (chunking, "_BYTES_PER_DAY"),
+    (executor, "_LIMIT"),
+    (limiter, "_LIMITER"), (retry, "_POLICY"),
+    (transport, "_TRANSPORT"), (transport, "_ASYNC_TRANSPORT"),
+    (cache, "_RANGE_CACHE"), (cache, "_MEMORY_CACHE"),
+    (cache, "_SHARED_CACHE"), (cache, "_PAYLOAD_CACHE"),
+]
+
+
+def epoch(when: str) -> int:
+    """Returns the unix epoch of a UTC date or timestamp"""
+    return int(pd.Timestamp(when, tz="UTC").timestamp())
+
+
+def daily_frame(symbol: str, start: str = "2020-01-01",
+                end: str = "2022-12-31") -> pd.DataFrame:
+    """Builds business-day bars shaped like the server's daily_stocks"""
+    dates = pd.bdate_range(start, end)
+    close = 100 + np.arange(len(dates)) * 0.25
+    return pd.DataFrame({
+        "Symbol": symbol, "Date": dates, "Open": close, "High": close + 1,
+        "Low": close - 1, "Close": close, "VWAP": close,
+        "BidPrc": close - 0.01, "AskPrc": close + 0.01,
+        "Volume": np.arange(len(dates)) + 1, "Trades": 10})
+
+
+def intraday_frame(symbol: str, start: str = "2022-01-03",
+                   periods: int = 7 * 24 * 60,
+                   freq: str = "min") -> pd.DataFrame:
+    """Builds bars shaped like the server's intraday_stocks"""
+    times = pd.date_range(start, periods=periods, freq=freq)
+    close = 100 + np.arange(len(times)) * 1e-3
+    return pd.DataFrame({
+        "Symbol": symbol, "Time": times, "Trades": 1, "Volume": 10,
+        "Imbalance": 0, "Close": close, "VWAP": close, "BidPrc": close,
+        "AskPrc": close, "BidSz": 1, "AskSz": 1})
+
+
+@pytest.fixture(autouse=True)
+def isolated(monkeypatch):
+    """Restores the library's settings after each test"""
+    for module, name in _SETTINGS:
+        value = getattr(module, name)
+        monkeypatch.setattr(module, name,
+                            dict(value) if isinstance(value, dict) else value)
+    monkeypatch.setattr(constants, "API_KEY", "key")
+    monkeypatch.setattr(constants, "API_USERNAME", "user")
+    yield
+    # Calls a test left running finish on the pool it used
+    executor.configure_executor()
+
+
+@pytest.fixture
+def server():
+    """A LocalServer with daily AAPL and MSFT data, answering every request"""
+    local = mdb.LocalServer()
+    local.add("AAPL", "daily_stocks", daily_frame("AAPL"))
+    local.add("MSFT", "daily_stocks", daily_frame("MSFT"))
+    mdb.set_transport(mdb.InProcessTransport(local))
+    return local
@@ -0,0 +1,74 @@
+"""Tests for the asyncio API"""
+
+import asyncio
+import numpy as np
+import pandas as pd
+from pandas.testing import assert_frame_equal
+import pytest
+import moabdb as mdb
+from moabdb import constants, errors
+from conftest import daily_frame, intraday_frame
+
+TICKERS = ["AAPL", "MSFT", "GOOG"]
+WINDOW = {"start": "2021-01-01", "end": "2021-12-31"}
+
+
+def _rates() -> pd.DataFrame:
+    dates = pd.bdate_range("2020-01-01", "2022-12-31")
+    frame = pd.DataFrame({"Date": dates})
+    for position, column in enumerate(constants.RATES_COLUMNS[1:]):
+        frame[column] = position + np.linspace(0, 1, len(dates))
+    return frame
+
+
+@pytest.fixture(autouse=True)
+def local():
+    """A LocalServer with daily, intraday and treasury data"""
+    server = mdb.LocalServer()
+    for ticker in TICKERS:
+        server.add(ticker, "daily_stocks", daily_frame(ticker))
+    server.add("AAPL", "intraday_stocks", intraday_frame("AAPL"))
+    server.add("INTERNAL_TREASURY", "treasuries", _rates())
+    mdb.set_transport(mdb.InProcessTransport(server))
+    return server
+
+
+@pytest.mark.parametrize("tickers", ["AAPL", TICKERS])
+def test_equity_matches_sync(tickers):
+    expected = mdb.get_equity(tickers, **WINDOW)
+    assert_frame_equal(
+        asyncio.run(mdb.get_equity_async(tickers, **WINDOW)), expected)
+
+
+def test_chunked_intraday_matches_sync():
+    mdb.configure_chunking(chunk_bytes=64 << 10)
+    window = {"start": "2022-01-03", "end": "2022-01-08", "intraday": True}
+    expected = mdb.get_equity("AAPL", **window)
+    assert_frame_equal(
+        asyncio.run(mdb.get_equity_async("AAPL", **window)), expected)
+
+
+def test_columns_match_sync():
+    expected = mdb.get_equity(TICKERS, columns=["Close"], **WINDOW)
+    assert_frame_equal(asyncio.run(mdb.get_equity_async(
+        TICKERS, columns=["Close"], **WINDOW)), expected)
+
+
+def test_rates_match_sync():
+    expected = mdb.get_rates(**WINDOW)
+    assert_frame_equal(asyncio.run(mdb.get_rates_async(**WINDOW)), expected)
+
+
+def test_requests_run_concurrently(local):
+    async def fetch_all():
+        return await asyncio.gather(*(
+            mdb.get_equity_async(ticker, **WINDOW) for ticker in TICKERS))
+
+    frames = asyncio.run(fetch_all())
+    assert [frame["Symbol"].iloc[0] for frame in frames] == TICKERS
+    assert local.requests == len(TICKERS)
+
+
+def test_errors_match_sync():
+    with pytest.raises(errors.MoabNotFoundError):
+        asyncio.run(mdb.get_equity_async("ZZZZ", **WINDOW))
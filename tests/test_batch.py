@@ -0,0 +1,77 @@
+"""Tests for multi-ticker requests sent as batches"""
+
+import pytest
+import moabdb as mdb
+from moabdb import constants, errors
+from conftest import daily_frame
+
+TICKERS = ["AAPL", "MSFT", "GOOG", "AMZN", "NVDA"]
+
+
+def _serve(**options):
+    local = mdb.LocalServer(**options)
+    for ticker in TICKERS:
+        local.add(ticker, "daily_stocks", daily_frame(ticker))
+    mdb.set_transport(mdb.InProcessTransport(local))
+    return local
+
+
+def _get(tickers, **kwargs):
+    return mdb.get_equity(tickers, start="2021-01-01", end="2021-12-31",
+                          **kwargs)
+
+
+def _symbols(frame) -> list:
+    return sorted(frame.columns.unique("Symbol"))
+
+
+def test_batches_split_by_batch_size():
+    local = _serve()
+    mdb.set_batch_size(2)
+    frame = _get(TICKERS)
+    assert local.requests == 3
+    assert _symbols(frame) == sorted(TICKERS)
+
+    mdb.set_batch_size(1)
+    assert frame.equals(_get(TICKERS))
+    assert local.requests == 3 + len(TICKERS)
+
+
+def test_missing_tickers_are_reported():
+    local = _serve()
+    frame, failed = _get(["AAPL", "ZZZZ", "MSFT"], on_error="collect")
+    assert local.requests == 1
+    assert _symbols(frame) == ["AAPL", "MSFT"]
+    assert list(failed["Symbol"]) == ["ZZZZ"]
+    assert list(failed["Error"]) == ["MoabNotFoundError"]
+
+    with pytest.raises(errors.MoabNotFoundError):
+        _get(["AAPL", "ZZZZ"])
+
+
+def test_batch_of_only_missing_tickers():
+    local = _serve()
+    _, failed = _get(["ZZZZ", "YYYY"], on_error="collect")
+    assert local.requests == 1
+    assert sorted(failed["Symbol"]) == ["YYYY", "ZZZZ"]
+
+
+def test_falls_back_when_server_does_not_batch():
+    size = constants.BATCH_SIZE
+    local = _serve(batch=False)
+    frame = _get(TICKERS)
+    assert _symbols(frame) == sorted(TICKERS)
+    # One refused batch, then each ticker on its own
+    assert local.requests == 1 + len(TICKERS)
+    assert constants.BATCH_SIZE == size
+
+    _get(TICKERS)
+    assert local.requests == 1 + 2 * len(TICKERS)
+
+
+def test_batch_support_is_tracked_per_server():
+    _serve(batch=False)
+    _get(TICKERS[:2])
+    local = _serve()
+    _get(TICKERS[:2])
+    assert local.requests == 1
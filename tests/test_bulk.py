@@ -0,0 +1,90 @@
+"""Tests for checkpointed, resumable bulk downloads"""
+
+import os
+import pytest
+import moabdb as mdb
+from moabdb import errors
+from conftest import daily_frame
+
+TICKERS = ["AAPL", "MSFT"]
+WINDOW = {"start": "2020-01-01", "end": "2022-12-31"}
+
+
+class Interrupting(mdb.LocalServer):
+    """A LocalServer that cancels a token once it's been asked enough"""
+
+    def __init__(self, token, after: int):
+        super().__init__()
+        self.token = token
+        self.after = after
+
+    def handle(self, req):
+        if self.requests >= self.after:
+            self.token.cancel()
+        return super().handle(req)
+
+
+def _serve(local) -> mdb.LocalServer:
+    for ticker in TICKERS:
+        local.add(ticker, "daily_stocks", daily_frame(ticker))
+    mdb.set_transport(mdb.InProcessTransport(local))
+    return local
+
+
+def test_resume_fetches_only_missing_units(tmp_path):
+    mdb.configure_executor(max_workers=1)
+    token = mdb.CancellationToken()
+    _serve(Interrupting(token, after=2))
+    job = mdb.BulkDownload(TICKERS, str(tmp_path), chunk_days=365, **WINDOW)
+    units = job.units()
+    assert len(units) == 2 * 4
+
+    with pytest.raises(errors.MoabCancelledError):
+        job.run(cancel=token)
+
+    resumed = mdb.BulkDownload.resume(str(tmp_path))
+    assert resumed.pending() == units[2:]
+    local = _serve(mdb.LocalServer())
+    summary = resumed.run()
+    assert summary["downloaded"] == 6 and summary["complete"] == 2
+    assert local.requests == 6
+    assert not resumed.pending()
+
+    for ticker in TICKERS:
+        frame = resumed.read(ticker)
+        assert frame["Date"].is_unique and frame["Date"].is_monotonic_increasing
+        assert len(frame) == len(daily_frame(ticker, **WINDOW))
+
+
+def test_failed_units_stay_pending(tmp_path):
+    local = mdb.LocalServer(users={"user": "other"})
+    _serve(local)
+    job = mdb.BulkDownload(TICKERS, str(tmp_path), chunk_days=365, **WINDOW)
+    summary = job.run()
+    assert summary["failed"] == len(job.units())
+    assert set(job.failures["Error"]) == {"MoabUnauthorizedError"}
+
+    _serve(mdb.LocalServer())
+    assert mdb.BulkDownload.resume(str(tmp_path)).run()["downloaded"] == 8
+
+
+def test_torn_manifest_line_is_fetched_again(tmp_path):
+    _serve(mdb.LocalServer())
+    job = mdb.BulkDownload(TICKERS, str(tmp_path), chunk_days=365, **WINDOW)
+    job.run()
+    manifest = os.path.join(str(tmp_path), "manifest.jsonl")
+    with open(manifest, encoding="utf-8") as file:
+        lines = file.readlines()
+    with open(manifest, "w", encoding="utf-8") as file:
+        file.writelines(lines[:-1] + [lines[-1][:10]])
+
+    resumed = mdb.BulkDownload.resume(str(tmp_path))
+    assert len(resumed.pending()) == 1
+    assert resumed.run()["downloaded"] == 1
+
+
+def test_directory_holding_a_job_is_refused(tmp_path):
+    _serve(mdb.LocalServer())
+    mdb.BulkDownload(TICKERS, str(tmp_path), **WINDOW)
+    with pytest.raises(errors.MoabRequestError):
+        mdb.BulkDownload(TICKERS, str(tmp_path), **WINDOW)
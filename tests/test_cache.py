@@ -0,0 +1,86 @@
+"""Tests for the response caches"""
+
+from pandas.testing import assert_frame_equal
+import pytest
+import moabdb as mdb
+from moabdb import cache
+from conftest import epoch
+
+
+def _get(start="2021-01-01", end="2021-12-31"):
+    return mdb.get_equity("AAPL", start=start, end=end)
+
+
+def test_range_cache_fetches_only_gaps(server, tmp_path):
+    expected = _get("2021-01-01", "2021-12-31")
+    server.requests = 0
+    mdb.enable_cache(str(tmp_path))
+
+    assert_frame_equal(_get("2021-03-01", "2021-06-30"),
+                       _get("2021-03-01", "2021-06-30"))
+    assert server.requests == 1
+
+    # Only the months before and after the cached range are fetched
+    assert_frame_equal(_get("2021-01-01", "2021-12-31"), expected)
+    assert server.requests == 3
+    ranges = cache.get_range_cache().ranges("AAPL", "daily_stocks")
+    assert ranges == [(epoch("2021-01-01"), epoch("2021-12-31"))]
+
+    _get("2021-02-01", "2021-11-30")
+    assert server.requests == 3
+
+
+def test_memory_cache_revalidates_stale_windows(server):
+    mdb.enable_memory_cache(ttl={"daily_stocks": 0}, closed_ttl=0)
+    expected = _get()
+    assert server.requests == 1 and server.not_modified == 0
+
+    assert_frame_equal(_get(), expected)
+    assert server.requests == 2
+    assert server.not_modified == 1
+
+
+def test_memory_cache_serves_fresh_windows(server):
+    mdb.enable_memory_cache()
+    expected = _get()
+    assert_frame_equal(_get(), expected)
+    assert server.requests == 1
+    assert mdb.cache_stats()["hits"] == 1
+
+
+@pytest.fixture
+def kv():
+    """A LocalKVServer answering on a free port"""
+    local = mdb.LocalKVServer(password="secret")
+    yield local
+    local.shutdown()
+
+
+def test_payload_cache_over_redis(server, kv):
+    host, port = kv.serve()
+    mdb.enable_payload_cache(mdb.RedisBackend(host, port, password="secret"))
+    expected = _get()
+    assert len(kv.values) == 1
+
+    assert_frame_equal(_get(), expected)
+    assert server.requests == 1
+
+
+def test_payload_cache_revalidates_over_redis(server, kv):
+    host, port = kv.serve()
+    mdb.enable_payload_cache(mdb.RedisBackend(host, port, password="secret"),
+                             ttl={"daily_stocks": 0}, closed_ttl=0)
+    expected = _get()
+    assert_frame_equal(_get(), expected)
+    assert_frame_equal(_get(), expected)
+    assert server.requests == 3
+    assert server.not_modified == 2
+
+
+def test_unreachable_redis_behaves_like_empty(server, kv):
+    _, port = kv.serve()
+    kv.shutdown()
+    mdb.enable_payload_cache(mdb.RedisBackend("127.0.0.1", port, timeout=0.5))
+    expected = _get()
+    assert_frame_equal(_get(), expected)
+    assert server.requests == 2
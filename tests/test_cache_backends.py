@@ -0,0 +1,83 @@
+"""Tests for the payload cache backends"""
+
+import socket
+import socketserver
+import threading
+import pytest
+import moabdb as mdb
+from moabdb import cache_backends
+
+
+class _Garbled(socketserver.StreamRequestHandler):
+    """Answers every command with a reply that can't be parsed"""
+
+    def handle(self):
+        while self.rfile.readline():
+            self.wfile.write(b":not a number\r\n")
+
+
+@pytest.fixture
+def garbled():
+    """A server answering the Redis protocol with malformed replies"""
+    server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), _Garbled)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server.server_address
+    server.shutdown()
+    server.server_close()
+
+
+def test_memory_backend_evicts_least_recently_used():
+    backend = mdb.MemoryBackend(max_bytes=10)
+    backend.set("a", b"12345", 60)
+    backend.set("b", b"12345", 60)
+    assert backend.get("a") == b"12345"
+    backend.set("c", b"12345", 60)
+    assert backend.get("b") is None
+    assert backend.get("a") == backend.get("c") == b"12345"
+
+
+def test_redis_backend_round_trip():
+    kv = mdb.LocalKVServer()
+    backend = mdb.RedisBackend(*kv.serve(), prefix="test:")
+    try:
+        backend.set("key", b"value", 60)
+        assert kv.values[b"test:key"][1] == b"value"
+        assert backend.get("key") == b"value"
+        backend.delete("key")
+        assert backend.get("key") is None
+    finally:
+        backend.close()
+        kv.shutdown()
+
+
+def test_malformed_replies_behave_like_a_miss(garbled):
+    backend = mdb.RedisBackend(*garbled)
+    assert backend.get("key") is None
+    # The connection was left mid-reply, so it isn't pooled
+    assert not backend._idle  # pylint: disable=protected-access
+
+
+def test_payload_cache_survives_malformed_replies(server, garbled):
+    mdb.enable_payload_cache(mdb.RedisBackend(*garbled))
+    frame = mdb.get_equity("AAPL", start="2021-01-01", end="2021-12-31")
+    assert not frame.empty
+    assert server.requests == 1
+
+
+def test_failed_auth_closes_the_socket(monkeypatch):
+    kv = mdb.LocalKVServer(password="secret")
+    host, port = kv.serve()
+    opened = []
+    connect = socket.create_connection
+
+    def recording(*args, **kwargs):
+        opened.append(connect(*args, **kwargs))
+        return opened[-1]
+
+    monkeypatch.setattr(cache_backends.socket, "create_connection", recording)
+    try:
+        assert mdb.RedisBackend(host, port, password="wrong").get("key") is None
+        assert opened and all(sock.fileno() == -1 for sock in opened)
+    finally:
+        kv.shutdown()
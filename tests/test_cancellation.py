@@ -0,0 +1,65 @@
+"""Tests for call deadlines and cancellation tokens"""
+
+import threading
+import time
+import pytest
+import moabdb as mdb
+from moabdb import errors
+from conftest import daily_frame
+
+TICKERS = ["AAPL", "MSFT", "GOOG", "AMZN"]
+
+
+class SlowServer(mdb.LocalServer):
+    """A LocalServer that takes a while to answer each data request"""
+
+    delay = 0.3
+
+    def handle(self, req):
+        time.sleep(self.delay)
+        return super().handle(req)
+
+
+@pytest.fixture
+def slow():
+    local = SlowServer()
+    for ticker in TICKERS:
+        local.add(ticker, "daily_stocks", daily_frame(ticker))
+    mdb.set_transport(mdb.InProcessTransport(local))
+    return local
+
+
+def _get(**kwargs):
+    return mdb.get_equity(TICKERS, start="2021-01-01", end="2021-12-31",
+                          **kwargs)
+
+
+def test_call_within_deadline(slow):
+    frame = _get(deadline=30)
+    assert sorted(frame.columns.unique("Symbol")) == sorted(TICKERS)
+    assert slow.requests >= 1
+
+
+def test_deadline_stops_the_call(slow):
+    began = time.monotonic()
+    with pytest.raises(errors.MoabDeadlineError):
+        _get(deadline=0.1)
+    assert time.monotonic() - began < 2 * slow.delay + 0.5
+
+
+def test_cancelled_token_sends_nothing(slow):
+    token = mdb.CancellationToken()
+    token.cancel()
+    with pytest.raises(errors.MoabCancelledError):
+        _get(cancel=token)
+    assert slow.requests == 0
+
+
+@pytest.mark.usefixtures("slow")
+def test_cancel_from_another_thread():
+    mdb.set_batch_size(1)
+    token = mdb.CancellationToken()
+    threading.Timer(0.1, token.cancel).start()
+    with pytest.raises(errors.MoabCancelledError):
+        _get(cancel=token)
+    assert token.cancelled
@@ -0,0 +1,52 @@
+"""Splitting long windows by the payload sizes observed"""
+
+import pandas as pd
+import moabdb as mdb
+from moabdb import chunking, lib
+from conftest import epoch, intraday_frame
+
+
+def test_long_windows_are_split_into_aligned_sub_ranges():
+    mdb.configure_chunking(64 << 20)
+    windows = chunking.split("intraday_stocks", epoch("2019-01-01"),
+                             epoch("2022-01-01"))
+    assert len(windows) > 1
+    assert windows[0][0] == epoch("2019-01-01")
+    assert windows[-1][1] == epoch("2022-01-01")
+    for (_, last), (first, _) in zip(windows, windows[1:]):
+        assert first == last + 1
+
+
+def test_chunked_results_match_a_single_request(server):
+    server.add("SPY", "intraday_stocks", intraday_frame("SPY"))
+    whole = mdb.get_equity("SPY", start="2022-01-03", end="2022-01-10",
+                           intraday=True)
+    mdb.configure_chunking(1 << 16)
+    chunked = mdb.get_equity("SPY", start="2022-01-03", end="2022-01-10",
+                             intraday=True)
+    assert chunked.equals(whole)
+
+
+def test_tail_polls_leave_split_alone(server):
+    minutes = intraday_frame("SPY")
+    seconds = intraday_frame("SPY", "2022-01-09 12:00:00", 150, "s")
+    server.add("SPY", "intraday_stocks", pd.concat(
+        [minutes[minutes["Time"] < "2022-01-09 12:00"], seconds]))
+    mdb.get_equity("SPY", start="2022-01-03", end="2022-01-09", intraday=True)
+    estimate = chunking._BYTES_PER_DAY["intraday_stocks"]
+    window = (epoch("2019-01-01"), epoch("2022-01-01"))
+    before = chunking.split("intraday_stocks", *window)
+
+    tail = epoch("2022-01-09 12:00:00")
+    for poll in range(30):
+        first = tail + poll * 5
+        lib._server_req("SPY", first, first + 4, "intraday_stocks")
+
+    assert chunking._BYTES_PER_DAY["intraday_stocks"] == estimate
+    assert chunking.split("intraday_stocks", *window) == before
+
+
+def test_short_windows_count_for_less():
+    chunking.observe("daily_stocks", 0, 70 * 86400 - 1, 70000)
+    chunking.observe("daily_stocks", 0, 86400 - 1, 0)
+    assert chunking._BYTES_PER_DAY["daily_stocks"] > 1000 * (1 - chunking.SMOOTHING)
@@ -0,0 +1,133 @@
+"""Tests for the shared executor and the in-flight request limit"""
+
+import asyncio
+import threading
+import time
+import pytest
+import moabdb as mdb
+from moabdb import errors
+from conftest import daily_frame
+
+TICKERS = [f"T{number:03}" for number in range(60)]
+
+
+class CountingServer(mdb.LocalServer):
+    """A LocalServer that records the most data requests it answered at once"""
+
+    def __init__(self):
+        super().__init__()
+        self.active = 0
+        self.peak = 0
+        self._counting = threading.Lock()
+
+    def handle(self, req):
+        with self._counting:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        try:
+            time.sleep(0.002)
+            return super().handle(req)
+        finally:
+            with self._counting:
+                self.active -= 1
+
+
+def _serve() -> CountingServer:
+    local = CountingServer()
+    for ticker in TICKERS:
+        local.add(ticker, "daily_stocks", daily_frame(ticker, "2021-01-01"))
+    mdb.set_transport(mdb.InProcessTransport(local))
+    mdb.set_batch_size(1)
+    return local
+
+
+def _window() -> dict:
+    return {"start": "2021-01-01", "end": "2021-12-31"}
+
+
+def test_in_flight_limit_is_honoured():
+    local = _serve()
+    mdb.configure_executor(max_workers=16, max_in_flight=3)
+    frame = mdb.get_equity(TICKERS, **_window())
+    assert len(frame.columns.unique("Symbol")) == len(TICKERS)
+    assert local.requests == len(TICKERS)
+    assert local.peak <= 3
+
+
+def test_async_fan_out_under_small_limit():
+    local = _serve()
+    mdb.configure_executor(max_in_flight=2)
+    expected = mdb.get_equity(TICKERS, **_window())
+
+    began = time.monotonic()
+    frame = asyncio.run(mdb.get_equity_async(TICKERS, **_window()))
+    # Waiting for a slot mustn't hold the threads the requests run on
+    assert time.monotonic() - began < 10
+    assert frame.equals(expected)
+    assert local.peak <= 2
+
+
+def test_async_waiters_are_woken_by_release():
+    mdb.configure_executor(max_in_flight=1)
+
+    async def hold(order, name):
+        async with mdb.executor.in_flight_async():
+            order.append(name)
+            await asyncio.sleep(0.01)
+
+    async def run():
+        order = []
+        await asyncio.gather(*(hold(order, name) for name in range(20)))
+        return order
+
+    began = time.monotonic()
+    assert sorted(asyncio.run(run())) == list(range(20))
+    assert time.monotonic() - began < 2
+
+
+def _sleep(seconds):
+    time.sleep(seconds)
+    return seconds
+
+
+def test_nested_fan_out_uses_idle_workers():
+    mdb.configure_executor(max_workers=16)
+
+    def outer(_):
+        return sum(mdb.executor.fan_out(_sleep, [0.1] * 4))
+
+    began = time.monotonic()
+    assert mdb.executor.fan_out(outer, range(3)) == pytest.approx([0.4] * 3)
+    assert time.monotonic() - began < 0.3
+
+
+def test_nested_fan_out_cannot_deadlock():
+    mdb.configure_executor(max_workers=1)
+
+    def outer(count):
+        return len(mdb.executor.fan_out(_sleep, [0] * count))
+
+    assert mdb.executor.fan_out(outer, [2, 3]) == [2, 3]
+
+
+def test_failure_does_not_wait_for_siblings():
+    def call(seconds):
+        if not seconds:
+            raise errors.MoabNotFoundError("missing")
+        return _sleep(seconds)
+
+    began = time.monotonic()
+    with mdb.cancellation.scope(30, None):
+        with pytest.raises(errors.MoabNotFoundError):
+            mdb.executor.fan_out(call, [1, 0])
+    assert time.monotonic() - began < 0.5
+
+
+def test_cancel_does_not_wait_for_siblings():
+    token = mdb.CancellationToken()
+    threading.Timer(0.1, token.cancel).start()
+    began = time.monotonic()
+    with mdb.cancellation.scope(None, token):
+        with pytest.raises(errors.MoabCancelledError):
+            mdb.executor.fan_out(_sleep, [1, 1])
+    assert time.monotonic() - began < 0.5
@@ -0,0 +1,68 @@
+"""Tests for the adaptive limiter"""
+
+import asyncio
+import threading
+import time
+import moabdb as mdb
+from moabdb import limiter, transport
+from conftest import daily_frame
+
+
+def test_rate_grows_back_no_further_than_configured():
+    pacer = limiter.AdaptiveLimiter(rate=5, burst=10000)
+    for _ in range(2000):
+        pacer.release(pacer.acquire())
+    assert pacer.stats()["rate"] == 5
+
+    pacer.release(pacer.acquire(), throttled=True, retry_after=0)
+    assert pacer.stats()["rate"] == 2.5
+    for _ in range(2000):
+        pacer.release(pacer.acquire())
+    assert pacer.stats()["rate"] == 5
+
+
+def test_async_acquire_waits_for_release():
+    pacer = limiter.AdaptiveLimiter(1, max_concurrency=1)
+    attempts = []
+    try_acquire = pacer._try_acquire  # pylint: disable=protected-access
+
+    def counting():
+        attempts.append(time.monotonic())
+        return try_acquire()
+
+    pacer._try_acquire = counting  # pylint: disable=protected-access
+
+    async def run():
+        held = pacer.acquire()
+        threading.Timer(0.2, pacer.release, (held,)).start()
+        await pacer.acquire_async()
+        return time.monotonic()
+
+    began = time.monotonic()
+    acquired = asyncio.run(run())
+    assert 0.2 <= acquired - began < 0.3
+    # Woken by the release instead of polling while full
+    assert len(attempts) <= 3
+
+
+def test_throttles_wait_out_retry_after():
+    local = mdb.LocalServer()
+    local.add("AAPL", "daily_stocks", daily_frame("AAPL"))
+    throttled = []
+
+    def handler(method, url, headers, body):
+        if not throttled and not url.rstrip("/").endswith("login/v1"):
+            throttled.append(time.monotonic())
+            return transport.TransportResponse(429, {"Retry-After": "0.3"}, b"")
+        return local(method, url, headers, body)
+
+    mdb.set_transport(mdb.InProcessTransport(handler))
+    mdb.configure_limiter(concurrency=8)
+    frame = mdb.get_equity("AAPL", start="2021-01-01", end="2021-12-31")
+    assert time.monotonic() - throttled[0] >= 0.3
+    assert not frame.empty
+    assert local.requests == 1
+
+    stats = mdb.limiter_stats()
+    assert stats["throttles"] == 1 and stats["retries"] == 1
+    assert stats["concurrency"] == 4
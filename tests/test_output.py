@@ -0,0 +1,42 @@
+"""Tests for the output formats that skip pandas"""
+
+import numpy as np
+import pytest
+import moabdb as mdb
+from moabdb import errors
+
+WINDOW = {"start": "2021-01-01", "end": "2021-12-31"}
+
+
+@pytest.mark.usefixtures("server")
+def test_arrow_output_is_long_format(tmp_path):
+    frame = mdb.get_equity(["AAPL", "MSFT"], **WINDOW)
+    mdb.enable_memory_cache()
+    mdb.enable_cache(str(tmp_path))
+    table = mdb.get_equity(["AAPL", "MSFT"], output="arrow", **WINDOW)
+
+    assert table.num_rows == 2 * len(frame)
+    assert table.column_names[:2] == ["Symbol", "Date"]
+    assert table.column("Symbol").unique().to_pylist() == ["AAPL", "MSFT"]
+    # Neither the server's pandas metadata nor the caches' etags leak out
+    assert table.schema.metadata is None
+    assert mdb.get_equity("AAPL", output="arrow", **WINDOW) \
+        .schema.metadata is None
+
+
+@pytest.mark.usefixtures("server")
+def test_numpy_output_is_contiguous_columns():
+    table = mdb.get_equity("AAPL", output="arrow", **WINDOW)
+    arrays = mdb.get_equity("AAPL", output="numpy", columns=["Close"],
+                            **WINDOW)
+    assert list(arrays) == ["Symbol", "Date", "Close"]
+    assert all(len(array) == table.num_rows for array in arrays.values())
+    assert arrays["Close"].flags["C_CONTIGUOUS"]
+    np.testing.assert_array_equal(arrays["Close"],
+                                  table.column("Close").to_numpy())
+
+
+@pytest.mark.usefixtures("server")
+def test_unknown_output_is_refused():
+    with pytest.raises(errors.MoabRequestError):
+        mdb.get_equity("AAPL", output="excel", **WINDOW)
@@ -0,0 +1,77 @@
+"""Tests for the intraday tail poller"""
+
+import moabdb as mdb
+from moabdb import poller
+from conftest import epoch, intraday_frame
+
+START = "2022-01-03 15:00"
+
+
+class Clock:
+    """Stands in for time.time in the poller module"""
+
+    def __init__(self, now: int):
+        self.now = now
+
+    def time(self) -> float:
+        return float(self.now)
+
+
+def _serve(monkeypatch) -> tuple:
+    local = mdb.LocalServer()
+    for ticker in ("AAPL", "MSFT"):
+        local.add(ticker, "intraday_stocks",
+                  intraday_frame(ticker, START, periods=600, freq="s"))
+    mdb.set_transport(mdb.InProcessTransport(local))
+    clock = Clock(epoch(START) + 60)
+    monkeypatch.setattr(poller, "time", clock)
+    return local, clock
+
+
+def test_poll_emits_only_new_rows(monkeypatch):
+    _, clock = _serve(monkeypatch)
+    received = []
+    tail = mdb.IntradayPoller(["AAPL", "MSFT", "ZZZZ"], since=epoch(START),
+                              callback=lambda *item: received.append(item))
+
+    first = tail.poll()
+    assert sorted(first) == ["AAPL", "MSFT"]
+    assert len(first["AAPL"]) == 61
+    assert [symbol for symbol, _ in received] == ["AAPL", "MSFT"]
+
+    clock.now += 30
+    second = tail.poll()
+    assert len(second["AAPL"]) == len(second["MSFT"]) == 30
+    assert second["AAPL"].index.min() > first["AAPL"].index.max()
+    assert tail.last_seen["AAPL"] == clock.now
+
+    # Nothing new yet, so the poller waits longer before the next poll
+    interval = tail.interval
+    assert not tail.poll()
+    assert tail.interval > interval
+
+
+def test_poll_batches_symbols(monkeypatch):
+    local, clock = _serve(monkeypatch)
+    tail = mdb.IntradayPoller(["AAPL", "MSFT"], since=epoch(START))
+    tail.poll()
+    clock.now += 10
+    tail.poll()
+    assert local.requests == 2
+
+
+def test_failed_symbols_are_asked_again(monkeypatch):
+    _serve(monkeypatch)
+    failed = []
+    tail = mdb.IntradayPoller(["AAPL"], since=epoch(START),
+                              on_error=lambda *item: failed.append(item))
+    mdb.set_transport(mdb.InProcessTransport(
+        lambda *args: mdb.TransportResponse(502, {}, b"")))
+    mdb.disable_retries()
+    assert not tail.poll()
+    assert failed and failed[0][0] == "AAPL"
+    assert tail.interval == 2 * tail.min_interval
+
+    # The next poll still starts from where the symbol left off
+    _serve(monkeypatch)
+    assert len(tail.poll()["AAPL"]) == 61
@@ -0,0 +1,76 @@
+"""Tests for column projection"""
+
+from base64 import b64decode
+import pytest
+import moabdb as mdb
+from moabdb import errors, proto_wrapper
+from conftest import daily_frame
+
+WINDOW = {"start": "2021-01-01", "end": "2021-12-31"}
+
+
+class Recorder:
+    """Wraps a LocalServer, keeping every data request it decodes"""
+
+    def __init__(self):
+        self.local = mdb.LocalServer()
+        for ticker in ("AAPL", "MSFT"):
+            self.local.add(ticker, "daily_stocks", daily_frame(ticker))
+        self.requests = []
+
+    def __call__(self, method, url, headers, body):
+        if not url.rstrip("/").endswith("login/v1"):
+            raw = body if method == "POST" else b64decode(headers["x-req"])
+            self.requests.append(proto_wrapper.REQUEST().FromString(raw))
+        return self.local(method, url, headers, body)
+
+
+@pytest.fixture
+def recorder():
+    handler = Recorder()
+    mdb.set_transport(mdb.InProcessTransport(handler))
+    return handler
+
+
+@pytest.mark.parametrize("binary", [False, True])
+def test_columns_reach_the_request(recorder, binary):
+    mdb.set_binary_mode(binary)
+    frame = mdb.get_equity("AAPL", columns=["Close", "Volume"], **WINDOW)
+    assert list(recorder.requests[-1].columns) == \
+        ["Symbol", "Date", "Close", "Volume"]
+    assert list(frame.columns) == ["Symbol", "Close", "Volume"]
+
+
+def test_columns_reach_batched_requests(recorder):
+    frame = mdb.get_equity(["AAPL", "MSFT"], columns="Close", **WINDOW)
+    assert len(recorder.requests) == 1
+    assert list(recorder.requests[0].symbols) == ["AAPL", "MSFT"]
+    assert list(recorder.requests[0].columns) == ["Symbol", "Date", "Close"]
+    assert set(frame.columns.get_level_values(0)) == {"Close"}
+
+
+def test_all_columns_by_default(recorder):
+    mdb.get_equity("AAPL", **WINDOW)
+    assert not recorder.requests[-1].columns
+
+
+@pytest.mark.usefixtures("recorder")
+def test_projection_matches_full_request():
+    full = mdb.get_equity("AAPL", **WINDOW)
+    projected = mdb.get_equity("AAPL", columns=["High", "Low"], **WINDOW)
+    assert projected.equals(full[["Symbol", "High", "Low"]])
+
+
+def test_cached_payloads_hold_every_column(recorder):
+    mdb.enable_payload_cache(mdb.MemoryBackend())
+    mdb.get_equity("AAPL", columns=["Close"], **WINDOW)
+    assert not recorder.requests[-1].columns
+    frame = mdb.get_equity("AAPL", **WINDOW)
+    assert len(recorder.requests) == 1
+    assert "Volume" in frame.columns
+
+
+def test_unknown_columns_are_refused(recorder):
+    with pytest.raises(errors.MoabRequestError):
+        mdb.get_equity("AAPL", columns=["Closing"], **WINDOW)
+    assert not recorder.requests
@@ -0,0 +1,114 @@
+"""Tests for retries and hedged requests"""
+
+import asyncio
+import threading
+import time
+import pytest
+import moabdb as mdb
+from moabdb import errors, transport
+from conftest import daily_frame
+
+WINDOW = {"start": "2021-01-01", "end": "2021-12-31"}
+
+
+class Flaky:
+    """Answers the first data requests badly, then hands over to a LocalServer"""
+
+    def __init__(self, failures: int = 0, slow: int = 0):
+        self.local = mdb.LocalServer()
+        self.local.add("AAPL", "daily_stocks", daily_frame("AAPL"))
+        self.failures = failures
+        self.slow = slow
+        self._lock = threading.Lock()
+
+    def __call__(self, method, url, headers, body):
+        if not url.rstrip("/").endswith("login/v1"):
+            with self._lock:
+                fail, self.failures = self.failures > 0, self.failures - 1
+                slow, self.slow = self.slow > 0, self.slow - 1
+            if fail:
+                return transport.TransportResponse(502, {}, b"")
+            if slow:
+                time.sleep(1)
+        return self.local(method, url, headers, body)
+
+
+def _serve(**kwargs) -> Flaky:
+    handler = Flaky(**kwargs)
+    mdb.set_transport(mdb.InProcessTransport(handler))
+    return handler
+
+
+def test_transient_errors_are_retried():
+    _serve(failures=2)
+    mdb.configure_retries(base_delay=0.01)
+    assert not mdb.get_equity("AAPL", **WINDOW).empty
+    assert mdb.retry_stats()["retried"] == 2
+
+
+def test_retries_give_up_after_their_limit():
+    handler = _serve(failures=10)
+    mdb.configure_retries({errors.MoabInternalError: 2}, base_delay=0.01)
+    with pytest.raises(errors.MoabInternalError):
+        mdb.get_equity("AAPL", **WINDOW)
+    assert handler.failures == 10 - 3
+
+
+def test_budget_caps_retries():
+    calls = []
+
+    def failing():
+        calls.append(time.monotonic())
+        raise errors.MoabHttpError("Could not connect to server")
+
+    budget = mdb.RetryBudget(ratio=0, min_per_second=0.1, window=10)
+    policy = mdb.RetryPolicy({errors.MoabHttpError: 5}, base_delay=0,
+                             budget=budget)
+    with pytest.raises(errors.MoabHttpError):
+        policy.call(failing)
+    # One retry per 10 seconds
+    assert len(calls) == 2
+    assert policy.stats() == {"retried": 1, "hedged": 0, "hedge_wins": 0,
+                              "exhausted": 1}
+
+
+def test_budget_grows_with_requests():
+    budget = mdb.RetryBudget(ratio=0.1, min_per_second=0, window=10)
+    assert not budget.withdraw()
+    for _ in range(20):
+        budget.deposit()
+    assert budget.withdraw() and budget.withdraw()
+    assert not budget.withdraw()
+
+
+def test_hedge_wins_over_slow_request():
+    _serve(slow=1)
+    mdb.configure_retries(hedge_after=0.05)
+    began = time.monotonic()
+    assert not mdb.get_equity("AAPL", **WINDOW).empty
+    assert time.monotonic() - began < 0.5
+    stats = mdb.retry_stats()
+    assert stats["hedged"] == 1 and stats["hedge_wins"] == 1
+
+
+def test_async_hedge_wins_over_slow_request():
+    _serve(slow=1)
+    mdb.configure_retries(hedge_after=0.05)
+
+    async def timed():
+        began = time.monotonic()
+        frame = await mdb.get_equity_async("AAPL", **WINDOW)
+        return frame, time.monotonic() - began
+
+    # The slow copy's thread still runs when asyncio.run shuts down
+    frame, took = asyncio.run(timed())
+    assert not frame.empty
+    assert took < 0.5
+    assert mdb.retry_stats()["hedge_wins"] == 1
+
+
+def test_fast_requests_are_not_hedged():
+    _serve()
+    mdb.configure_retries(hedge_after=0.5)
+    mdb.get_equity("AAPL", **WINDOW)
+    assert mdb.retry_stats()["hedged"] == 0
@@ -0,0 +1,70 @@
+"""Tests for the cache shared between processes"""
+
+import multiprocessing
+import time
+import pytest
+import moabdb as mdb
+from moabdb import constants, errors
+from conftest import daily_frame
+
+WINDOW = {"start": "2021-01-01", "end": "2021-12-31"}
+
+
+class SlowServer(mdb.LocalServer):
+    """A LocalServer slow enough for both processes to ask at once"""
+
+    def handle(self, req):
+        time.sleep(0.5)
+        return super().handle(req)
+
+
+def _fetch(url: str, path: str, ticker: str, ready, results):
+    """Fetches a window through the shared cache in a fresh process"""
+    constants.DB_URL = url
+    constants.API_KEY, constants.API_USERNAME = "key", "user"
+    mdb.enable_shared_cache(path)
+    ready.wait()
+    try:
+        results.put(mdb.get_equity(ticker, **WINDOW))
+    except errors.MoabNotFoundError as exc:
+        results.put(type(exc).__name__)
+
+
+@pytest.fixture
+def served():
+    """A SlowServer answering over HTTP"""
+    local = SlowServer()
+    local.add("AAPL", "daily_stocks", daily_frame("AAPL"))
+    url = local.serve()
+    yield local, url
+    local.shutdown()
+
+
+def _in_two_processes(url, path, ticker) -> list:
+    context = multiprocessing.get_context("spawn")
+    ready, results = context.Barrier(2), context.Queue()
+    processes = [context.Process(target=_fetch, args=(
+        url, path, ticker, ready, results)) for _ in range(2)]
+    for process in processes:
+        process.start()
+    # Read the results before joining, a full queue blocks its writer
+    found = [results.get(timeout=60) for _ in processes]
+    for process in processes:
+        process.join()
+    return found
+
+
+def test_processes_share_one_fetch(served, tmp_path):
+    local, url = served
+    first, second = _in_two_processes(url, str(tmp_path), "AAPL")
+    assert local.requests == 1
+    assert first.equals(second)
+    assert len(first) == len(daily_frame("AAPL", "2021-01-01", "2021-12-31"))
+    assert not list(tmp_path.glob("*.lock"))
+
+
+def test_processes_share_not_found(served, tmp_path):
+    local, url = served
+    results = _in_two_processes(url, str(tmp_path), "ZZZZ")
+    assert results == ["MoabNotFoundError"] * 2
+    assert local.requests == 1
@@ -0,0 +1,44 @@
+"""Tests for decoding intraday responses while they download"""
+
+import pandas as pd
+from pandas.testing import assert_frame_equal
+import moabdb as mdb
+from moabdb import local_server, transport
+from conftest import intraday_frame
+
+WINDOW = {"start": "2022-01-03", "end": "2022-01-05", "intraday": True}
+
+
+def _serve(handler=None) -> mdb.LocalServer:
+    local = mdb.LocalServer()
+    local.add("AAPL", "intraday_stocks",
+              intraday_frame("AAPL", periods=3 * 24 * 60))
+    mdb.set_transport(mdb.InProcessTransport(handler or local))
+    return local
+
+
+def test_iter_equity_matches_get_equity(monkeypatch):
+    monkeypatch.setattr(local_server, "ROWS_PER_BATCH", 500)
+    _serve()
+    expected = mdb.get_equity("AAPL", **WINDOW)
+    parts = list(mdb.iter_equity("AAPL", **WINDOW))
+    assert len(parts) == 6
+    assert_frame_equal(pd.concat(parts), expected)
+
+
+def test_body_cut_short_is_retried():
+    cut = []
+
+    def handler(method, url, headers, body):
+        res = local(method, url, headers, body)
+        if cut or url.rstrip("/").endswith("login/v1"):
+            return res
+        cut.append(len(res.content))
+        return transport.TransportResponse(
+            res.status_code, res.headers, res.content[:len(res.content) // 2])
+
+    local = _serve(handler)
+    frame = mdb.get_equity("AAPL", **WINDOW)
+    assert cut and local.requests == 2
+    assert len(frame) == 2 * 24 * 60 + 1
+    assert mdb.retry_stats()["retried"] == 1
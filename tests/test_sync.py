@@ -0,0 +1,58 @@
+"""Tests for the incremental sync of a local store"""
+
+import os
+import pandas as pd
+import pytest
+import moabdb as mdb
+from moabdb import errors
+from conftest import daily_frame
+
+
+def _recent(days: int, close: float = 0.0) -> pd.DataFrame:
+    """Daily bars for AAPL up to and including today"""
+    today = pd.Timestamp.now(tz="UTC").tz_localize(None).normalize()
+    frame = daily_frame("AAPL").iloc[:days].copy()
+    frame["Date"] = pd.date_range(end=today, periods=days, freq="D")
+    frame["Close"] += close
+    return frame
+
+
+def _serve(frame: pd.DataFrame) -> mdb.LocalServer:
+    local = mdb.LocalServer()
+    local.add("AAPL", "daily_stocks", frame)
+    mdb.set_transport(mdb.InProcessTransport(local))
+    return local
+
+
+def test_sync_appends_and_replaces_the_open_row(tmp_path):
+    _serve(_recent(30))
+    assert mdb.sync("AAPL", str(tmp_path), sample="1y") == {"AAPL": 30}
+    directory = tmp_path / "daily_stocks" / "AAPL"
+    assert "open.parquet" in os.listdir(directory)
+
+    # Today's bar changed on the server and nothing new settled
+    _serve(_recent(30, close=1.0))
+    assert mdb.sync("AAPL", str(tmp_path), sample="1y") == {"AAPL": 0}
+
+    stored = mdb.read_store("AAPL", str(tmp_path))
+    assert len(stored) == 30
+    assert stored["Date"].is_unique
+    assert stored["Close"].iloc[-1] == _recent(30, close=1.0)["Close"].iloc[-1]
+    assert stored["Close"].iloc[0] == _recent(30)["Close"].iloc[0]
+
+
+def test_read_store_returns_rows_in_time_order(tmp_path):
+    frame = _recent(30)
+    _serve(frame.iloc[:10])
+    mdb.sync("AAPL", str(tmp_path), sample="1y")
+    _serve(frame)
+    assert mdb.sync("AAPL", str(tmp_path), sample="1y") == {"AAPL": 20}
+
+    stored = mdb.read_store("aapl", str(tmp_path))
+    assert stored["Date"].is_monotonic_increasing
+    assert list(stored["Date"]) == list(frame["Date"])
+
+
+def test_read_store_without_rows(tmp_path):
+    with pytest.raises(errors.MoabNotFoundError):
+        mdb.read_store("AAPL", str(tmp_path))
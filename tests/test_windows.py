@@ -0,0 +1,70 @@
+"""Tests for the bulk event-window planner"""
+
+import pandas as pd
+import pytest
+import moabdb as mdb
+from moabdb import errors
+from conftest import epoch
+
+EVENTS = [("AAPL", "2021-01-20", "2021-02-10"),
+          ("aapl", "2021-02-01", "2021-02-20"),
+          ("MSFT", "2021-01-10", "2021-01-31"),
+          ("AAPL", "2021-06-01", "2021-06-10")]
+
+
+def _expected(symbol: str, start: str, end: str) -> pd.DataFrame:
+    return mdb.get_equity(symbol.upper(), start=start, end=end)
+
+
+def test_plan_merges_overlapping_windows():
+    plan = mdb.plan_windows(EVENTS)
+    assert list(plan["Symbol"]) == ["AAPL", "AAPL", "MSFT"]
+    assert list(plan["Start"]) == [epoch("2021-01-20"), epoch("2021-06-01"),
+                                   epoch("2021-01-10")]
+    assert list(plan["End"]) == [epoch("2021-02-20"), epoch("2021-06-10"),
+                                 epoch("2021-01-31")]
+    assert [list(rows) for rows in plan["Rows"]] == [[0, 1], [3], [2]]
+
+
+def test_plan_merges_windows_within_gap_days():
+    close = [("AAPL", "2021-01-04", "2021-01-08"),
+             ("AAPL", "2021-01-11", "2021-01-15")]
+    assert len(mdb.plan_windows(close)) == 2
+    assert len(mdb.plan_windows(close, gap_days=3)) == 1
+
+
+def test_windows_split_back_out(server):
+    frame = mdb.get_equity_windows(EVENTS)
+    assert server.requests == 3
+    assert list(frame.index.unique(0)) == [0, 1, 2, 3]
+    for label, (symbol, start, end) in enumerate(EVENTS):
+        window = frame.loc[label]
+        expected = _expected(symbol, start, end)
+        assert list(window.index) == list(expected.index)
+        assert (window["Close"] == expected["Close"]).all()
+        assert (window["Symbol"] == symbol.upper()).all()
+
+
+@pytest.mark.usefixtures("server")
+def test_dataframe_labels_are_kept():
+    events = pd.DataFrame(EVENTS, columns=["Symbol", "Start", "End"],
+                          index=["a", "b", "c", "d"])
+    frame = mdb.get_equity_windows(events)
+    assert list(frame.index.unique(0)) == ["a", "b", "c", "d"]
+    assert len(frame.loc["b"]) == len(_expected(*EVENTS[1]))
+
+
+@pytest.mark.usefixtures("server")
+def test_failed_windows_are_collected():
+    events = EVENTS + [("ZZZZ", "2021-01-04", "2021-01-08")]
+    frame, failed = mdb.get_equity_windows(events, on_error="collect")
+    assert list(frame.index.unique(0)) == [0, 1, 2, 3]
+    assert list(failed["Symbol"]) == ["ZZZZ"]
+
+    with pytest.raises(errors.MoabNotFoundError):
+        mdb.get_equity_windows(events)
+
+
+def test_window_ending_before_it_starts_is_refused():
+    with pytest.raises(errors.MoabRequestError):
+        mdb.get_equity_windows([("AAPL", "2021-02-01", "2021-01-01")])
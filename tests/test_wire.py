@@ -0,0 +1,101 @@
+"""Tests for the wire formats negotiated with the server"""
+
+from pandas.testing import assert_frame_equal
+import moabdb as mdb
+from moabdb import lib, proto_wrapper, transport
+from conftest import daily_frame
+
+
+class Recorder:
+    """Wraps a LocalServer, keeping the headers of every exchange"""
+
+    def __init__(self, local):
+        self.local = local
+        self.exchanges = []
+
+    def __call__(self, method, url, headers, body):
+        res = self.local(method, url, headers, body)
+        self.exchanges.append((method, dict(headers), dict(res.headers)))
+        return res
+
+
+def _serve(local) -> Recorder:
+    local.add("AAPL", "daily_stocks", daily_frame("AAPL"))
+    recorder = Recorder(local)
+    mdb.set_transport(mdb.InProcessTransport(recorder))
+    return recorder
+
+
+def _get():
+    return mdb.get_equity("AAPL", start="2021-01-01", end="2021-12-31")
+
+
+def test_binary_matches_base64():
+    recorder = _serve(mdb.LocalServer())
+    expected = _get()
+    assert recorder.exchanges[-1][0] == "GET"
+
+    mdb.set_binary_mode()
+    assert_frame_equal(_get(), expected)
+    method, _, res_headers = recorder.exchanges[-1]
+    assert method == "POST"
+    assert res_headers["Content-Type"] == proto_wrapper.PROTOBUF_MIME
+
+
+def test_binary_falls_back_to_base64():
+    recorder = _serve(mdb.LocalServer(binary=False))
+    expected = _get()
+
+    mdb.set_binary_mode()
+    assert_frame_equal(_get(), expected)
+    assert [method for method, _, _ in recorder.exchanges[-2:]] == ["POST", "GET"]
+    # The refusal is remembered, later requests go straight to base64
+    assert not proto_wrapper._BINARY  # pylint: disable=protected-access
+    _get()
+    assert recorder.exchanges[-1][0] == "GET"
+
+
+def test_gzip_responses_are_decoded(monkeypatch):
+    monkeypatch.setattr(transport, "ACCEPT_ENCODING", "gzip")
+    recorder = _serve(mdb.LocalServer())
+    expected = _get()
+
+    mdb.set_binary_mode()
+    assert_frame_equal(_get(), expected)
+    _, req_headers, res_headers = recorder.exchanges[-1]
+    assert req_headers["Accept-Encoding"] == "gzip"
+    assert res_headers["Content-Encoding"] == "gzip"
+
+
+def _decoded_formats(monkeypatch) -> list:
+    formats = []
+    decode = lib._decode_table  # pylint: disable=protected-access
+
+    def spy(data, payload_format, *args, **kwargs):
+        formats.append(payload_format)
+        return decode(data, payload_format, *args, **kwargs)
+
+    monkeypatch.setattr(lib, "_decode_table", spy)
+    return formats
+
+
+def test_arrow_and_parquet_agree(monkeypatch):
+    _serve(mdb.LocalServer())
+    formats = _decoded_formats(monkeypatch)
+
+    mdb.set_payload_format("parquet")
+    expected = _get()
+    mdb.set_payload_format("arrow")
+    assert_frame_equal(_get(), expected)
+    assert formats == ["parquet", "arrow"]
+
+
+def test_arrow_falls_back_to_parquet(monkeypatch):
+    _serve(mdb.LocalServer(arrow=False))
+    formats = _decoded_formats(monkeypatch)
+
+    mdb.set_payload_format("arrow")
+    frame = _get()
+    # A server without Arrow support leaves the format unset and sends Parquet
+    assert formats == [""]
+    assert len(frame) == len(daily_frame("AAPL", "2021-01-01", "2021-12-31"))